@@ -0,0 +1,81 @@
+"""
+Pack a saved BERT-BiLSTM-CRF model directory into a single-file bundle, and compare cold start.
+
+A bundle (save_model_bundle) holds ner_config, the BERT config, the tokenizer and all weights in
+one torch.save file. load_model_bundle builds the model on the meta device and memory-maps the
+weights, so loading reads no pretrained BERT, needs no HF hub cache and copies no weights on CPU.
+load_bert_bilstm_crf (and so the server and the quantize / ONNX tools) accept a bundle path in
+place of a model directory.
+
+Usage:
+  python bert_bilstm_crf_bundle.py pack --model-dir resume_ner --out resume_ner.bundle
+  python bert_bilstm_crf_bundle.py bench --model-dir resume_ner --bundle resume_ner.bundle
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from bert_bilstm_crf_pipeline import load_bert_bilstm_crf, save_model_bundle
+
+# Run in a fresh interpreter per measurement so nothing is cached in-process
+_COLD_START = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+from bert_bilstm_crf_pipeline import load_bert_bilstm_crf
+t1 = time.perf_counter()
+model, tokenizer, config = load_bert_bilstm_crf(sys.argv[1], "cpu")
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "load_s": t2 - t1, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def cold_start(path, offline=False):
+    """Time load_bert_bilstm_crf(path) in a new Python process; returns import/load seconds and peak RSS."""
+    env = dict(os.environ)
+    if offline:
+        env.update(HF_HUB_OFFLINE="1", TRANSFORMERS_OFFLINE="1")
+    here = os.path.dirname(os.path.abspath(__file__))
+    env["PYTHONPATH"] = here + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.run(
+        [sys.executable, "-c", _COLD_START, path], env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark_cold_start(model_dir, bundle_path, repeats=3):
+    """Best-of-`repeats` cold start of the model directory vs the bundle (bundle run offline)."""
+    results = {}
+    for name, path, offline in (("model_dir", model_dir, False), ("bundle", bundle_path, True)):
+        runs = [cold_start(path, offline) for _ in range(repeats)]
+        results[name] = min(runs, key=lambda r: r["load_s"])
+    for name, r in results.items():
+        print(f"{name:>9}: load {r['load_s']:6.2f} s  (import {r['import_s']:.2f} s, peak RSS {r['peak_rss_mb']:.0f} MB)")
+    print(f"Bundle loads {results['model_dir']['load_s'] / results['bundle']['load_s']:.1f}x faster")
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(description="Single-file BERT-BiLSTM-CRF bundles")
+    sub = p.add_subparsers(dest="command", required=True)
+    pk = sub.add_parser("pack", help="Pack a saved model directory into a bundle")
+    pk.add_argument("--model-dir", required=True, help="Directory with bert_bilstm_crf_state.pt, ner_config.json, tokenizer")
+    pk.add_argument("--out", required=True, help="Bundle file to write")
+    bn = sub.add_parser("bench", help="Cold-start time: model directory vs bundle")
+    bn.add_argument("--model-dir", required=True)
+    bn.add_argument("--bundle", required=True)
+    bn.add_argument("--repeats", type=int, default=3)
+    args = p.parse_args()
+
+    if args.command == "pack":
+        model, tokenizer, config = load_bert_bilstm_crf(args.model_dir, "cpu")
+        save_model_bundle(model, tokenizer, config, args.out)
+        print(f"Wrote {args.out} ({os.path.getsize(args.out) / 2**20:.1f} MB)")
+    else:
+        benchmark_cold_start(args.model_dir, args.bundle, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Content-addressed result cache for parse_resume_hybrid / parse_job_poster (batched).
+
+Results are keyed by sha256(model fingerprint, parser namespace, normalized text). The namespace
+names every parse option that changes the output (document type, max_len, hybrid, windowing), so
+results computed with other options are never reused. The in-memory tier is an LRU bounded by the
+encoded size of the stored results; the optional SQLite tier keeps results across restarts and
+processes. Changing the fingerprint (a new checkpoint was loaded) drops the memory tier and deletes
+disk rows of other fingerprints, so stale results are never served.
+
+Usage:
+  cache = ResultCache(max_bytes=64 << 20, sqlite_path="ner_cache.sqlite")
+  parse = CachedParser(
+      lambda texts: parse_resumes_batch(texts, tokenizer, model, device, id2label, 512, hybrid=True),
+      model_fingerprint("resume_ner"), cache, namespace="resume:max_len=512:hybrid=True:window_stride=128",
+  )
+  results = parse(texts)   # only texts not in the cache reach the model
+  cache.stats()
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from bert_bilstm_crf_pipeline import file_sha256
+
+# Files of a model directory that determine its outputs (tokenizer files that exist are included)
+MODEL_FILES = ("bert_bilstm_crf_state.pt", "ner_config.json", "tokenizer.json", "vocab.txt", "tokenizer_config.json")
+
+
+def normalize_text(text):
+    """
+    Collapse whitespace runs inside each line and drop blank lines. Words (\\S+), the line-based
+    NAME heuristic and EMAIL rules see the same input, so resume results are unchanged.
+    """
+    lines = (" ".join(line.split()) for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def model_fingerprint(path):
+    """Content hash of a model bundle file, or of the output-relevant files of a model directory."""
+    if os.path.isfile(path):
+        return file_sha256(path)
+    h = hashlib.sha256()
+    for name in MODEL_FILES:
+        file_path = os.path.join(path, name)
+        if os.path.exists(file_path):
+            h.update(name.encode("utf-8") + b"\0" + file_sha256(file_path).encode("ascii"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serialisable results. Memory: LRU evicting least recently used entries
+    once the encoded results exceed max_bytes. Disk (sqlite_path set): every put is also written
+    there and memory misses are looked up there (and promoted). Caches sharing one SQLite file need
+    their own `table` (e.g. one per model). Thread-safe.
+    """
+
+    def __init__(self, max_bytes=64 << 20, sqlite_path=None, fingerprint=None, table="results"):
+        if not table.isidentifier():
+            raise ValueError(f"invalid table name {table!r}")
+        self.max_bytes = max_bytes
+        self.table = table
+        self.fingerprint = fingerprint
+        self._memory = OrderedDict()  # key -> encoded result
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, value BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+        self.metrics = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def key(self, namespace, text):
+        payload = "\0".join((self.fingerprint or "", namespace, normalize_text(text)))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def set_fingerprint(self, fingerprint):
+        """Switch to a new model; on change drop the memory tier and other models' disk rows."""
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self.fingerprint = fingerprint
+            self._memory.clear()
+            self._bytes = 0
+            self.metrics["invalidations"] += 1
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE fingerprint != ?", (fingerprint,))
+                self._db.commit()
+
+    def _remember(self, key, encoded):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(encoded) > self.max_bytes:
+            return
+        self._memory[key] = encoded
+        self._bytes += len(encoded)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.metrics["evictions"] += 1
+
+    def get(self, key):
+        """Cached result for `key` (a fresh copy), or None."""
+        with self._lock:
+            encoded = self._memory.get(key)
+            if encoded is not None:
+                self._memory.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return json.loads(encoded)
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value FROM {self.table} WHERE key = ? AND fingerprint = ?", (key, self.fingerprint or "")
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, bytes(row[0]))
+                    self.metrics["disk_hits"] += 1
+                    return json.loads(row[0])
+            self.metrics["misses"] += 1
+            return None
+
+    def put_many(self, items):
+        """Store (key, result) pairs; one disk transaction for all of them."""
+        encoded = [(key, json.dumps(value, ensure_ascii=False).encode("utf-8")) for key, value in items]
+        with self._lock:
+            for key, data in encoded:
+                self._remember(key, data)
+            if self._db is not None and encoded:
+                now = time.time()
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, fingerprint, value, created) VALUES (?, ?, ?, ?)",
+                    [(key, self.fingerprint or "", data, now) for key, data in encoded],
+                )
+                self._db.commit()
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.metrics["memory_hits"] + self.metrics["disk_hits"] + self.metrics["misses"]
+            hits = lookups - self.metrics["misses"]
+            return dict(
+                self.metrics,
+                hit_rate=hits / lookups if lookups else 0.0,
+                memory_entries=len(self._memory),
+                memory_bytes=self._bytes,
+                disk_entries=self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] if self._db else None,
+            )
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class CachedParser:
+    """
+    Wrap a batch parse function texts -> [(words, tags, entities)] with a ResultCache.
+    Switches the cache to `fingerprint` on construction (so building one per loaded model
+    invalidates the previous model's results). Misses are normalized, deduplicated and parsed in
+    one call; results come back as tuples in input order.
+    """
+
+    def __init__(self, parse_batch, fingerprint, cache, namespace=""):
+        self.parse_batch = parse_batch
+        self.fingerprint = fingerprint
+        self.cache = cache
+        self.namespace = namespace
+        cache.set_fingerprint(fingerprint)
+
+    def __call__(self, texts):
+        if self.cache.fingerprint != self.fingerprint:
+            raise RuntimeError("ResultCache now belongs to another model; build a new CachedParser")
+        keys = [self.cache.key(self.namespace, text) for text in texts]
+        results = [None] * len(texts)
+        missing = OrderedDict()  # key -> normalized text, first occurrence order
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key) if key not in missing else None
+            if cached is not None:
+                results[i] = tuple(cached)
+            elif key not in missing:
+                missing[key] = normalize_text(texts[i])
+        if missing:
+            parsed = dict(zip(missing, self.parse_batch(list(missing.values()))))
+            self.cache.put_many([(key, list(value)) for key, value in parsed.items()])
+            for i, key in enumerate(keys):
+                if results[i] is None:
+                    words, tags, entities = parsed[key]
+                    results[i] = (list(words), list(tags), json.loads(json.dumps(entities)))
+        return results
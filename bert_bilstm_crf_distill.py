@@ -0,0 +1,255 @@
+"""
+Knowledge distillation of a trained BERT-BiLSTM-CRF teacher into a smaller student.
+
+The student keeps the teacher's tokenizer and label set but has a shallower BERT (e.g. 4 or 6 of
+the 12 layers) and optionally a narrower BiLSTM. It starts from the teacher's weights: embeddings,
+evenly spaced encoder layers, and the BiLSTM / hidden2tag / CRF when their sizes match. Training on
+the same merged JSONL minimises
+
+    alpha * CRF NLL(gold tags) + (1 - alpha) * T^2 * CE(teacher marginals, student marginals)
+
+where the marginals are CRF forward-backward posteriors P(y_i | x) of emissions / T, so the student
+learns the teacher's uncertainty and transition behaviour, not only its argmax.
+
+The student is written as a single-file bundle (save_model_bundle; load_bert_bilstm_crf, the server
+and the pool accept it) plus <out>.report.json with teacher / student F1 on the validation split,
+F1 retention and batch-1 CPU speedup.
+
+Usage:
+  python bert_bilstm_crf_distill.py --teacher resume_ner --data merged_resume_ner.json \\
+      --out resume_ner_L4.bundle --layers 4 --epochs 3
+  python bert_bilstm_crf_distill.py --teacher resume_ner.bundle --data merged_resume_ner.json \\
+      --out resume_ner_L6_h128.bundle --layers 6 --hidden-dim 128
+"""
+
+import argparse
+import json
+import time
+
+import torch
+from torch.utils.data import DataLoader
+
+from bert_bilstm_crf_pipeline import (
+    LABEL_MAPPING,
+    BertBatchCollator,
+    BertBiLSTMCRF,
+    BertBiLSTMCRFDataset,
+    LengthBucketBatchSampler,
+    autocast_context,
+    build_splits_from_data,
+    evaluate_bert_bilstm_crf,
+    load_bert_bilstm_crf,
+    load_jsonl,
+    save_model_bundle,
+)
+from bert_bilstm_crf_quantize import entity_scores, measure_latency
+
+
+def student_layer_ids(teacher_layers, student_layers):
+    """Evenly spaced teacher encoder layers, always ending with the last one (12 -> 4: 2, 5, 8, 11)."""
+    if not 1 <= student_layers <= teacher_layers:
+        raise ValueError(f"student_layers must be in 1..{teacher_layers}, got {student_layers}")
+    return [round((i + 1) * teacher_layers / student_layers) - 1 for i in range(student_layers)]
+
+
+def build_student(teacher, config, num_layers=4, hidden_dim=None):
+    """
+    Student BertBiLSTMCRF with `num_layers` BERT layers initialised from the teacher. hidden_dim
+    (BiLSTM output size) defaults to the teacher's; the BiLSTM and hidden2tag are copied only
+    when it matches, the CRF always.
+    """
+    teacher_hidden = teacher.lstm.hidden_size * 2
+    hidden_dim = hidden_dim or teacher_hidden
+    bert_config = teacher.bert.config.to_dict()
+    bert_config["num_hidden_layers"] = num_layers
+    student = BertBiLSTMCRF(
+        bert_name=config["bert_name"],
+        hidden_dim=hidden_dim,
+        num_labels=config["num_labels"],
+        pack_sequences=teacher.pack_sequences,
+        bert_config=bert_config,
+    )
+    layer_ids = student_layer_ids(teacher.bert.config.num_hidden_layers, num_layers)
+    state = {}
+    for name, value in teacher.state_dict().items():
+        if name.startswith("bert.encoder.layer."):
+            index, rest = name[len("bert.encoder.layer."):].split(".", 1)
+            if int(index) in layer_ids:
+                state[f"bert.encoder.layer.{layer_ids.index(int(index))}.{rest}"] = value
+        elif name.startswith(("lstm.", "hidden2tag.")) and hidden_dim != teacher_hidden:
+            continue
+        else:
+            state[name] = value
+    missing, unexpected = student.load_state_dict(state, strict=False)
+    if unexpected:
+        raise KeyError(f"Unexpected teacher tensors for the student: {unexpected[:5]}")
+    print(f"Student: {num_layers} BERT layers (teacher layers {layer_ids}), BiLSTM {hidden_dim}; "
+          f"{len(missing)} tensors freshly initialised")
+    return student
+
+
+def distillation_loss(student, teacher, input_ids, attention_mask, labels, lengths, alpha=0.5, temperature=1.0):
+    """
+    alpha * gold CRF NLL + (1 - alpha) * T^2 * token-mean cross-entropy between the teacher's and
+    the student's CRF marginals (both computed on emissions / T). Returns (loss, hard, soft).
+    """
+    mask = attention_mask.bool()
+    with torch.no_grad():
+        teacher_emissions = teacher.emissions(input_ids, attention_mask, lengths).float()
+    emissions = student.emissions(input_ids, attention_mask, lengths)
+    with torch.autocast(device_type=emissions.device.type, enabled=False):
+        emissions = emissions.float()
+        tags = labels.masked_fill(labels == -100, 0)
+        hard = -student.crf(emissions, tags, mask=mask, reduction="mean")
+        with torch.no_grad():
+            target = teacher.crf.marginals(teacher_emissions / temperature, mask=mask)
+        log_probs = student.crf.log_marginals(emissions / temperature, mask=mask)
+        soft = -(target * log_probs).sum(dim=2).masked_select(mask).mean() * temperature**2
+    return alpha * hard + (1 - alpha) * soft, hard, soft
+
+
+def micro_f1(model, loader, device, id2label):
+    scores = entity_scores(*evaluate_bert_bilstm_crf(model, loader, device, id2label))
+    return scores.get("micro avg", {}).get("f1-score", 0.0), scores
+
+
+def distill(
+    teacher_path,
+    data_path,
+    out_path,
+    num_layers=4,
+    hidden_dim=None,
+    epochs=3,
+    batch_size=8,
+    max_tokens_per_batch=None,
+    lr=5e-5,
+    alpha=0.5,
+    temperature=1.0,
+    max_length=512,
+    device=None,
+    precision="fp32",
+    latency_lengths=(128, 512),
+):
+    """
+    Train a student from the teacher on the train split of `data_path` (build_splits_from_data,
+    same seed as training), save it as a bundle at `out_path` and return the report dict (also
+    written to <out_path>.report.json).
+    """
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device = torch.device(device)
+    teacher, tokenizer, config = load_bert_bilstm_crf(teacher_path, device)
+    if config.get("quantization"):
+        raise ValueError("Distil from the fp32 teacher, not a quantized model")
+    id2label = config["id2label"]
+    for p in teacher.parameters():
+        p.requires_grad_(False)
+    student = build_student(teacher, config, num_layers, hidden_dim).to(device)
+
+    train_sents, train_labels, val_sents, val_labels, _, _ = build_splits_from_data(load_jsonl(data_path), LABEL_MAPPING)
+    train_ds = BertBiLSTMCRFDataset(train_sents, train_labels, tokenizer, max_length)
+    val_ds = BertBiLSTMCRFDataset(val_sents, val_labels, tokenizer, max_length)
+    print(f"Train: {len(train_ds)}, Val: {len(val_ds)}")
+    collator = BertBatchCollator(pin_memory=device.type == "cuda", return_lengths=True)
+    sampler = LengthBucketBatchSampler(
+        train_ds.lengths(),
+        batch_size=None if max_tokens_per_batch is not None else batch_size,
+        max_tokens=max_tokens_per_batch,
+    )
+    train_loader = DataLoader(train_ds, batch_sampler=sampler, collate_fn=collator)
+    val_loader = DataLoader(val_ds, batch_size=batch_size, collate_fn=collator)
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr)
+    for epoch in range(epochs):
+        student.train()
+        sampler.set_epoch(epoch)
+        totals = [0.0, 0.0, 0.0]
+        n = 0
+        start = time.perf_counter()
+        for input_ids, attention_mask, labels, lengths in train_loader:
+            input_ids = input_ids.to(device, non_blocking=True)
+            attention_mask = attention_mask.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True)
+            with autocast_context(device, precision):
+                losses = distillation_loss(
+                    student, teacher, input_ids, attention_mask, labels, lengths, alpha, temperature
+                )
+            optimizer.zero_grad()
+            losses[0].backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            totals = [t + l.item() for t, l in zip(totals, losses)]
+            n += 1
+        n = max(n, 1)
+        print(f"Epoch {epoch + 1}/{epochs} Loss: {totals[0] / n:.4f} (hard {totals[1] / n:.4f}, "
+              f"soft {totals[2] / n:.4f}) {time.perf_counter() - start:.0f} s")
+
+    student.eval()
+    save_model_bundle(student, tokenizer, config, out_path)
+    teacher_f1, teacher_scores = micro_f1(teacher, val_loader, device, id2label)
+    student_f1, student_scores = micro_f1(student, val_loader, device, id2label)
+    teacher_ms = measure_latency(teacher.cpu(), tokenizer, latency_lengths)
+    student_ms = measure_latency(student.cpu(), tokenizer, latency_lengths)
+    report = {
+        "teacher": teacher_path,
+        "student": {"num_layers": num_layers, "hidden_dim": student.lstm.hidden_size * 2,
+                    "params_m": sum(p.numel() for p in student.parameters()) / 1e6},
+        "teacher_params_m": sum(p.numel() for p in teacher.parameters()) / 1e6,
+        "training": {"epochs": epochs, "alpha": alpha, "temperature": temperature, "lr": lr},
+        "val_f1": {"teacher": teacher_f1, "student": student_f1,
+                   "retention": student_f1 / teacher_f1 if teacher_f1 else None},
+        "val_entities": {
+            entity: {"teacher": row["f1-score"], "student": student_scores.get(entity, {}).get("f1-score", 0.0)}
+            for entity, row in teacher_scores.items()
+        },
+        "latency_ms": {
+            length: {"teacher": teacher_ms[length], "student": student_ms[length],
+                     "speedup": teacher_ms[length] / student_ms[length]}
+            for length in latency_lengths
+        },
+    }
+    with open(out_path + ".report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def print_report(report):
+    s = report["student"]
+    print(f"Student: {s['num_layers']} layers, BiLSTM {s['hidden_dim']}, "
+          f"{s['params_m']:.1f}M params (teacher {report['teacher_params_m']:.1f}M)")
+    f1 = report["val_f1"]
+    retention = f"{f1['retention']:.1%}" if f1["retention"] is not None else "n/a"
+    print(f"Val micro F1: teacher {f1['teacher']:.4f}  student {f1['student']:.4f}  retention {retention}")
+    for entity, row in report["val_entities"].items():
+        print(f"  {entity:<22} {row['teacher']:.4f} -> {row['student']:.4f}")
+    for length, row in report["latency_ms"].items():
+        print(f"  {length:>4} tokens: teacher {row['teacher']:7.1f} ms  student {row['student']:7.1f} ms  "
+              f"({row['speedup']:.1f}x)")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Distil a BERT-BiLSTM-CRF teacher into a smaller student bundle")
+    p.add_argument("--teacher", required=True, help="Teacher model directory or bundle")
+    p.add_argument("--data", required=True, help="Merged JSONL the teacher was trained on")
+    p.add_argument("--out", required=True, help="Student bundle to write (report: <out>.report.json)")
+    p.add_argument("--layers", type=int, default=4, help="Student BERT layers")
+    p.add_argument("--hidden-dim", type=int, default=None, help="Student BiLSTM size (default: teacher's)")
+    p.add_argument("--epochs", type=int, default=3)
+    p.add_argument("--batch-size", type=int, default=8)
+    p.add_argument("--max-tokens", type=int, default=None, help="Token budget per batch instead of --batch-size")
+    p.add_argument("--lr", type=float, default=5e-5)
+    p.add_argument("--alpha", type=float, default=0.5, help="Weight of the gold CRF loss (rest: teacher marginals)")
+    p.add_argument("--temperature", type=float, default=1.0)
+    p.add_argument("--max-length", type=int, default=512)
+    p.add_argument("--device", default=None)
+    p.add_argument("--precision", choices=["fp32", "bf16"], default="fp32")
+    args = p.parse_args()
+    report = distill(
+        args.teacher, args.data, args.out, args.layers, args.hidden_dim, args.epochs, args.batch_size,
+        args.max_tokens, args.lr, args.alpha, args.temperature, args.max_length, args.device, args.precision,
+    )
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Run a saved BERT-BiLSTM-CRF model over a folder of resumes / job posters and stream one JSON
+result per document to a JSONL file.
+
+Inputs are files or directories (searched recursively for --ext, default .xml and .txt). Dotin
+XML files (545_cvs_train_v2, set_aside_test_v2_50cvs) are converted to plain text with
+_xml_to_item from resume_ner_pipeline/prepare_data.py, so the model sees exactly the training
+content; other files are read as text. Files are read lazily, --batch-size documents at a time,
+and each batch goes through parse_resumes_batch / parse_job_posters_batch (one length-bucketed
+pass). Results are appended and flushed per batch, so an interrupted run can be restarted with the
+same command: documents already in --out are skipped (a partially written last line is dropped).
+Files are identified by their real absolute path, so a restart matches them however the inputs
+were spelled (relative or absolute, through symlinks, from another working directory).
+
+Output lines: {"file": <absolute path>, "entities": {...}} (plus "words" and "tags" with --with-tags), or
+{"file": ..., "error": ...} for files that could not be read. At the end docs/s, tokens/s (words
+tagged) and document latency percentiles (time from a batch starting to its results being written)
+are printed. --metrics-out also times each pipeline stage (bert_bilstm_crf_metrics) and writes
+the histograms there, with a per-stage breakdown.
+
+Usage:
+  python bert_bilstm_crf_extract.py --model resume_ner.bundle --out set_aside_results.jsonl \\
+      --input resume_ner_pipeline/set_aside_test_v2_50cvs --hybrid
+  python bert_bilstm_crf_extract.py --model job_poster_ner --kind job_poster --input posters/ --out posters.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from bert_bilstm_crf_metrics import disable_stage_metrics, enable_stage_metrics, print_breakdown
+from bert_bilstm_crf_pipeline import load_bert_bilstm_crf, parse_job_posters_batch, parse_resumes_batch
+from resume_ner_pipeline.prepare_data import _xml_to_item
+
+PARSERS = {"resume": parse_resumes_batch, "job_poster": parse_job_posters_batch}
+
+
+def iter_input_files(inputs, extensions=(".xml", ".txt")):
+    """
+    Files given directly, plus files under given directories with one of `extensions` (sorted).
+    Paths are yielded as os.path.realpath, the form written to and matched against the "file" field.
+    """
+    for path in inputs:
+        if os.path.isfile(path):
+            yield os.path.realpath(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(tuple(extensions)):
+                    yield os.path.realpath(os.path.join(root, name))
+
+
+def read_document(path):
+    """Plain text of one input file; Dotin XML goes through _xml_to_item (labels stripped)."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    if path.lower().endswith(".xml"):
+        item = _xml_to_item(raw)
+        return item["content"] if item else ""
+    return raw
+
+
+def completed_files(out_path):
+    """
+    "file" of every complete line already in out_path, as os.path.realpath (relative paths written
+    by older runs resolve against the current directory). A last line without a newline (the run
+    was killed mid-write) is truncated away so appending continues on a clean line.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        if line.strip():
+            done.add(os.path.realpath(json.loads(line)["file"]))
+    return done
+
+
+def iter_batches(paths, batch_size):
+    """(paths, texts, errors) groups of up to batch_size readable documents; unreadable files go to errors."""
+    batch_paths, texts, errors = [], [], []
+    for path in paths:
+        try:
+            texts.append(read_document(path))
+            batch_paths.append(path)
+        except OSError as err:
+            errors.append((path, str(err)))
+        if len(batch_paths) >= batch_size:
+            yield batch_paths, texts, errors
+            batch_paths, texts, errors = [], [], []
+    if batch_paths or errors:
+        yield batch_paths, texts, errors
+
+
+def extract_directory(
+    model_path,
+    inputs,
+    out_path,
+    kind="resume",
+    hybrid=False,
+    batch_size=16,
+    max_len=512,
+    device=None,
+    with_tags=False,
+    extensions=(".xml", ".txt"),
+):
+    """Stream every input document through the model into out_path (resumable); returns throughput stats."""
+    model, tokenizer, config = load_bert_bilstm_crf(model_path, device)
+    device = next(model.parameters()).device if device is None else device
+    parse = PARSERS[kind]
+    done = completed_files(out_path)
+    todo = (p for p in iter_input_files(inputs, extensions) if p not in done)
+    if done:
+        print(f"Resuming: {len(done)} documents already in {out_path}")
+    latencies, docs, tokens = [], 0, 0
+    start = time.perf_counter()
+    with open(out_path, "a", encoding="utf-8") as out:
+        for n, (paths, texts, errors) in enumerate(iter_batches(todo, batch_size), 1):
+            t0 = time.perf_counter()
+            results = parse(texts, tokenizer, model, device, config["id2label"], max_len, hybrid=hybrid) if texts else []
+            lines = []
+            for path, (words, tags, entities) in zip(paths, results):
+                record = {"file": path, "entities": entities}
+                if with_tags:
+                    record.update(words=words, tags=tags)
+                lines.append(json.dumps(record, ensure_ascii=False))
+                tokens += len(words)
+            lines.extend(json.dumps({"file": path, "error": error}) for path, error in errors)
+            out.write("".join(line + "\n" for line in lines))
+            out.flush()
+            latencies.extend([time.perf_counter() - t0] * len(paths))
+            docs += len(paths)
+            if n % 10 == 0:
+                print(f"{docs} documents, {docs / (time.perf_counter() - start):.1f} docs/s")
+    elapsed = time.perf_counter() - start
+    stats = {"documents": docs, "skipped": len(done), "seconds": elapsed,
+             "docs_per_s": docs / elapsed if docs else 0.0, "tokens_per_s": tokens / elapsed if docs else 0.0}
+    if latencies:
+        p50, p90, p99 = np.percentile(np.array(latencies) * 1000, [50, 90, 99])
+        stats.update(latency_ms={"p50": p50, "p90": p90, "p99": p99, "max": max(latencies) * 1000})
+    return stats
+
+
+def print_stats(stats):
+    print(f"{stats['documents']} documents in {stats['seconds']:.1f} s ({stats['skipped']} already done): "
+          f"{stats['docs_per_s']:.2f} docs/s, {stats['tokens_per_s']:.0f} tokens/s")
+    if "latency_ms" in stats:
+        lat = stats["latency_ms"]
+        print(f"Latency ms: p50 {lat['p50']:.0f}  p90 {lat['p90']:.0f}  p99 {lat['p99']:.0f}  max {lat['max']:.0f}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Extract entities from a directory of documents to JSONL")
+    p.add_argument("--model", required=True, help="Model directory or bundle")
+    p.add_argument("--input", required=True, nargs="+", help="Files and/or directories")
+    p.add_argument("--out", required=True, help="JSONL output (appended to; existing documents are skipped)")
+    p.add_argument("--kind", choices=sorted(PARSERS), default="resume")
+    p.add_argument("--hybrid", action="store_true", help="Rules for NAME/EMAIL (resume) or SALARY (job poster)")
+    p.add_argument("--batch-size", type=int, default=16, help="Documents per model call")
+    p.add_argument("--max-len", type=int, default=512)
+    p.add_argument("--device", default=None)
+    p.add_argument("--with-tags", action="store_true", help="Also write words and per-word tags")
+    p.add_argument("--ext", nargs="+", default=[".xml", ".txt"], help="File extensions to read from directories")
+    p.add_argument("--metrics-out", default=None, help="Write per-stage latency histograms (.json, else Prometheus text)")
+    args = p.parse_args()
+    metrics = enable_stage_metrics() if args.metrics_out else None
+    stats = extract_directory(
+        args.model, args.input, args.out, args.kind, args.hybrid, args.batch_size, args.max_len,
+        args.device, args.with_tags, tuple(e.lower() for e in args.ext),
+    )
+    print_stats(stats)
+    if metrics is not None:
+        disable_stage_metrics()
+        print_breakdown(metrics)
+        metrics.dump(args.metrics_out)
+
+
+if __name__ == "__main__":
+    main()
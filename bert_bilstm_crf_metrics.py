@@ -0,0 +1,176 @@
+"""
+Stage timing for the extraction path: where does parse time go?
+
+The pipeline times each stage of a parse call with stage_timer (time.perf_counter; CUDA stages are
+synchronised so kernel time lands in the right stage):
+
+  tokenize         WordPiece encoding and windowing (encode_word_windows_batch)
+  bert             BERT forward
+  bilstm           BiLSTM + dropout + hidden2tag
+  onnx_emissions   BERT + BiLSTM + hidden2tag for the ONNX Runtime engine
+  crf              Viterbi decoding
+  entities         tags_to_entities / job_poster_entities
+  rules            NAME / EMAIL (resume) or SALARY (job poster) rules in hybrid mode
+
+A stage is timed once per parse call, i.e. per document for parse_resume_hybrid and per batch for
+parse_*_batch (a micro-batch in the server). Other steps can be timed the same way, e.g. the LLM
+corrector: timed("agent", correct_entities_with_agent)(text=..., entities=...). The server adds
+"request" (end to end per HTTP request).
+
+Timing is off until enable_stage_metrics() installs an observer; while off, stage_timer returns a
+shared no-op context manager, so the instrumented code does no clock reads and no allocation.
+
+Usage:
+  metrics = enable_stage_metrics()
+  parse_resumes_batch(texts, tokenizer, model, device, hybrid=True)
+  print(metrics.prometheus_text())      # or metrics.dump("stages.prom") / metrics.dump("stages.json")
+
+  python bert_bilstm_crf_metrics.py --model resume_ner.bundle --data merged_resume_ner.json --hybrid
+  python bert_bilstm_crf_server.py --resume-model resume_ner --metrics    # GET /metrics
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from bert_bilstm_crf_pipeline import (
+    load_bert_bilstm_crf,
+    load_jsonl,
+    parse_job_posters_batch,
+    parse_resumes_batch,
+    set_stage_observer,
+    stage_timer,
+)
+
+PARSERS = {"resume": parse_resumes_batch, "job_poster": parse_job_posters_batch}
+
+# Histogram upper bounds in seconds (0.5 ms .. 30 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class StageHistograms:
+    """Per-stage latency histograms (cumulative buckets, sum, count, max). Thread-safe."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._stages = {}  # stage -> [bucket counts (+Inf last), sum, count, max]
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            row = self._stages.get(stage)
+            if row is None:
+                row = self._stages[stage] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            row[0][bisect_left(self.buckets, seconds)] += 1
+            row[1] += seconds
+            row[2] += 1
+            row[3] = max(row[3], seconds)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def snapshot(self):
+        """{stage: {count, sum_s, mean_ms, max_ms, buckets: {le: cumulative count}}}."""
+        with self._lock:
+            rows = {stage: (list(row[0]), row[1], row[2], row[3]) for stage, row in self._stages.items()}
+        out = {}
+        for stage, (counts, total, count, longest) in rows.items():
+            cumulative, running = {}, 0
+            for le, n in zip([f"{b:g}" for b in self.buckets] + ["+Inf"], counts):
+                running += n
+                cumulative[le] = running
+            out[stage] = {"count": count, "sum_s": total, "mean_ms": total / count * 1000 if count else 0.0,
+                          "max_ms": longest * 1000, "buckets": cumulative}
+        return out
+
+    def prometheus_text(self, name="ner_stage_seconds"):
+        """Prometheus text exposition format (version 0.0.4), one histogram labelled by stage."""
+        lines = [f"# HELP {name} Time spent in each stage of NER extraction.", f"# TYPE {name} histogram"]
+        for stage, row in sorted(self.snapshot().items()):
+            for le, n in row["buckets"].items():
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {n}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {row["sum_s"]:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {row["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the histograms to `path`: JSON snapshot for *.json, Prometheus text otherwise (atomic)."""
+        if path.endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.prometheus_text()
+        tmp = f"{path}.tmp-{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+
+def enable_stage_metrics(metrics=None):
+    """Start timing stages into `metrics` (a new StageHistograms by default); returns it."""
+    metrics = metrics or StageHistograms()
+    set_stage_observer(metrics.observe)
+    return metrics
+
+
+def disable_stage_metrics():
+    set_stage_observer(None)
+
+
+def timed(stage, fn):
+    """Wrap `fn` so each call is timed as `stage` (a no-op while timing is off)."""
+
+    def wrapper(*args, **kwargs):
+        with stage_timer(stage):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def print_breakdown(metrics):
+    """Table of stages by total time, with each stage's share of the timed total."""
+    rows = sorted(metrics.snapshot().items(), key=lambda item: -item[1]["sum_s"])
+    total = sum(row["sum_s"] for stage, row in rows if stage != "request") or 1.0
+    print(f"{'stage':<16}{'calls':>7}{'total s':>10}{'mean ms':>10}{'max ms':>10}{'share':>8}")
+    for stage, row in rows:
+        share = f"{row['sum_s'] / total:.1%}" if stage != "request" else ""
+        print(f"{stage:<16}{row['count']:>7}{row['sum_s']:>10.3f}{row['mean_ms']:>10.2f}{row['max_ms']:>10.1f}{share:>8}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Per-stage latency breakdown of NER extraction")
+    p.add_argument("--model", required=True, help="Model directory or bundle")
+    p.add_argument("--data", required=True, help="JSONL with 'content' per line")
+    p.add_argument("--limit", type=int, default=200)
+    p.add_argument("--batch-size", type=int, default=1, help="Documents per parse call (1 = per-request timing)")
+    p.add_argument("--kind", choices=sorted(PARSERS), default="resume")
+    p.add_argument("--hybrid", action="store_true")
+    p.add_argument("--max-len", type=int, default=512)
+    p.add_argument("--device", default=None)
+    p.add_argument("--out", default=None, help="Also write the histograms (.json, else Prometheus text)")
+    args = p.parse_args()
+
+    model, tokenizer, config = load_bert_bilstm_crf(args.model, args.device)
+    device = next(model.parameters()).device
+    texts = [d["content"] for d in load_jsonl(args.data)[: args.limit]]
+    parse = PARSERS[args.kind]
+    parse(texts[:1], tokenizer, model, device, config["id2label"], args.max_len, hybrid=args.hybrid)  # warm-up
+    metrics = enable_stage_metrics()
+    start = time.perf_counter()
+    for i in range(0, len(texts), args.batch_size):
+        parse(texts[i : i + args.batch_size], tokenizer, model, device, config["id2label"], args.max_len,
+              hybrid=args.hybrid)
+    elapsed = time.perf_counter() - start
+    disable_stage_metrics()
+    print(f"{len(texts)} documents in {elapsed:.1f} s, batch size {args.batch_size}")
+    print_breakdown(metrics)
+    if args.out:
+        metrics.dump(args.out)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
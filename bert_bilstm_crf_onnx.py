@@ -0,0 +1,256 @@
+"""
+ONNX export and ONNX Runtime CPU engine for BertBiLSTMCRF.
+
+The BERT + BiLSTM + linear emission graph is exported to ONNX with dynamic batch and sequence
+axes; the CRF is not part of the graph. Its transition matrices are saved next to it (crf.npz)
+and OnnxBertBiLSTMCRF decodes with a batched NumPy Viterbi, so inference needs no PyTorch.
+
+Usage:
+  python bert_bilstm_crf_onnx.py export --model-dir resume_ner --out resume_ner_onnx
+  python bert_bilstm_crf_onnx.py check --model-dir resume_ner --onnx-dir resume_ner_onnx --data merged_resume_ner.json
+  python bert_bilstm_crf_onnx.py bench --model-dir resume_ner --onnx-dir resume_ner_onnx
+
+  engine = OnnxBertBiLSTMCRF("resume_ner_onnx")
+  results = parse_resumes_batch(texts, engine.tokenizer, engine, "cpu", engine.id2label, hybrid=True)
+
+Requires `pip install onnx onnxruntime onnxscript`.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from transformers import BertTokenizerFast
+
+from bert_bilstm_crf_pipeline import load_bert_bilstm_crf, load_jsonl, parse_resume, parse_resumes_batch, stage_timer
+
+ONNX_FILE = "emissions.onnx"
+CRF_FILE = "crf.npz"
+
+
+class EmissionGraph(nn.Module):
+    """BertBiLSTMCRF up to the CRF: (input_ids, attention_mask) -> emissions [B, L, T]."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.emissions(input_ids, attention_mask, attention_mask.sum(dim=1))
+
+
+def _mark_output_dynamic(path):
+    # The exporter records the traced sequence length on the LSTM outputs and the emissions output;
+    # ONNX Runtime then warns on every call. Drop the intermediate shapes and name the output axes.
+    import onnx
+
+    proto = onnx.load(path, load_external_data=False)
+    del proto.graph.value_info[:]
+    dims = proto.graph.output[0].type.tensor_type.shape.dim
+    dims[0].dim_param, dims[1].dim_param = "batch", "seq"
+    onnx.save(proto, path)
+
+
+def export_onnx(model, tokenizer, config, out_dir, max_length=512):
+    """
+    Write out_dir/emissions.onnx (dynamic batch and sequence axes), out_dir/crf.npz (decode-time
+    start / transition / end scores, BIO constraints included), ner_config.json and the tokenizer.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    model = model.cpu().eval()
+    batch = torch.export.Dim("batch", max=4096)
+    seq = torch.export.Dim("seq", min=2, max=max_length)
+    input_ids = torch.full((2, 16), tokenizer.unk_token_id, dtype=torch.long)
+    attention_mask = torch.ones_like(input_ids)
+    attention_mask[1, 10:] = 0
+    # Eager attention exports as plain MatMul/Softmax; the SDPA decomposition adds IsNaN/Where
+    # guards that ONNX Runtime cannot fuse (~25% slower at 512 subwords)
+    attn = getattr(model.bert.config, "_attn_implementation", None)
+    if attn and hasattr(model.bert, "set_attn_implementation"):
+        model.bert.set_attn_implementation("eager")
+    try:
+        torch.onnx.export(
+            EmissionGraph(model),
+            (input_ids, attention_mask),
+            os.path.join(out_dir, ONNX_FILE),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["emissions"],
+            dynamic_shapes={"input_ids": {0: batch, 1: seq}, "attention_mask": {0: batch, 1: seq}},
+            dynamo=True,
+        )
+    finally:
+        if attn and hasattr(model.bert, "set_attn_implementation"):
+            model.bert.set_attn_implementation(attn)
+    _mark_output_dynamic(os.path.join(out_dir, ONNX_FILE))
+    crf = model.crf
+    start, transitions = crf._constrained()
+    np.savez(
+        os.path.join(out_dir, CRF_FILE),
+        start=start.detach().numpy(),
+        transitions=transitions.detach().numpy(),
+        end=crf.end_transitions.detach().numpy(),
+    )
+    saved = {k: v for k, v in config.items() if k != "id2label"}
+    saved["max_length"] = max_length
+    with open(os.path.join(out_dir, "ner_config.json"), "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=2)
+    tokenizer.save_pretrained(out_dir)
+    print(f"Exported {out_dir}/{ONNX_FILE} and {CRF_FILE}")
+
+
+def viterbi_decode_numpy(emissions, mask, start, transitions, end, pad_value=-1):
+    """
+    Batched Viterbi in NumPy, the same recursion as LinearChainCRF.decode.
+    emissions [B, L, T], mask [B, L] (prefix masks). Returns int64 paths [B, L], pad_value on padding.
+    """
+    batch, seq_len, _ = emissions.shape
+    mask = mask.astype(bool)
+    score = start + emissions[:, 0]
+    history = np.empty((max(seq_len - 1, 0), batch, len(start)), dtype=np.int64)
+    for i in range(1, seq_len):
+        cand = score[:, :, None] + transitions  # [B, from, to]
+        history[i - 1] = cand.argmax(axis=1)
+        best = np.take_along_axis(cand, history[i - 1][:, None, :], axis=1)[:, 0]
+        score = np.where(mask[:, i, None], best + emissions[:, i], score)
+    score = score + end
+    seq_ends = mask.sum(axis=1) - 1
+    cur = score.argmax(axis=1)
+    paths = np.full((batch, seq_len), pad_value, dtype=np.int64)
+    for i in range(seq_len - 1, -1, -1):
+        if i < seq_len - 1:
+            prev = np.take_along_axis(history[i], cur[:, None], axis=1)[:, 0]
+            cur = np.where(seq_ends > i, prev, cur)
+        paths[:, i] = np.where(seq_ends >= i, cur, pad_value)
+    return paths
+
+
+class OnnxBertBiLSTMCRF:
+    """
+    ONNX Runtime engine for an exported directory. Called like BertBiLSTMCRF without labels:
+    engine(input_ids, attention_mask) returns the Viterbi paths ([B, L] int64, -1 on padding), so it
+    can be passed as `model` to parse_resumes_batch / parse_job_posters_batch with device "cpu".
+    """
+
+    def __init__(self, onnx_dir, num_threads=None, providers=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("onnxruntime is not installed; pip install onnxruntime") from None
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(onnx_dir, ONNX_FILE), options, providers=providers or ["CPUExecutionProvider"]
+        )
+        crf = np.load(os.path.join(onnx_dir, CRF_FILE))
+        self.start, self.transitions, self.end = crf["start"], crf["transitions"], crf["end"]
+        with open(os.path.join(onnx_dir, "ner_config.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.id2label = {i: t for i, t in enumerate(self.config["tags"])}
+        self.tokenizer = BertTokenizerFast.from_pretrained(onnx_dir)
+
+    def eval(self):
+        return self
+
+    def emissions(self, input_ids, attention_mask):
+        feed = {
+            "input_ids": np.asarray(input_ids, dtype=np.int64),
+            "attention_mask": np.asarray(attention_mask, dtype=np.int64),
+        }
+        return self.session.run(["emissions"], feed)[0]
+
+    def __call__(self, input_ids, attention_mask, labels=None, lengths=None):
+        if labels is not None:
+            raise ValueError("OnnxBertBiLSTMCRF is inference-only")
+        mask = np.asarray(attention_mask)
+        # BERT and the BiLSTM are one ONNX graph, so they are timed as one stage
+        with stage_timer("onnx_emissions"):
+            emissions = self.emissions(input_ids, mask)
+        with stage_timer("crf"):
+            return viterbi_decode_numpy(emissions, mask, self.start, self.transitions, self.end)
+
+
+def check_onnx_parity(model, engine, tokenizer, texts, id2label, device="cpu"):
+    """
+    Compare the ONNX engine (batched) against PyTorch parse_resume (one document at a time).
+    Returns the indices of texts whose (words, tags, entities) differ; empty means identical.
+    """
+    batched = parse_resumes_batch(texts, tokenizer, engine, "cpu", id2label)
+    mismatches = []
+    for i, text in enumerate(texts):
+        if parse_resume(text, tokenizer, model, device, id2label) != batched[i]:
+            mismatches.append(i)
+    return mismatches
+
+
+def benchmark_onnx(model, engine, tokenizer, lengths=(64, 128, 256, 512), repeats=20, threads=None):
+    """
+    Batch-1 latency of PyTorch (emissions + CRF decode) vs ONNX Runtime (+ NumPy Viterbi) at several
+    subword lengths, on random word-piece ids. Prints and returns {length: (torch_ms, onnx_ms)}.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    model = model.cpu().eval()
+    rng = np.random.default_rng(0)
+    vocab = len(tokenizer)
+    results = {}
+    for length in lengths:
+        ids = rng.integers(1000, vocab, size=(1, length))
+        ids[0, 0], ids[0, -1] = tokenizer.cls_token_id, tokenizer.sep_token_id
+        input_ids = torch.from_numpy(ids)
+        attention_mask = torch.ones_like(input_ids)
+        timings = []
+        for run in (lambda: model(input_ids, attention_mask), lambda: engine(ids, np.ones_like(ids))):
+            with torch.inference_mode():
+                run()  # warm-up
+                t0 = time.perf_counter()
+                for _ in range(repeats):
+                    run()
+            timings.append((time.perf_counter() - t0) * 1000 / repeats)
+        results[length] = tuple(timings)
+        print(f"len {length:4d}: torch {timings[0]:7.1f} ms  onnx {timings[1]:7.1f} ms  ({timings[0] / timings[1]:.2f}x)")
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(description="Export BertBiLSTMCRF to ONNX and check / benchmark the ONNX Runtime engine")
+    sub = p.add_subparsers(dest="command", required=True)
+    ex = sub.add_parser("export", help="Export a saved model directory")
+    ex.add_argument("--model-dir", required=True, help="Directory with bert_bilstm_crf_state.pt, ner_config.json, tokenizer")
+    ex.add_argument("--out", required=True, help="Output directory for the ONNX engine")
+    ex.add_argument("--max-length", type=int, default=512)
+    ck = sub.add_parser("check", help="Tag parity of the ONNX engine against PyTorch parse_resume")
+    ck.add_argument("--model-dir", required=True)
+    ck.add_argument("--onnx-dir", required=True)
+    ck.add_argument("--data", required=True, help="JSONL with 'content' per line")
+    ck.add_argument("--limit", type=int, default=200)
+    bn = sub.add_parser("bench", help="Batch-1 latency, PyTorch vs ONNX Runtime")
+    bn.add_argument("--model-dir", required=True)
+    bn.add_argument("--onnx-dir", required=True)
+    bn.add_argument("--lengths", type=int, nargs="+", default=[64, 128, 256, 512])
+    bn.add_argument("--repeats", type=int, default=20)
+    bn.add_argument("--threads", type=int, default=None)
+    args = p.parse_args()
+
+    model, tokenizer, config = load_bert_bilstm_crf(args.model_dir, "cpu")
+    if args.command == "export":
+        export_onnx(model, tokenizer, config, args.out, args.max_length)
+        return
+    engine = OnnxBertBiLSTMCRF(args.onnx_dir, num_threads=getattr(args, "threads", None))
+    if args.command == "check":
+        texts = [d["content"] for d in load_jsonl(args.data)[: args.limit]]
+        mismatches = check_onnx_parity(model, engine, tokenizer, texts, config["id2label"])
+        print(f"{len(texts) - len(mismatches)}/{len(texts)} documents identical")
+        if mismatches:
+            print("Mismatched indices:", mismatches[:20])
+    else:
+        benchmark_onnx(model, engine, tokenizer, args.lengths, args.repeats, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,18 +10,25 @@ Usage in Colab:
 Or paste this file's contents into notebook cells.
 """
 
+import contextlib
+import hashlib
+import json
+import os
+import pickle
 import re
 import random
+import resource
+import shutil
+import tempfile
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
-from transformers import BertModel, BertTokenizer
-
-# Try torchcrf; if not installed: pip install pytorch-crf
-try:
-    from torchcrf import CRF
-except ImportError:
-    CRF = None  # fallback: use simple cross-entropy if CRF not available
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+from torch.utils.data import Dataset, DataLoader, Sampler
+from transformers import BertConfig, BertModel, BertTokenizer, BertTokenizerFast
 
 # --- Label and tag setup (must match notebook) ---
 LABEL_MAPPING = {
@@ -36,6 +43,14 @@ LABEL_MAPPING = {
     "Years of Experience": "EXPERIENCE",
     "Location": "O",
     "UNKNOWN": "O",
+    # Already-unified labels (merged_resume_ner.json, job-poster JSONL) map to themselves
+    "NAME": "NAME",
+    "EMAIL": "EMAIL",
+    "SKILL": "SKILL",
+    "OCCUPATION": "OCCUPATION",
+    "EDUCATION": "EDUCATION",
+    "EXPERIENCE": "EXPERIENCE",
+    "O": "O",
 }
 
 TAGS = [
@@ -48,6 +63,17 @@ ID2LABEL = {i: t for i, t in enumerate(TAGS)}
 NUM_LABELS = len(TAGS)
 
 
+def load_jsonl(path):
+    """Read JSONL: one JSON object per line."""
+    data = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                data.append(json.loads(line))
+    return data
+
+
 def tokenize_with_positions(text):
     """Tokenize into words with (start, end) character positions."""
     tokens = []
@@ -61,7 +87,11 @@ def create_bio_tags_fixed(tokens, annotations):
     Create BIO labels; skip entities with label 'O' (no B-O / I-O).
     tokens: list of (text, start, end)
     annotations: list of dicts with 'label' and 'points' (start, end).
+    Each span is mapped to its token range by bisecting the sorted token start/end offsets,
+    so cost is O((T + S) log T) instead of a full token scan per span.
     """
+    starts = [t[1] for t in tokens]
+    ends = [t[2] for t in tokens]
     bio_labels = ["O"] * len(tokens)
     for ann in annotations:
         if not ann.get("label"):
@@ -69,19 +99,38 @@ def create_bio_tags_fixed(tokens, annotations):
         entity_label = ann["label"][0]
         if entity_label == "O":
             continue
+        b_tag, i_tag = f"B-{entity_label}", f"I-{entity_label}"
         for point in ann.get("points", []):
             s, e = point["start"], point["end"]
-            first = True
-            for i, (_, ts, te) in enumerate(tokens):
-                if te <= s:
-                    continue
-                if ts >= e:
-                    break
-                bio_labels[i] = f"B-{entity_label}" if first else f"I-{entity_label}"
-                first = False
+            # First token with end > s, up to (excluding) first token with start >= e
+            lo = bisect_right(ends, s)
+            hi = bisect_left(starts, e)
+            if lo >= hi:
+                continue
+            bio_labels[lo] = b_tag
+            for i in range(lo + 1, hi):
+                bio_labels[i] = i_tag
     return bio_labels
 
 
+def create_bio_tags_batch(token_lists, annotation_lists):
+    """Tag a whole corpus: one BIO label list per (tokens, annotations) pair."""
+    return [
+        create_bio_tags_fixed(tokens, annotations)
+        for tokens, annotations in zip(token_lists, annotation_lists)
+    ]
+
+
+def _map_annotation_labels(annotations, label_mapping):
+    """Apply label_mapping to annotation labels (copies; the input item is not mutated)."""
+    anns = []
+    for a in annotations:
+        old_labels = a.get("label", [])
+        new_labels = [label_mapping.get(l, "O") for l in old_labels]
+        anns.append({"label": new_labels, "points": a.get("points", [])})
+    return anns
+
+
 def build_splits_from_data(data, label_mapping=None, train_ratio=0.8, val_ratio=0.1, seed=42):
     """
     Build train_sents, train_labels, val_sents, val_labels, test_sents, test_labels
@@ -89,25 +138,20 @@ def build_splits_from_data(data, label_mapping=None, train_ratio=0.8, val_ratio=
     """
     if label_mapping is None:
         label_mapping = LABEL_MAPPING
-    all_sents, all_labels = [], []
+    token_lists, annotation_lists = [], []
     for item in data:
         content = item.get("content", "")
         annotations = item.get("annotation", [])
         if not content or not annotations:
             continue
-        # Apply label_mapping to annotation labels
-        anns = []
-        for a in annotations:
-            old_labels = a.get("label", [])
-            new_labels = [label_mapping.get(l, "O") for l in old_labels]
-            anns.append({"label": new_labels, "points": a.get("points", [])})
+        anns = _map_annotation_labels(annotations, label_mapping)
         tokens = tokenize_with_positions(content)
         if not tokens:
             continue
-        labels = create_bio_tags_fixed(tokens, anns)
-        words = [t[0] for t in tokens]
-        all_sents.append(words)
-        all_labels.append(labels)
+        token_lists.append(tokens)
+        annotation_lists.append(anns)
+    all_sents = [[t[0] for t in tokens] for tokens in token_lists]
+    all_labels = create_bio_tags_batch(token_lists, annotation_lists)
 
     n = len(all_sents)
     random.seed(seed)
@@ -129,11 +173,85 @@ def build_splits_from_data(data, label_mapping=None, train_ratio=0.8, val_ratio=
     return train_sents, train_labels, val_sents, val_labels, test_sents, test_labels
 
 
-def align_labels_to_bert_tokenizer(words, word_labels, tokenizer, max_length=512):
+def iter_jsonl(path):
+    """Lazily yield one JSON object per non-empty line."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def hash_split(content, train_ratio=0.8, val_ratio=0.1, salt=""):
+    """
+    Stable split assignment from a hash of the document text: 'train', 'val' or 'test'.
+    The same content always lands in the same split, regardless of corpus order or size, so
+    appending new documents never moves old ones (and exact duplicates cannot leak across splits).
     """
-    Map word-level BIO labels to BERT subword positions.
+    digest = hashlib.blake2b((salt + content).encode("utf-8"), digest_size=8).digest()
+    u = int.from_bytes(digest, "big") / 2**64
+    if u < train_ratio:
+        return "train"
+    if u < train_ratio + val_ratio:
+        return "val"
+    return "test"
+
+
+def iter_tagged_examples(source, label_mapping=None, train_ratio=0.8, val_ratio=0.1, salt=""):
+    """
+    Streaming counterpart of build_splits_from_data: yields (split, words, labels) per document.
+    source: a JSONL path (read lazily) or any iterable of {'content', 'annotation'} dicts.
+    Only one document is held in memory at a time; splits come from hash_split.
+    """
+    if label_mapping is None:
+        label_mapping = LABEL_MAPPING
+    items = iter_jsonl(source) if isinstance(source, (str, os.PathLike)) else source
+    for item in items:
+        content = item.get("content", "")
+        annotations = item.get("annotation", [])
+        if not content or not annotations:
+            continue
+        tokens = tokenize_with_positions(content)
+        if not tokens:
+            continue
+        labels = create_bio_tags_fixed(tokens, _map_annotation_labels(annotations, label_mapping))
+        split = hash_split(content, train_ratio, val_ratio, salt)
+        yield split, [t[0] for t in tokens], labels
+
+
+def write_split_files(source, out_dir, label_mapping=None, train_ratio=0.8, val_ratio=0.1, salt=""):
+    """
+    Stream `source` through iter_tagged_examples into out_dir/{train,val,test}.jsonl, one
+    {"words": [...], "labels": [...]} object per line. Returns the per-split document counts.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {"train": 0, "val": 0, "test": 0}
+    files = {name: open(os.path.join(out_dir, f"{name}.jsonl"), "w", encoding="utf-8") for name in counts}
+    try:
+        for split, words, labels in iter_tagged_examples(source, label_mapping, train_ratio, val_ratio, salt):
+            files[split].write(json.dumps({"words": words, "labels": labels}, ensure_ascii=False) + "\n")
+            counts[split] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def read_split_file(path):
+    """Load a split file written by write_split_files -> (sentences, label_lists)."""
+    sents, labels = [], []
+    for obj in iter_jsonl(path):
+        sents.append(obj["words"])
+        labels.append(obj["labels"])
+    return sents, labels
+
+
+def align_labels_to_bert_tokenizer(words, word_labels, tokenizer, max_length=512, label2id=None):
+    """
+    Map word-level BIO labels to BERT subword positions (label2id defaults to the resume LABEL2ID).
     Returns: input_ids, attention_mask, aligned_label_ids (with -100 for non-first subwords and special tokens).
     """
+    label2id = label2id or LABEL2ID
     first_subword_indices = []
     subword_tokens = ["[CLS]"]
     for w in words:
@@ -149,7 +267,7 @@ def align_labels_to_bert_tokenizer(words, word_labels, tokenizer, max_length=512
     aligned = [-100] * len(input_ids)
     for pos, label in zip(first_subword_indices, word_labels):
         if pos < len(aligned):
-            aligned[pos] = LABEL2ID.get(label, LABEL2ID["O"])
+            aligned[pos] = label2id.get(label, label2id["O"])
 
     if len(input_ids) > max_length:
         input_ids = input_ids[: max_length - 1] + [tokenizer.sep_token_id]
@@ -159,18 +277,342 @@ def align_labels_to_bert_tokenizer(words, word_labels, tokenizer, max_length=512
     return input_ids, attention_mask, aligned
 
 
+def align_labels_batch(sentences, label_lists, tokenizer, max_length=512, batch_size=256, label2id=None):
+    """
+    Batched version of align_labels_to_bert_tokenizer for a whole corpus.
+    With a fast tokenizer (BertTokenizerFast) each chunk of `batch_size` word lists is encoded
+    in one call and labels are placed via word_ids(); otherwise falls back to the per-word path.
+    Returns a list of (input_ids, attention_mask, aligned) triples identical to the slow path.
+    """
+    label2id = label2id or LABEL2ID
+    if not getattr(tokenizer, "is_fast", False):
+        return [
+            align_labels_to_bert_tokenizer(words, labs, tokenizer, max_length, label2id)
+            for words, labs in zip(sentences, label_lists)
+        ]
+    out = []
+    for start in range(0, len(sentences), batch_size):
+        chunk_words = [list(w) for w in sentences[start : start + batch_size]]
+        chunk_labels = label_lists[start : start + batch_size]
+        enc = tokenizer(
+            chunk_words,
+            is_split_into_words=True,
+            add_special_tokens=True,
+            truncation=False,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        for j, (words, labs) in enumerate(zip(chunk_words, chunk_labels)):
+            word_ids = enc.word_ids(j)
+            first_subword_indices = []
+            prev = None
+            for pos, wid in enumerate(word_ids):
+                if wid is not None and wid != prev:
+                    first_subword_indices.append(pos)
+                prev = wid
+            if len(first_subword_indices) != len(words):
+                # A word produced no pieces (e.g. only control chars); the slow path maps it to [UNK]
+                out.append(align_labels_to_bert_tokenizer(words, labs, tokenizer, max_length, label2id))
+                continue
+            input_ids = list(enc["input_ids"][j])
+            attention_mask = [1] * len(input_ids)
+            aligned = [-100] * len(input_ids)
+            for pos, label in zip(first_subword_indices, labs):
+                aligned[pos] = label2id.get(label, label2id["O"])
+            if len(input_ids) > max_length:
+                input_ids = input_ids[: max_length - 1] + [tokenizer.sep_token_id]
+                attention_mask = attention_mask[: max_length - 1] + [1]
+                aligned = aligned[: max_length - 1] + [-100]
+            out.append((input_ids, attention_mask, aligned))
+    return out
+
+
+def word_piece_ids(words, tokenizer):
+    """Subword ids per word (no special tokens); words with no pieces map to [UNK] as in the slow path."""
+    return word_piece_ids_batch([words], tokenizer)[0]
+
+
+def word_piece_ids_batch(word_lists, tokenizer, batch_size=256):
+    """word_piece_ids for many documents; a fast tokenizer encodes `batch_size` documents per call."""
+    out = []
+    if not getattr(tokenizer, "is_fast", False):
+        for words in word_lists:
+            pieces = [tokenizer.convert_tokens_to_ids(tokenizer.tokenize(w)) for w in words]
+            out.append([p if p else [tokenizer.unk_token_id] for p in pieces])
+        return out
+    for start in range(0, len(word_lists), batch_size):
+        chunk = [list(w) for w in word_lists[start : start + batch_size]]
+        nonempty = [j for j, words in enumerate(chunk) if words]
+        enc = tokenizer([chunk[j] for j in nonempty], is_split_into_words=True, add_special_tokens=False) if nonempty else None
+        encoded = {j: k for k, j in enumerate(nonempty)}
+        for j, words in enumerate(chunk):
+            pieces = [[] for _ in words]
+            if words:
+                k = encoded[j]
+                ids = enc["input_ids"][k]
+                for pos, wid in enumerate(enc.word_ids(k)):
+                    if wid is not None:
+                        pieces[wid].append(ids[pos])
+            out.append([p if p else [tokenizer.unk_token_id] for p in pieces])
+    return out
+
+
+def compute_word_windows(piece_counts, max_length=512, stride=128):
+    """
+    Split a document into overlapping windows of whole words.
+    piece_counts: number of subwords per word. Each window holds at most max_length - 2 subwords
+    ([CLS]/[SEP] excluded); consecutive windows share up to `stride` subwords of trailing context.
+    Returns a list of (word_start, word_end) ranges covering every word; a single word longer than
+    the budget gets its own window and is truncated when encoded.
+    """
+    budget = max_length - 2
+    n = len(piece_counts)
+    windows = []
+    start = 0
+    while start < n:
+        end, total = start, 0
+        while end < n and total + piece_counts[end] <= budget:
+            total += piece_counts[end]
+            end += 1
+        if end == start:
+            end = start + 1
+        windows.append((start, end))
+        if end >= n:
+            break
+        # Step back from `end` to overlap at most `stride` subwords, always advancing by >= 1 word
+        nxt, overlap = end, 0
+        while nxt - 1 > start and overlap + piece_counts[nxt - 1] <= stride:
+            nxt -= 1
+            overlap += piece_counts[nxt]
+        start = nxt
+    return windows
+
+
+def encode_word_windows(words, tokenizer, max_length=512, stride=128):
+    """
+    Encode a document as overlapping windows for windowed training / inference.
+    Returns a list of (input_ids, first_subword_indices, (word_start, word_end)), where
+    first_subword_indices[k] is the position of word word_start + k inside that window.
+    """
+    return _windows_from_pieces(word_piece_ids(words, tokenizer), tokenizer, max_length, stride)
+
+
+def encode_word_windows_batch(word_lists, tokenizer, max_length=512, stride=128):
+    """
+    encode_word_windows for many documents (subwords from one batched tokenizer call).
+    stride=None: one window per document, truncated at max_length as in encode_resume_texts
+    (its span ends at the last word that still starts inside it).
+    """
+    return [
+        _windows_from_pieces(pieces, tokenizer, max_length, stride)
+        for pieces in word_piece_ids_batch(word_lists, tokenizer)
+    ]
+
+
+def _windows_from_pieces(pieces, tokenizer, max_length=512, stride=128):
+    if stride is None:
+        input_ids = [tokenizer.cls_token_id]
+        first_idx = []
+        for p in pieces:
+            first_idx.append(len(input_ids))
+            input_ids.extend(p)
+        input_ids.append(tokenizer.sep_token_id)
+        if len(input_ids) > max_length:
+            input_ids = input_ids[: max_length - 1] + [tokenizer.sep_token_id]
+            first_idx = [i for i in first_idx if i < len(input_ids)]
+        return [(input_ids, first_idx, (0, len(first_idx)))] if first_idx else []
+    budget = max_length - 2
+    encoded = []
+    for ws, we in compute_word_windows([len(p) for p in pieces], max_length, stride):
+        input_ids = [tokenizer.cls_token_id]
+        first_subword_indices = []
+        for p in pieces[ws:we]:
+            first_subword_indices.append(len(input_ids))
+            input_ids.extend(p[:budget])
+        input_ids.append(tokenizer.sep_token_id)
+        encoded.append((input_ids, first_subword_indices, (ws, we)))
+    return encoded
+
+
+def align_labels_windowed(words, word_labels, tokenizer, max_length=512, stride=128, label2id=None):
+    """
+    Windowed counterpart of align_labels_to_bert_tokenizer: instead of truncating at max_length,
+    returns one (input_ids, attention_mask, aligned) triple per overlapping window so every word
+    of a long resume is trained on.
+    """
+    label2id = label2id or LABEL2ID
+    samples = []
+    for input_ids, first_subword_indices, (ws, we) in encode_word_windows(
+        words, tokenizer, max_length, stride
+    ):
+        aligned = [-100] * len(input_ids)
+        for pos, label in zip(first_subword_indices, word_labels[ws:we]):
+            aligned[pos] = label2id.get(label, label2id["O"])
+        samples.append((input_ids, [1] * len(input_ids), aligned))
+    return samples
+
+
+def merge_window_tags(num_words, window_tags):
+    """
+    Merge per-window word tags into one tag per word.
+    window_tags: list of ((word_start, word_end), tags) with one tag per word in the range.
+    Overlap rule: a word takes the tag from the window where it has the most context on both
+    sides (max of min(distance to window start, distance to window end)); ties keep the earlier
+    window. Where the chosen window changes mid-entity, a dangling I-X is promoted to B-X.
+    """
+    best_score = [-1] * num_words
+    best_src = [-1] * num_words
+    merged = ["O"] * num_words
+    for src, ((ws, we), tags) in enumerate(window_tags):
+        for k, tag in enumerate(tags):
+            w = ws + k
+            score = min(w - ws, we - 1 - w)
+            if score > best_score[w]:
+                best_score[w] = score
+                best_src[w] = src
+                merged[w] = tag
+    for w in range(1, num_words):
+        tag = merged[w]
+        if best_src[w] != best_src[w - 1] and tag.startswith("I-"):
+            if merged[w - 1][2:] != tag[2:]:
+                merged[w] = "B-" + tag[2:]
+    return merged
+
+
+class EncodedSamples:
+    """
+    Compact sequence of (input_ids, attention_mask, aligned) samples stored as flat arrays:
+    input_ids (int32) and labels (int8, -100 = ignore) concatenated, plus an offsets index of
+    len(samples) + 1 entries. Indexing returns zero-copy NumPy views; the attention mask is a
+    view of a shared ones buffer, so it is never stored. Arrays loaded with mmap=True pickle as
+    their file location, so DataLoader workers re-open the map instead of copying the data.
+    """
+
+    def __init__(self, input_ids, labels, offsets, source=None):
+        self.input_ids = input_ids
+        self.labels = labels
+        self.offsets = offsets
+        self._source = source  # (directory, prefix) when memory-mapped from the cache
+        self._ones = np.ones(int(np.diff(offsets).max()) if len(offsets) > 1 else 0, dtype=np.int8)
+
+    @classmethod
+    def from_samples(cls, samples):
+        """Pack a list of (input_ids, attention_mask, aligned) list triples."""
+        lengths = [len(sample[0]) for sample in samples]
+        offsets = np.zeros(len(samples) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        total = int(offsets[-1])
+        input_ids = np.fromiter((i for sample in samples for i in sample[0]), dtype=np.int32, count=total)
+        labels = np.fromiter((l for sample in samples for l in sample[2]), dtype=np.int8, count=total)
+        return cls(input_ids, labels, offsets)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Join several EncodedSamples into one."""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.from_samples([])
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for p in parts:
+            offsets.append(np.asarray(p.offsets[1:]) + base)
+            base += int(p.offsets[-1])
+        return cls(
+            np.concatenate([np.asarray(p.input_ids) for p in parts]),
+            np.concatenate([np.asarray(p.labels) for p in parts]),
+            np.concatenate(offsets),
+        )
+
+    def save(self, directory, prefix):
+        np.save(os.path.join(directory, f"{prefix}_input_ids.npy"), self.input_ids)
+        np.save(os.path.join(directory, f"{prefix}_labels.npy"), self.labels)
+        np.save(os.path.join(directory, f"{prefix}_offsets.npy"), self.offsets)
+
+    @classmethod
+    def load(cls, directory, prefix, mmap=True):
+        mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(directory, f"{prefix}_input_ids.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, f"{prefix}_labels.npy"), mmap_mode=mode),
+            np.load(os.path.join(directory, f"{prefix}_offsets.npy"), mmap_mode=mode),
+            source=(directory, prefix) if mmap else None,
+        )
+
+    def __getstate__(self):
+        if self._source is not None:
+            return {"source": self._source}
+        return {"input_ids": self.input_ids, "labels": self.labels, "offsets": self.offsets}
+
+    def __setstate__(self, state):
+        if "source" in state:
+            loaded = EncodedSamples.load(*state["source"], mmap=True)
+            self.__dict__.update(loaded.__dict__)
+        else:
+            self.__init__(state["input_ids"], state["labels"], state["offsets"])
+
+    def nbytes(self):
+        return self.input_ids.nbytes + self.labels.nbytes + self.offsets.nbytes
+
+    def lengths(self):
+        return np.diff(self.offsets).tolist()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.input_ids[start:end], self._ones[: end - start], self.labels[start:end]
+
+
+class BertBatchCollator:
+    """
+    Collate (input_ids, attention_mask, label_ids) samples into padded LongTensors.
+    Output tensors are preallocated with torch.full and filled row by row in place (samples may be
+    Python lists or EncodedSamples NumPy views). pin_memory=True allocates them in page-locked
+    memory (CUDA only) so the training loop can use .to(device, non_blocking=True);
+    return_lengths=True appends a [B] tensor of per-sample lengths for sequence packing.
+    """
+
+    def __init__(self, pad_id=0, label_pad_id=-100, pin_memory=False, return_lengths=False):
+        self.pad_id = pad_id
+        self.label_pad_id = label_pad_id
+        self.pin_memory = pin_memory and torch.cuda.is_available()
+        self.return_lengths = return_lengths
+
+    def __call__(self, batch):
+        lengths = [len(b[0]) for b in batch]
+        shape = (len(batch), max(lengths))
+        input_ids = torch.full(shape, self.pad_id, dtype=torch.long, pin_memory=self.pin_memory)
+        attention_mask = torch.zeros(shape, dtype=torch.long, pin_memory=self.pin_memory)
+        labels = torch.full(shape, self.label_pad_id, dtype=torch.long, pin_memory=self.pin_memory)
+        # NumPy views share storage with the tensors, so slice assignment fills them in place
+        ids_np, mask_np, labels_np = input_ids.numpy(), attention_mask.numpy(), labels.numpy()
+        for row, (ids, mask, labs) in enumerate(batch):
+            ids_np[row, : lengths[row]] = ids
+            mask_np[row, : len(mask)] = mask
+            labels_np[row, : len(labs)] = labs
+        if self.return_lengths:
+            return input_ids, attention_mask, labels, torch.tensor(lengths, dtype=torch.long)
+        return input_ids, attention_mask, labels
+
+
+_default_collator = BertBatchCollator()
+
+
 def collate_bert_batch(batch):
     """Batch: list of (input_ids, attention_mask, label_ids). Pad to max_len in batch."""
+    return _default_collator(batch)
+
+
+def _collate_bert_batch_lists(batch):
+    """Previous list-concatenation collate; kept as the baseline for benchmark_collate."""
     max_len = max(len(b[0]) for b in batch)
-    pad_id = 0  # BERT pad_token_id
-    input_ids = []
-    attention_mask = []
-    labels = []
+    input_ids, attention_mask, labels = [], [], []
     for ids, mask, labs in batch:
         pad_len = max_len - len(ids)
-        input_ids.append(ids + [pad_id] * pad_len)
-        attention_mask.append(mask + [0] * pad_len)
-        labels.append(labs + [-100] * pad_len)
+        input_ids.append(list(ids) + [0] * pad_len)
+        attention_mask.append(list(mask) + [0] * pad_len)
+        labels.append(list(labs) + [-100] * pad_len)
     return (
         torch.tensor(input_ids, dtype=torch.long),
         torch.tensor(attention_mask, dtype=torch.long),
@@ -178,16 +620,61 @@ def collate_bert_batch(batch):
     )
 
 
+def benchmark_collate(batch_sizes=(8, 16, 32, 64), min_len=64, max_len=512, repeats=50, seed=0):
+    """
+    Micro-benchmark: list-concatenation collate vs BertBatchCollator on random-length samples,
+    both as Python lists (notebook datasets) and as EncodedSamples views (BertBiLSTMCRFDataset).
+    Prints and returns {batch_size: {variant: ms per batch}}.
+    """
+    rng = random.Random(seed)
+    collator = BertBatchCollator()
+    results = {}
+    for bs in batch_sizes:
+        triples = []
+        for _ in range(bs):
+            n = rng.randint(min_len, max_len)
+            triples.append(([rng.randint(1000, 30000) for _ in range(n)], [1] * n, [rng.randint(0, NUM_LABELS - 1) for _ in range(n)]))
+        encoded = EncodedSamples.from_samples(triples)
+        views = [encoded[i] for i in range(len(encoded))]
+        variants = {
+            "lists/old": (_collate_bert_batch_lists, triples),
+            "lists/new": (collator, triples),
+            "arrays/new": (collator, views),
+        }
+        results[bs] = {}
+        for name, (fn, batch) in variants.items():
+            fn(batch)  # warm-up
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                fn(batch)
+            results[bs][name] = (time.perf_counter() - t0) * 1000 / repeats
+        print(f"batch {bs:3d}: " + "  ".join(f"{k} {v:.3f} ms" for k, v in results[bs].items()))
+    return results
+
+
 class BertBiLSTMCRFDataset(Dataset):
-    def __init__(self, sentences, label_lists, tokenizer, max_length=512):
-        self.samples = []
-        for words, labs in zip(sentences, label_lists):
-            if len(words) != len(labs):
-                continue
-            input_ids, attention_mask, aligned = align_labels_to_bert_tokenizer(
-                words, labs, tokenizer, max_length
-            )
-            self.samples.append((input_ids, attention_mask, aligned))
+    """
+    Encoded (input_ids, attention_mask, aligned) samples, stored compactly as EncodedSamples.
+    With window_stride=None long documents are truncated at max_length (one sample per document);
+    with a stride they are split into overlapping windows (see align_labels_windowed).
+    """
+
+    def __init__(self, sentences, label_lists, tokenizer, max_length=512, window_stride=None, chunk_size=256):
+        pairs = [(w, l) for w, l in zip(sentences, label_lists) if len(w) == len(l)]
+        parts = []
+        # Encode in chunks so only one chunk of Python-list triples is alive at a time
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start : start + chunk_size]
+            if window_stride is None:
+                triples = align_labels_batch(
+                    [w for w, _ in chunk], [l for _, l in chunk], tokenizer, max_length
+                )
+            else:
+                triples = []
+                for words, labs in chunk:
+                    triples.extend(align_labels_windowed(words, labs, tokenizer, max_length, window_stride))
+            parts.append(EncodedSamples.from_samples(triples))
+        self.samples = EncodedSamples.concatenate(parts)
 
     def __len__(self):
         return len(self.samples)
@@ -195,13 +682,460 @@ class BertBiLSTMCRFDataset(Dataset):
     def __getitem__(self, i):
         return self.samples[i]
 
+    def lengths(self):
+        """Subword length of every sample (for LengthBucketBatchSampler)."""
+        return self.samples.lengths()
+
+    @classmethod
+    def from_samples(cls, samples):
+        """Wrap already-encoded samples: EncodedSamples (e.g. from the dataset cache) or list triples."""
+        ds = cls.__new__(cls)
+        ds.samples = samples if isinstance(samples, EncodedSamples) else EncodedSamples.from_samples(samples)
+        return ds
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Content hash of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dataset_cache_key(data_path, tokenizer, max_length=512, window_stride=None, label_mapping=None, split_params=None):
+    """
+    Cache key for an encoded corpus: content hash of the input file, tokenizer name and vocab,
+    max_length, window stride, TAGS, label mapping and split parameters.
+    """
+    vocab = sorted(tokenizer.get_vocab().items())
+    parts = {
+        "data": file_sha256(data_path),
+        "tokenizer": getattr(tokenizer, "name_or_path", type(tokenizer).__name__),
+        "vocab": hashlib.sha256(json.dumps(vocab).encode("utf-8")).hexdigest(),
+        "lowercase": getattr(tokenizer, "do_lower_case", None),
+        "max_length": max_length,
+        "window_stride": window_stride,
+        "tags": TAGS,
+        "label_mapping": sorted((label_mapping or LABEL_MAPPING).items()),
+        "split": split_params or {},
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+
+def load_cached_datasets(
+    data_path,
+    tokenizer,
+    cache_dir=".ner_cache",
+    max_length=512,
+    window_stride=None,
+    label_mapping=None,
+    train_ratio=0.8,
+    val_ratio=0.1,
+    seed=42,
+):
+    """
+    Return (train_ds, val_ds, test_ds) for a JSONL corpus, encoding it only on the first call.
+    Encoded splits are stored under cache_dir/<key>/ as .npy arrays and memory-mapped on later
+    runs, so training starts without re-reading JSONL, re-tagging or re-tokenizing. The cache
+    directory is written to a temp dir and renamed into place, so concurrent processes can share it.
+    """
+    split_params = {"train_ratio": train_ratio, "val_ratio": val_ratio, "seed": seed}
+    key = dataset_cache_key(data_path, tokenizer, max_length, window_stride, label_mapping, split_params)
+    target = os.path.join(cache_dir, key)
+    splits = ("train", "val", "test")
+    if not os.path.exists(os.path.join(target, "meta.json")):
+        data = load_jsonl(data_path)
+        train_s, train_l, val_s, val_l, test_s, test_l = build_splits_from_data(
+            data, label_mapping, train_ratio, val_ratio, seed
+        )
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=cache_dir)
+        try:
+            counts = {}
+            for name, sents, labs in zip(splits, (train_s, val_s, test_s), (train_l, val_l, test_l)):
+                ds = BertBiLSTMCRFDataset(sents, labs, tokenizer, max_length, window_stride)
+                ds.samples.save(tmp, name)
+                counts[name] = len(ds)
+            meta = {"key": key, "data_path": os.path.abspath(data_path), "max_length": max_length,
+                    "window_stride": window_stride, "tags": TAGS, "counts": counts}
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2)
+            os.rename(tmp, target)
+        except OSError:
+            # Another process finished the same cache first; use theirs
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(target, "meta.json")):
+                raise
+    else:
+        print(f"Using cached dataset {target}")
+    return tuple(BertBiLSTMCRFDataset.from_samples(EncodedSamples.load(target, name)) for name in splits)
+
+
+def padding_ratio(lengths, batches):
+    """Fraction of padded positions when `batches` (lists of indices) are padded to their longest member."""
+    total = padded = 0
+    for batch in batches:
+        if not batch:
+            continue
+        longest = max(lengths[i] for i in batch)
+        total += longest * len(batch)
+        padded += sum(longest - lengths[i] for i in batch)
+    return padded / total if total else 0.0
+
+
+class LengthBucketBatchSampler(Sampler):
+    """
+    Batch sampler that groups samples of similar subword length to cut padding.
+    Each epoch the indices are shuffled, cut into pools of `pool_factor` batches, each pool is
+    sorted by length and split into batches, and the batch order is shuffled again.
+    With max_tokens set, batches are filled until (longest length x batch size) would exceed
+    max_tokens; batch_size then only caps the sentence count (None = no cap).
+    Use as DataLoader(ds, batch_sampler=LengthBucketBatchSampler(ds.lengths(), ...), collate_fn=...)
+    and call set_epoch(epoch) before each epoch; the epoch (and so len()) only changes there.
+    """
+
+    def __init__(self, lengths, batch_size=8, max_tokens=None, shuffle=True, pool_factor=50, seed=42, drop_last=False):
+        if batch_size is None and max_tokens is None:
+            raise ValueError("Set batch_size, max_tokens, or both")
+        self.lengths = list(lengths)
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.shuffle = shuffle
+        self.pool_factor = pool_factor
+        self.seed = seed
+        self.drop_last = drop_last
+        self.epoch = 0
+        self._cache = None  # (epoch, batches)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _split_pool(self, pool):
+        batches, batch, longest = [], [], 0
+        for i in pool:
+            new_longest = max(longest, self.lengths[i])
+            full = (self.batch_size is not None and len(batch) >= self.batch_size) or (
+                self.max_tokens is not None and batch and new_longest * (len(batch) + 1) > self.max_tokens
+            )
+            if full:
+                batches.append(batch)
+                batch, new_longest = [], self.lengths[i]
+            batch.append(i)
+            longest = new_longest
+        if batch and not (self.drop_last and self.batch_size is not None and len(batch) < self.batch_size):
+            batches.append(batch)
+        return batches
+
+    def batches(self):
+        """Batches (lists of indices) for the current epoch; deterministic given seed and epoch."""
+        if self._cache is not None and self._cache[0] == self.epoch:
+            return self._cache[1]
+        rng = random.Random(self.seed + self.epoch)
+        idx = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(idx)
+        if self.max_tokens is not None:
+            pool_len = max(1, self.pool_factor * max(1, self.max_tokens // max(1, max(self.lengths, default=1))))
+        else:
+            pool_len = self.pool_factor * self.batch_size
+        if not self.shuffle:
+            pool_len = len(idx) or 1
+        batches = []
+        for start in range(0, len(idx), pool_len):
+            pool = sorted(idx[start : start + pool_len], key=lambda i: self.lengths[i])
+            batches.extend(self._split_pool(pool))
+        if self.shuffle:
+            rng.shuffle(batches)
+        self._cache = (self.epoch, batches)
+        return batches
+
+    def padding_ratio(self):
+        """Padding ratio achieved by the current epoch's batches."""
+        return padding_ratio(self.lengths, self.batches())
+
+    def __iter__(self):
+        return iter(self.batches())
+
+    def __len__(self):
+        return len(self.batches())
+
+
+def bio_transition_constraints(tags):
+    """
+    Allowed-transition masks for BIO tags: I-X may only follow B-X or I-X and may not start a
+    sequence. Returns (allowed [T, T] bool, allowed_start [T] bool) for LinearChainCRF.
+    """
+    n = len(tags)
+    allowed = torch.ones(n, n, dtype=torch.bool)
+    allowed_start = torch.ones(n, dtype=torch.bool)
+    for j, to_tag in enumerate(tags):
+        if not to_tag.startswith("I-"):
+            continue
+        allowed_start[j] = False
+        entity = to_tag[2:]
+        for i, from_tag in enumerate(tags):
+            if from_tag not in (f"B-{entity}", f"I-{entity}"):
+                allowed[i, j] = False
+    return allowed, allowed_start
+
+
+class LinearChainCRF(nn.Module):
+    """
+    Linear-chain CRF with batched log-space forward algorithm, Viterbi and forward-backward.
+    Parameter names and initialisation match torchcrf.CRF, so checkpoints trained with
+    pytorch-crf load unchanged and scores agree numerically.
+
+    constraints: optional (allowed [T, T], allowed_start [T]) bool masks, e.g. from
+    bio_transition_constraints(TAGS). They are applied to decode() and marginals() only: the
+    training labels put O on non-first subwords, so gold paths contain O -> I-X steps.
+    Masks must be prefix masks (ones then zeros) with the first position on.
+    """
+
+    NEG_INF = -10000.0
+
+    def __init__(self, num_tags, batch_first=True, constraints=None):
+        super().__init__()
+        self.num_tags = num_tags
+        self.batch_first = batch_first
+        self.start_transitions = nn.Parameter(torch.empty(num_tags))
+        self.end_transitions = nn.Parameter(torch.empty(num_tags))
+        self.transitions = nn.Parameter(torch.empty(num_tags, num_tags))
+        nn.init.uniform_(self.start_transitions, -0.1, 0.1)
+        nn.init.uniform_(self.end_transitions, -0.1, 0.1)
+        nn.init.uniform_(self.transitions, -0.1, 0.1)
+        start_penalty = torch.zeros(num_tags)
+        transition_penalty = torch.zeros(num_tags, num_tags)
+        if constraints is not None:
+            allowed, allowed_start = constraints
+            transition_penalty.masked_fill_(~allowed, self.NEG_INF)
+            start_penalty.masked_fill_(~allowed_start, self.NEG_INF)
+        # Not persistent: checkpoints stay compatible whether or not constraints are used
+        self.register_buffer("start_penalty", start_penalty, persistent=False)
+        self.register_buffer("transition_penalty", transition_penalty, persistent=False)
+
+    def _time_major(self, emissions, mask, tags=None):
+        if mask is None:
+            mask = torch.ones(emissions.shape[:2], dtype=torch.bool, device=emissions.device)
+        mask = mask.bool()
+        if self.batch_first:
+            emissions = emissions.transpose(0, 1)
+            mask = mask.transpose(0, 1)
+            tags = tags.transpose(0, 1) if tags is not None else None
+        return emissions, mask, tags
+
+    def _constrained(self):
+        return self.start_transitions + self.start_penalty, self.transitions + self.transition_penalty
+
+    def forward(self, emissions, tags, mask=None, reduction="mean"):
+        """Log-likelihood of `tags`; reduction is 'none' | 'sum' | 'mean' | 'token_mean' (as torchcrf)."""
+        emissions, mask, tags = self._time_major(emissions, mask, tags)
+        numerator = self._score(emissions, tags, mask)
+        denominator = self._log_partition(emissions, mask, self.start_transitions, self.transitions)
+        llh = numerator - denominator
+        if reduction == "none":
+            return llh
+        if reduction == "sum":
+            return llh.sum()
+        if reduction == "mean":
+            return llh.mean()
+        if reduction == "token_mean":
+            return llh.sum() / mask.float().sum()
+        raise ValueError(f"invalid reduction: {reduction}")
+
+    def _score(self, emissions, tags, mask):
+        # emissions [L, B, T], tags [L, B], mask [L, B]
+        maskf = mask.to(emissions.dtype)
+        emit = emissions.gather(2, tags.unsqueeze(2)).squeeze(2)  # [L, B]
+        score = self.start_transitions[tags[0]] + emit[0]
+        if tags.size(0) > 1:
+            trans = self.transitions[tags[:-1], tags[1:]]  # [L-1, B]
+            score = score + ((trans + emit[1:]) * maskf[1:]).sum(0)
+        seq_ends = mask.long().sum(0) - 1
+        last_tags = tags.gather(0, seq_ends.unsqueeze(0)).squeeze(0)
+        return score + self.end_transitions[last_tags]
+
+    def _forward_alphas(self, emissions, mask, start, transitions):
+        alphas = [start + emissions[0]]  # each [B, T]
+        for i in range(1, emissions.size(0)):
+            nxt = torch.logsumexp(alphas[-1].unsqueeze(2) + transitions + emissions[i].unsqueeze(1), dim=1)
+            alphas.append(torch.where(mask[i].unsqueeze(1), nxt, alphas[-1]))
+        return alphas
+
+    def _log_partition(self, emissions, mask, start, transitions):
+        score = start + emissions[0]
+        for i in range(1, emissions.size(0)):
+            nxt = torch.logsumexp(score.unsqueeze(2) + transitions + emissions[i].unsqueeze(1), dim=1)
+            score = torch.where(mask[i].unsqueeze(1), nxt, score)
+        return torch.logsumexp(score + self.end_transitions, dim=1)
+
+    def decode(self, emissions, mask=None, pad_value=-1):
+        """
+        Batched Viterbi. Returns the best paths as a LongTensor [B, L] with pad_value after each
+        sequence; unlike torchcrf.CRF.decode it does not return List[List[int]]
+        (`[p[p != pad_value].tolist() for p in paths]` converts).
+        """
+        emissions, mask, _ = self._time_major(emissions, mask)
+        start, transitions = self._constrained()
+        seq_len, batch = mask.shape
+        score = start + emissions[0]
+        history = []
+        for i in range(1, seq_len):
+            best, idx = (score.unsqueeze(2) + transitions).max(dim=1)
+            score = torch.where(mask[i].unsqueeze(1), best + emissions[i], score)
+            history.append(idx)
+        score = score + self.end_transitions
+        seq_ends = mask.long().sum(0) - 1
+        cur = score.argmax(dim=1)
+        paths = torch.full((batch, seq_len), pad_value, dtype=torch.long, device=emissions.device)
+        for i in range(seq_len - 1, -1, -1):
+            if i < seq_len - 1:
+                prev = history[i].gather(1, cur.unsqueeze(1)).squeeze(1)
+                cur = torch.where(seq_ends > i, prev, cur)
+            paths[:, i] = torch.where(seq_ends >= i, cur, torch.full_like(cur, pad_value))
+        return paths if self.batch_first else paths.transpose(0, 1)
+
+    def marginals(self, emissions, mask=None):
+        """Per-position tag posteriors P(y_i = t | x) via forward-backward; [B, L, T], zeros on padding."""
+        log_marg = self.log_marginals(emissions, mask)
+        if mask is None:
+            return log_marg.exp()
+        return log_marg.exp() * mask.unsqueeze(2).to(log_marg.dtype)
+
+    def log_marginals(self, emissions, mask=None):
+        """log P(y_i = t | x) [B, L, T]; differentiable (distillation soft targets). Padding rows are not meaningful."""
+        emissions, mask, _ = self._time_major(emissions, mask)
+        start, transitions = self._constrained()
+        alphas = self._forward_alphas(emissions, mask, start, transitions)
+        log_z = torch.logsumexp(alphas[-1] + self.end_transitions, dim=1)  # [B]
+        seq_len = emissions.size(0)
+        betas = [None] * seq_len
+        end = self.end_transitions.expand_as(alphas[0])
+        betas[-1] = end
+        for i in range(seq_len - 2, -1, -1):
+            nxt = torch.logsumexp(transitions + (emissions[i + 1] + betas[i + 1]).unsqueeze(1), dim=2)
+            betas[i] = torch.where(mask[i + 1].unsqueeze(1), nxt, end)
+        log_marg = torch.stack(alphas) + torch.stack(betas) - log_z.view(1, -1, 1)
+        return log_marg.transpose(0, 1) if self.batch_first else log_marg
+
+
+def _reverse_within_lengths(lengths, seq_len):
+    """Index [B, L] that reverses each sequence's first `length` steps and leaves padding in place."""
+    t = torch.arange(seq_len, device=lengths.device).unsqueeze(0)
+    lens = lengths.unsqueeze(1)
+    return torch.where(t < lens, lens - 1 - t, t)
+
+
+# Stage timing (see bert_bilstm_crf_metrics.py). None = off: stage_timer hands out one shared no-op
+_stage_observer = None
+_NO_STAGE_TIMER = contextlib.nullcontext()
+
+
+def set_stage_observer(observer):
+    """Call observer(stage, seconds) after every timed stage of the extraction path; None turns timing off."""
+    global _stage_observer
+    _stage_observer = observer
+
+
+class _StageTimer:
+    __slots__ = ("stage", "device", "start")
+
+    def __init__(self, stage, device):
+        self.stage = stage
+        self.device = device
+
+    def __enter__(self):
+        if self.device is not None and self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.device is not None and self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)  # CUDA kernels are async; time their completion
+        observer = _stage_observer
+        if observer is not None:
+            observer(self.stage, time.perf_counter() - self.start)
+
+
+def stage_timer(stage, device=None):
+    """Context manager timing one stage with a monotonic clock when an observer is set, else a no-op."""
+    if _stage_observer is None:
+        return _NO_STAGE_TIMER
+    return _StageTimer(stage, device)
+
+
+def _bert_layer_mask(bert, hidden, attention_mask):
+    """Attention mask in the form BertLayer expects when layers are called one by one."""
+    try:
+        from transformers.masking_utils import create_bidirectional_mask
+    except ImportError:  # transformers 4.x
+        return bert.get_extended_attention_mask(attention_mask, attention_mask.shape)
+    return create_bidirectional_mask(config=bert.config, inputs_embeds=hidden, attention_mask=attention_mask)
+
+
+def packed_bilstm(lstm, hidden, lengths):
+    """
+    Run a batch_first BiLSTM as if on packed sequences: padded timesteps never feed the real ones,
+    and the backward direction starts at each sequence's last real token. Outputs on padding are 0.
+    On CUDA this is pack_padded_sequence / pad_packed_sequence (cuDNN skips the padding). On CPU the
+    packed kernel is ~3x slower than the fused padded one, so for a 1-layer nn.LSTM each direction
+    runs as a fused unidirectional pass instead, the backward one on per-sequence reversed input;
+    the result is identical to packing. Other LSTMs (e.g. dynamic int8) are packed.
+    """
+    lengths = lengths.to(hidden.device)
+    fused = isinstance(lstm, nn.LSTM) and lstm.num_layers == 1 and lstm.bidirectional and lstm.batch_first
+    if hidden.is_cuda or not fused:
+        packed = pack_padded_sequence(hidden, lengths.cpu(), batch_first=True, enforce_sorted=False)
+        out, _ = lstm(packed)
+        out, _ = pad_packed_sequence(out, batch_first=True, total_length=hidden.size(1))
+        return out
+    batch, seq_len, _ = hidden.shape
+    h0 = hidden.new_zeros(1, batch, lstm.hidden_size)
+    state = (h0, h0)
+    fwd = torch.lstm(
+        hidden, state, [lstm.weight_ih_l0, lstm.weight_hh_l0, lstm.bias_ih_l0, lstm.bias_hh_l0],
+        True, 1, 0.0, lstm.training, False, True,
+    )[0]
+    rev = _reverse_within_lengths(lengths, seq_len).unsqueeze(2)
+    bwd = torch.lstm(
+        hidden.gather(1, rev.expand(-1, -1, hidden.size(2))), state,
+        [lstm.weight_ih_l0_reverse, lstm.weight_hh_l0_reverse, lstm.bias_ih_l0_reverse, lstm.bias_hh_l0_reverse],
+        True, 1, 0.0, lstm.training, False, True,
+    )[0]
+    bwd = bwd.gather(1, rev.expand(-1, -1, bwd.size(2)))
+    valid = (torch.arange(seq_len, device=hidden.device).unsqueeze(0) < lengths.unsqueeze(1)).unsqueeze(2)
+    return torch.cat([fwd, bwd], dim=2) * valid
+
 
 class BertBiLSTMCRF(nn.Module):
-    """BERT (embedding) -> BiLSTM -> Linear -> CRF. Mask for padding."""
+    """
+    BERT (embedding) -> BiLSTM -> Linear -> CRF. Mask for padding.
+    Without labels, forward returns the Viterbi paths as a padded LongTensor [B, L] (-1 on padding).
+    bio_constraints=True forbids invalid BIO transitions when decoding.
+    pack_sequences=True runs the BiLSTM on packed sequences, so padded timesteps are skipped and the
+    backward direction starts at each sequence's last real token (lengths default to the mask sum).
+    bert_config (a BertConfig or its dict) builds BERT from config without loading pretrained
+    weights, for loaders that assign all weights afterwards (see load_model_bundle).
+    """
 
-    def __init__(self, bert_name="bert-base-uncased", hidden_dim=256, num_labels=NUM_LABELS, dropout=0.3):
+    def __init__(
+        self,
+        bert_name="bert-base-uncased",
+        hidden_dim=256,
+        num_labels=NUM_LABELS,
+        dropout=0.3,
+        bio_constraints=False,
+        pack_sequences=True,
+        bert_config=None,
+    ):
         super().__init__()
-        self.bert = BertModel.from_pretrained(bert_name)
+        self.pack_sequences = pack_sequences
+        if bert_config is None:
+            self.bert = BertModel.from_pretrained(bert_name)
+        else:
+            if isinstance(bert_config, dict):
+                bert_config = BertConfig.from_dict(bert_config)
+            self.bert = BertModel(bert_config)
         self.bert_dim = self.bert.config.hidden_size  # 768
         self.lstm = nn.LSTM(
             self.bert_dim,
@@ -213,74 +1147,833 @@ class BertBiLSTMCRF(nn.Module):
         )
         self.dropout = nn.Dropout(dropout)
         self.hidden2tag = nn.Linear(hidden_dim, num_labels)
-        if CRF is not None:
-            self.crf = CRF(num_labels, batch_first=True)
-        else:
-            self.crf = None
+        constraints = bio_transition_constraints(TAGS) if bio_constraints and num_labels == NUM_LABELS else None
+        self.crf = LinearChainCRF(num_labels, batch_first=True, constraints=constraints)
         self.num_labels = num_labels
 
-    def forward(self, input_ids, attention_mask, labels=None):
-        # BERT
-        out = self.bert(input_ids=input_ids, attention_mask=attention_mask)
+    def emissions(self, input_ids, attention_mask, lengths=None):
+        """Per-subword tag scores [B, L, num_labels] (BERT -> BiLSTM -> Linear)."""
+        with stage_timer("bert", input_ids.device):
+            out = self.bert(input_ids=input_ids, attention_mask=attention_mask)
         emissions = out.last_hidden_state  # [B, L, 768]
-        # BiLSTM
-        emissions, _ = self.lstm(emissions)
-        emissions = self.dropout(emissions)
-        emissions = self.hidden2tag(emissions)  # [B, L, num_labels]
-        mask = attention_mask.byte()  # 1 = real, 0 = pad
-        if labels is not None and self.crf is not None:
-            loss = -self.crf(emissions, labels, mask=mask, reduction="mean")
-            return loss
-        if self.crf is not None:
-            preds = self.crf.decode(emissions, mask=mask)
-            return preds
-        return emissions
+        with stage_timer("bilstm", input_ids.device):
+            emissions = self.run_lstm(emissions, attention_mask, lengths)
+            emissions = self.dropout(emissions)
+            return self.hidden2tag(emissions)  # [B, L, num_labels]
+
+    def run_lstm(self, hidden, attention_mask, lengths=None):
+        """BiLSTM over [B, L, D] hidden states; length-aware when pack_sequences is on."""
+        if not self.pack_sequences:
+            return self.lstm(hidden)[0]
+        if lengths is None:
+            lengths = attention_mask.sum(dim=1)
+        return packed_bilstm(self.lstm, hidden, lengths)
+
+    def bert_features(self, input_ids, attention_mask, num_layers):
+        """Hidden states after the embeddings and the first `num_layers` encoder layers [B, L, D]."""
+        if num_layers >= self.bert.config.num_hidden_layers:
+            return self.bert(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        out = self.bert(input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True)
+        return out.hidden_states[num_layers]  # [0] is the embedding output
+
+    def emissions_from_features(self, features, attention_mask, start_layer, lengths=None):
+        """emissions() from bert_features(..., start_layer): runs the remaining BERT layers and the head."""
+        hidden = features
+        layers = self.bert.encoder.layer[start_layer:]
+        if len(layers):
+            mask = _bert_layer_mask(self.bert, hidden, attention_mask)
+            for layer in layers:
+                hidden = layer(hidden, mask)
+                hidden = hidden[0] if isinstance(hidden, tuple) else hidden  # transformers 4.x returns tuples
+        emissions = self.run_lstm(hidden, attention_mask, lengths)
+        return self.hidden2tag(self.dropout(emissions))
+
+    def forward(self, input_ids, attention_mask, labels=None, lengths=None):
+        emissions = self.emissions(input_ids, attention_mask, lengths)
+        return self.crf_output(emissions, attention_mask, labels)
+
+    def forward_from_features(self, features, attention_mask, start_layer, labels=None, lengths=None):
+        """forward() on cached bert_features (see cached_bert_features)."""
+        emissions = self.emissions_from_features(features, attention_mask, start_layer, lengths)
+        return self.crf_output(emissions, attention_mask, labels)
+
+    def crf_output(self, emissions, attention_mask, labels=None):
+        """CRF loss when labels are given, else Viterbi paths."""
+        mask = attention_mask.bool()  # 1 = real, 0 = pad
+        # The CRF always runs in fp32, also under bf16 autocast
+        with torch.autocast(device_type=emissions.device.type, enabled=False), stage_timer("crf", emissions.device):
+            emissions = emissions.float()
+            if labels is not None:
+                # -100 marks non-first subwords and [CLS]/[SEP]; score them as O (tag 0) like the notebook
+                tags = labels.masked_fill(labels == -100, 0)
+                return -self.crf(emissions, tags, mask=mask, reduction="mean")
+            return self.crf.decode(emissions, mask=mask)
+
+    def marginals(self, input_ids, attention_mask, lengths=None):
+        """Per-subword tag probabilities [B, L, num_labels] (for confidence scores)."""
+        emissions = self.emissions(input_ids, attention_mask, lengths)
+        with torch.autocast(device_type=emissions.device.type, enabled=False):
+            return self.crf.marginals(emissions.float(), mask=attention_mask.bool())
+
+
+def benchmark_packed_bilstm(lengths, batch_size=8, input_dim=768, hidden_dim=256, repeats=10, device=None, seed=0):
+    """
+    Time the BiLSTM alone on batches whose lengths are sampled from `lengths` (e.g.
+    BertBiLSTMCRFDataset.lengths() of the resume + job-poster corpora): plain padded run,
+    pack_padded_sequence, and packed_bilstm (what the model uses). Forward + backward, random
+    inputs. Prints and returns ms per batch for each.
+    """
+    device = device or torch.device("cpu")
+    rng = random.Random(seed)
+    lstm = nn.LSTM(input_dim, hidden_dim // 2, num_layers=1, bidirectional=True, batch_first=True).to(device)
+    batches = []
+    for _ in range(repeats):
+        lens = torch.tensor([rng.choice(lengths) for _ in range(batch_size)])
+        batches.append((torch.randn(batch_size, int(lens.max()), input_dim, device=device), lens))
+
+    def run(mode):
+        for hidden, lens in batches:
+            if mode == "padded":
+                out, _ = lstm(hidden)
+            elif mode == "pack_padded_sequence":
+                out, _ = lstm(pack_padded_sequence(hidden, lens, batch_first=True, enforce_sorted=False))
+                out, _ = pad_packed_sequence(out, batch_first=True, total_length=hidden.size(1))
+            else:
+                out = packed_bilstm(lstm, hidden, lens)
+            out.sum().backward()
+
+    results = {}
+    for mode in ("padded", "pack_padded_sequence", "packed_bilstm"):
+        run(mode)  # warm-up
+        t0 = time.perf_counter()
+        run(mode)
+        results[mode] = (time.perf_counter() - t0) * 1000 / repeats
+    print("BiLSTM fwd+bwd per batch: " + ", ".join(f"{k} {v:.1f} ms" for k, v in results.items()))
+    return results
+
+
+def predict_word_tags_windowed(words, tokenizer, model, device, max_length=512, stride=128, batch_size=8):
+    """
+    Tag every word of a document of any length: encode overlapping windows, run the CRF decode on
+    each (batched), and merge the per-window paths with merge_window_tags.
+    Returns one tag string per word.
+    """
+    return predict_word_list_tags(
+        [words], tokenizer, model, device, max_len=max_length, window_stride=stride, max_batch_size=batch_size
+    )[0][1]
+
+
+EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", re.IGNORECASE)
+
+
+def extract_email_rules(text):
+    """Email addresses in `text`, deduplicated in order of appearance."""
+    return list(dict.fromkeys(EMAIL_RE.findall(text)))
+
+
+def extract_name_heuristic(text):
+    """Name candidate from the first lines: 1-4 capitalised words, no email/URL."""
+    lines = [ln.strip() for ln in text.strip().split("\n") if ln.strip()]
+    for line in lines[:4]:
+        if "@" in line or "http" in line.lower() or "www." in line.lower():
+            continue
+        parts = line.split()
+        if 1 <= len(parts) <= 4 and all(p[0].isupper() for p in parts if len(p) > 0 and p[0].isalpha()):
+            c = " ".join(parts)
+            if len(c) < 80 and not c.endswith("."):
+                return [c]
+    return []
+
+
+def tags_to_entities(words, tags):
+    """Group BIO word tags into {entity_type: [phrase, ...]} (a phrase starts at B-X, continues over I-X)."""
+    entities = {}
+    i = 0
+    while i < len(words):
+        tag = tags[i] if i < len(tags) else "O"
+        if tag.startswith("B-"):
+            entity_type = tag[2:]
+            phrase = [words[i]]
+            i += 1
+            while i < len(words) and i < len(tags) and tags[i] == f"I-{entity_type}":
+                phrase.append(words[i])
+                i += 1
+            entities.setdefault(entity_type, []).append(" ".join(phrase))
+        else:
+            i += 1
+    return entities
+
+
+def encode_resume_texts(texts, tokenizer, max_length=512):
+    """
+    Split each text on whitespace and encode it as in the notebook's parse_resume:
+    [CLS] pieces [SEP], truncated to max_length, dropping words that start past the cut.
+    Returns a list of (words, input_ids, first_subword_indices).
+    """
+    word_lists = [re.findall(r"\S+", text) for text in texts]
+    encoded = []
+    for words, windows in zip(word_lists, encode_word_windows_batch(word_lists, tokenizer, max_length, None)):
+        input_ids, first_idx, _ = windows[0] if windows else ([tokenizer.cls_token_id, tokenizer.sep_token_id], [], None)
+        encoded.append((words[: len(first_idx)], input_ids, first_idx))
+    return encoded
+
+
+def _is_oom(err):
+    msg = str(err)
+    return "out of memory" in msg or "can't allocate memory" in msg
+
+
+def predict_word_tags_batch(texts, tokenizer, model, device, id2label=None, max_len=512, **batch_kwargs):
+    """
+    Word-level tags for many documents: texts are split on whitespace and tagged with
+    predict_word_list_tags (same options). Returns one (words, tags) per text, in input order.
+    """
+    word_lists = [re.findall(r"\S+", text) for text in texts]
+    return predict_word_list_tags(word_lists, tokenizer, model, device, id2label, max_len, **batch_kwargs)
+
+
+def predict_word_list_tags(
+    word_lists,
+    tokenizer,
+    model,
+    device,
+    id2label=None,
+    max_len=512,
+    window_stride=128,
+    max_tokens=16384,
+    max_batch_size=64,
+    precision="fp32",
+):
+    """
+    Word-level tags for many pre-split documents. A document longer than max_len subwords is cut
+    into overlapping windows (window_stride subwords of overlap, see compute_word_windows) whose
+    tags are merged with merge_window_tags, so every word is tagged; window_stride=None truncates
+    at max_len instead (words past the cut are dropped). The windows of all documents are sorted
+    by subword length and packed into batches of at most max_batch_size windows and max_tokens
+    padded subwords (longest x count); each batch is one forward pass. A batch that runs out of
+    memory is split in half and retried. Returns one (words, tags) per document, in input order.
+    """
+    device = torch.device(device)
+    id2label = id2label or ID2LABEL
+    with stage_timer("tokenize"):
+        doc_windows = encode_word_windows_batch(word_lists, tokenizer, max_len, window_stride)
+    windows = [window for wins in doc_windows for window in wins]
+    window_tags = [None] * len(windows)
+    lengths = [len(input_ids) for input_ids, _, _ in windows]
+    sampler = LengthBucketBatchSampler(lengths, batch_size=max_batch_size, max_tokens=max_tokens, shuffle=False)
+    # Stack of batches (indices into `windows`), popped in ascending length order
+    pending = list(reversed(sampler.batches()))
+    collator = BertBatchCollator(pin_memory=device.type == "cuda", return_lengths=True)
+    model.eval()
+    with torch.inference_mode():
+        while pending:
+            batch = pending.pop()
+            input_ids, attention_mask, _, lens = collator(
+                [(windows[i][0], [1] * len(windows[i][0]), ()) for i in batch]
+            )
+            try:
+                with autocast_context(device, precision):
+                    preds = model(
+                        input_ids.to(device, non_blocking=True),
+                        attention_mask.to(device, non_blocking=True),
+                        lengths=lens,
+                    )
+            except RuntimeError as err:
+                if not _is_oom(err) or len(batch) == 1:
+                    raise
+                if device.type == "cuda":
+                    torch.cuda.empty_cache()
+                print(f"Out of memory on a batch of {len(batch)} windows; splitting")
+                mid = len(batch) // 2
+                pending.extend([batch[mid:], batch[:mid]])
+                continue
+            # LinearChainCRF.decode returns a padded tensor, torchcrf (the notebook models) lists
+            for i, pred in zip(batch, preds.tolist() if torch.is_tensor(preds) else preds):
+                window_tags[i] = [id2label.get(pred[j], "O") for j in windows[i][1]]
+    results = []
+    k = 0
+    for words, wins in zip(word_lists, doc_windows):
+        tags = window_tags[k : k + len(wins)]
+        k += len(wins)
+        if len(wins) == 1:
+            results.append((list(words[: wins[0][2][1]]), tags[0]))
+        elif wins:
+            results.append((list(words), merge_window_tags(len(words), [(span, t) for (_, _, span), t in zip(wins, tags)])))
+        else:
+            results.append(([], []))
+    return results
+
+
+def parse_resumes_batch(texts, tokenizer, model, device, id2label=None, max_len=512, hybrid=False, **batch_kwargs):
+    """
+    Batched parse_resume for many documents (windowing and batching options as
+    predict_word_list_tags; long documents are windowed, not truncated, by default).
+    hybrid=True applies the NAME/EMAIL rules of parse_resume_hybrid.
+    Returns one (words, tags, entities) per text, in input order, the same as parse_resume.
+    """
+    tagged = predict_word_tags_batch(texts, tokenizer, model, device, id2label, max_len, **batch_kwargs)
+    with stage_timer("entities"):
+        entities = [tags_to_entities(words, tags) for words, tags in tagged]
+    if hybrid:
+        with stage_timer("rules"):
+            for text, ents in zip(texts, entities):
+                names, emails = extract_name_heuristic(text), extract_email_rules(text)
+                if names:
+                    ents["NAME"] = names
+                if emails:
+                    ents["EMAIL"] = emails
+    return [(words, tags, ents) for (words, tags), ents in zip(tagged, entities)]
+
+
+def parse_resume(text, tokenizer, model, device, id2label=None, max_len=512):
+    """Tokenize resume text, run NER, return (words, tags) and entity dict."""
+    return parse_resumes_batch([text], tokenizer, model, device, id2label, max_len)[0]
+
+
+def parse_resume_hybrid(text, tokenizer, model, device, id2label=None, max_len=512):
+    """Hybrid: NAME/EMAIL from rules (high recall), SKILL/EXPERIENCE/EDUCATION/OCCUPATION from model."""
+    return parse_resumes_batch([text.strip()], tokenizer, model, device, id2label, max_len, hybrid=True)[0]
+
+
+SALARY_RE = re.compile(
+    r"\$[\d,]+\.?\d*\s*(k|K|M)?\s*(-|–|to)\s*\$?[\d,]+\.?\d*\s*(k|K|M)?|\$[\d,]+\.?\d*\s*(k|K|M)?"
+    r"|£[\d,]+\.?\d*\s*(k|K)?|\d+\s*(k|K)\s*-\s*\d+\s*(k|K)|Competitive|competitive"
+)
+
+
+def extract_salary_rules(text):
+    """Salary mentions in `text`, deduplicated in order of appearance."""
+    return list(dict.fromkeys(m.group(0).strip() for m in SALARY_RE.finditer(text)))
+
+
+def job_poster_entities(words, tags):
+    """tags_to_entities for job posters: phrases stripped of surrounding punctuation and deduplicated."""
+    entities = {}
+    for entity_type, phrases in tags_to_entities(words, tags).items():
+        cleaned = [p.strip().rstrip(".,;:!?)]}\"'").lstrip("([{\"'").strip() for p in phrases]
+        cleaned = list(dict.fromkeys(c for c in cleaned if c))
+        if cleaned:
+            entities[entity_type] = cleaned
+    return entities
+
+
+def parse_job_posters_batch(texts, tokenizer, model, device, id2label, max_len=512, hybrid=False, **batch_kwargs):
+    """
+    Batched parse_job_poster from the job poster notebook (windowing and batching options as
+    predict_word_list_tags); hybrid=True takes SALARY from rules as parse_job_poster_hybrid does.
+    Returns one (words, tags, entities) per text, in input order.
+    """
+    tagged = predict_word_tags_batch(texts, tokenizer, model, device, id2label, max_len, **batch_kwargs)
+    with stage_timer("entities"):
+        entities = [job_poster_entities(words, tags) for words, tags in tagged]
+    if hybrid:
+        with stage_timer("rules"):
+            for text, ents in zip(texts, entities):
+                salaries = extract_salary_rules(text)
+                if salaries:
+                    ents["SALARY"] = salaries
+    return [(words, tags, ents) for (words, tags), ents in zip(tagged, entities)]
+
+
+def quantize_dynamic_int8(model):
+    """
+    CPU int8 copy of a BertBiLSTMCRF: dynamic quantization of every nn.Linear (BERT attention and
+    feed-forward layers, hidden2tag) and the BiLSTM. Weights are stored as int8, activations are
+    quantized per batch; embeddings, LayerNorm and the CRF stay fp32. The input model is unchanged.
+    """
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model.cpu().eval(), {nn.Linear, nn.LSTM}, dtype=torch.qint8)
+
+
+def _dynamic_lstms(qmodel):
+    from torch.ao.nn.quantized.dynamic import LSTM as DynamicQuantizedLSTM
+
+    return [(f"{name}." if name else "", m) for name, m in qmodel.named_modules() if isinstance(m, DynamicQuantizedLSTM)]
+
+
+def quantized_state_dict(qmodel):
+    """
+    State dict of a quantize_dynamic_int8 model that torch.load(weights_only=True) accepts: the
+    BiLSTM's packed cell params (TorchScript objects) are replaced by its int8 weights and fp32
+    biases under the nn.LSTM names. load_bert_bilstm_crf repacks them.
+    """
+    state = qmodel.state_dict()
+    for prefix, lstm in _dynamic_lstms(qmodel):
+        for key in [k for k in state if k.startswith(prefix + "_all_weight_values.")]:
+            del state[key]
+        for tensors in lstm._weight_bias().values():
+            state.update({prefix + name: t for name, t in tensors.items()})
+    return state
+
+
+def _load_quantized_state(qmodel, state):
+    # Inverse of quantized_state_dict: repack each BiLSTM's weights, then load everything strictly
+    for prefix, lstm in _dynamic_lstms(qmodel):
+        names = [k for k in state if k.startswith(prefix) and k[len(prefix):].startswith(("weight_", "bias_"))]
+        lstm.set_weight_bias({k[len(prefix):]: state.pop(k) for k in names})
+        state.update({k: v for k, v in lstm.state_dict(prefix=prefix).items() if "._all_weight_values." in k})
+    qmodel.load_state_dict(state)
+
+
+def load_bert_bilstm_crf(load_dir, device=None, **model_kwargs):
+    """
+    Load a model saved by the notebooks: bert_bilstm_crf_state.pt, ner_config.json and the tokenizer
+    files in `load_dir`. Notebook checkpoints name the output layer `fc`; it is mapped to hidden2tag.
+    Directories written by bert_bilstm_crf_quantize.py (config "quantization": "dynamic_int8") load
+    as the int8 model, on CPU. Checkpoints are always read with weights_only=True. A file path is
+    read as a bundle (load_model_bundle).
+    Returns (model in eval mode, tokenizer, config) with config["id2label"] added.
+    """
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device = torch.device(device)
+    if os.path.isfile(load_dir):
+        return load_model_bundle(load_dir, device)
+    with open(os.path.join(load_dir, "ner_config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    tokenizer = BertTokenizerFast.from_pretrained(load_dir)
+    model = BertBiLSTMCRF(bert_name=config["bert_name"], num_labels=config["num_labels"], **model_kwargs)
+    quantization = config.get("quantization")
+    if quantization not in (None, "dynamic_int8"):
+        raise ValueError(f"Unknown quantization {quantization!r} in {load_dir}/ner_config.json")
+    if quantization:
+        model = quantize_dynamic_int8(model)
+        device = torch.device("cpu")
+    try:
+        state = torch.load(os.path.join(load_dir, "bert_bilstm_crf_state.pt"), map_location="cpu", weights_only=True)
+    except pickle.UnpicklingError as e:
+        if not quantization:
+            raise
+        raise ValueError(
+            f"{load_dir} holds packed TorchScript LSTM params from an older bert_bilstm_crf_quantize.py; "
+            "re-run it on the fp32 model"
+        ) from e
+    if any(k.startswith("fc.") for k in state):
+        metadata = getattr(state, "_metadata", None)  # module versions; quantized layers need them
+        state = type(state)(("hidden2tag." + k[3:] if k.startswith("fc.") else k, v) for k, v in state.items())
+        if metadata is not None:
+            state._metadata = metadata
+    if quantization:
+        _load_quantized_state(model, state)
+    else:
+        model.load_state_dict(state)
+    model.to(device).eval()
+    config["id2label"] = {i: t for i, t in enumerate(config["tags"])}
+    return model, tokenizer, config
+
+
+BUNDLE_FORMAT = "bert_bilstm_crf_bundle"
+BUNDLE_VERSION = 1
+
+
+def save_model_bundle(model, tokenizer, config, path):
+    """
+    Write a single-file model bundle: ner_config, the BERT config, the fast tokenizer (tokenizer.json
+    content and special tokens) and every parameter and buffer. Stored with torch.save, so
+    load_model_bundle can memory-map the weights. Written to a temp file and renamed into place.
+    """
+    if config.get("quantization"):
+        raise ValueError("Bundles hold fp32 models; quantize after load_model_bundle instead")
+    if not getattr(tokenizer, "is_fast", False):
+        raise ValueError("save_model_bundle needs a fast tokenizer (BertTokenizerFast)")
+    tensors = {name: t.detach().cpu().contiguous() for name, t in model.named_parameters()}
+    tensors.update({name: t.detach().cpu().contiguous() for name, t in model.named_buffers()})
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "config": {k: v for k, v in config.items() if k != "id2label"},
+        "model": {"hidden_dim": model.lstm.hidden_size * 2, "pack_sequences": model.pack_sequences},
+        "bert_config": model.bert.config.to_dict(),
+        "tokenizer": {
+            "json": tokenizer.backend_tokenizer.to_str(),
+            "do_lower_case": getattr(tokenizer, "do_lower_case", True),
+            "special_tokens": {k: v for k, v in tokenizer.special_tokens_map.items() if isinstance(v, str)},
+        },
+        "tensors": tensors,
+    }
+    tmp = f"{path}.tmp-{os.getpid()}"
+    torch.save(bundle, tmp)
+    os.replace(tmp, path)
+
+
+def _assign_tensors(model, tensors):
+    # setattr (not load_state_dict) so non-persistent buffers are restored too and nn.LSTM refreshes
+    # its flat weight list; nn.Parameter wraps the mapped storage without copying
+    for name, tensor in tensors.items():
+        module_name, _, attr = name.rpartition(".")
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            setattr(module, attr, nn.Parameter(tensor, requires_grad=module._parameters[attr].requires_grad))
+        elif attr in module._buffers:
+            setattr(module, attr, tensor)
+        else:
+            raise KeyError(f"Bundle tensor {name} does not exist in the model")
+    missing = [n for n, t in list(model.named_parameters()) + list(model.named_buffers()) if t.is_meta]
+    if missing:
+        raise KeyError(f"Bundle is missing tensors: {missing[:5]}")
+
+
+def load_model_bundle(path, device=None):
+    """
+    Load a bundle from save_model_bundle without the HF hub or pretrained weights: the architecture
+    is built on the meta device from the stored configs and the weights are memory-mapped from the
+    file (zero-copy on CPU; moved once on CUDA). Returns (model, tokenizer, config) like
+    load_bert_bilstm_crf.
+    """
+    from tokenizers import Tokenizer
+
+    if device is None:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device = torch.device(device)
+    bundle = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    if bundle.get("format") != BUNDLE_FORMAT or bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"{path} is not a version {BUNDLE_VERSION} {BUNDLE_FORMAT}")
+    config = dict(bundle["config"])
+    with torch.device("meta"):
+        model = BertBiLSTMCRF(
+            bert_name=config["bert_name"],
+            num_labels=config["num_labels"],
+            bert_config=bundle["bert_config"],
+            **bundle["model"],
+        )
+    _assign_tensors(model, bundle["tensors"])
+    model.to(device).eval()
+    tok = bundle["tokenizer"]
+    tokenizer = BertTokenizerFast(
+        tokenizer_object=Tokenizer.from_str(tok["json"]), do_lower_case=tok["do_lower_case"], **tok["special_tokens"]
+    )
+    config["id2label"] = {i: t for i, t in enumerate(config["tags"])}
+    return model, tokenizer, config
+
+
+def pad_predictions(preds, seq_len, fill=-1):
+    """CRF decode output (ragged list of lists, or a [B, L] tensor) -> LongTensor [B, seq_len]."""
+    if torch.is_tensor(preds):
+        out = torch.full((preds.size(0), seq_len), fill, dtype=torch.long)
+        n = min(seq_len, preds.size(1))
+        out[:, :n] = preds[:, :n].cpu()
+        return out
+    out = torch.full((len(preds), seq_len), fill, dtype=torch.long)
+    for b, p in enumerate(preds):
+        n = min(seq_len, len(p))
+        if n:
+            out[b, :n] = torch.as_tensor(p[:n], dtype=torch.long)
+    return out
+
+
+def align_eval_predictions(preds, attention_mask, labels, id2label=None):
+    """
+    Turn one batch of CRF predictions + gold labels into seqeval tag lists, without per-token .item().
+    Keeps positions inside the (prefix) attention mask whose gold label is not -100; predicted ids
+    missing or outside id2label become "O". Returns (true_lists, pred_lists) with one list per
+    sample, skipping samples with no labelled positions (same output as the old per-token loop).
+    """
+    id2label = id2label or ID2LABEL
+    num_labels = len(id2label)
+    attention_mask = attention_mask.cpu()
+    labels = labels.cpu()
+    pred_ids = pad_predictions(preds, labels.size(1))
+    valid = attention_mask.long().cumprod(dim=1).bool() & (labels != -100)
+    pred_ids = pred_ids.masked_fill((pred_ids < 0) | (pred_ids >= num_labels), num_labels)
+    lookup = [id2label[i] for i in range(num_labels)] + ["O"]
+    counts = valid.sum(dim=1).tolist()
+    gold_flat = [lookup[i] for i in labels[valid].tolist()]
+    pred_flat = [lookup[i] for i in pred_ids[valid].tolist()]
+    true_lists, pred_lists = [], []
+    start = 0
+    for n in counts:
+        if n:
+            true_lists.append(gold_flat[start : start + n])
+            pred_lists.append(pred_flat[start : start + n])
+        start += n
+    return true_lists, pred_lists
+
+
+def evaluate_bert_bilstm_crf(model, loader, device, id2label=None):
+    """
+    Run the model over a DataLoader and return (true_all, pred_all) lists of tag lists for seqeval.
+    Works with loaders yielding (input_ids, attention_mask, labels[, lengths]).
+    """
+    model.eval()
+    true_all, pred_all = [], []
+    with torch.no_grad():
+        for batch in loader:
+            input_ids, attention_mask, labels = batch[:3]
+            preds = model(input_ids.to(device, non_blocking=True), attention_mask.to(device, non_blocking=True))
+            t, p = align_eval_predictions(preds, attention_mask, labels, id2label)
+            true_all.extend(t)
+            pred_all.extend(p)
+    return true_all, pred_all
+
+
+def freeze_bert_layers(model, num_layers):
+    """
+    Freeze the BERT embeddings and the first `num_layers` encoder layers (all of BERT, pooler
+    included, when num_layers >= the layer count). Returns the parameters that still train.
+    """
+    frozen = [model.bert.embeddings] + list(model.bert.encoder.layer[:num_layers])
+    if num_layers >= model.bert.config.num_hidden_layers:
+        frozen.append(model.bert)
+    for module in frozen:
+        for p in module.parameters():
+            p.requires_grad_(False)
+    return [p for p in model.parameters() if p.requires_grad]
+
+
+class BertFeatureDataset(Dataset):
+    """
+    Cached frozen-BERT hidden states next to EncodedSamples labels. Items are (features [L, D]
+    float16 view, attention_mask, labels); features is a (memory-mapped) [total_tokens, D] array
+    indexed with the same offsets as the samples.
+    """
+
+    def __init__(self, samples, features):
+        self.samples = samples
+        self.features = features
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, i):
+        start, end = int(self.samples.offsets[i]), int(self.samples.offsets[i + 1])
+        _, mask, labels = self.samples[i]
+        return self.features[start:end], mask, labels
+
+    def lengths(self):
+        return self.samples.lengths()
+
+
+class FeatureBatchCollator(BertBatchCollator):
+    """BertBatchCollator for BertFeatureDataset: pads features into a float32 [B, L, D] tensor."""
+
+    def __call__(self, batch):
+        lengths = [len(b[0]) for b in batch]
+        shape = (len(batch), max(lengths))
+        features = torch.zeros(shape + (batch[0][0].shape[1],), dtype=torch.float32, pin_memory=self.pin_memory)
+        attention_mask = torch.zeros(shape, dtype=torch.long, pin_memory=self.pin_memory)
+        labels = torch.full(shape, self.label_pad_id, dtype=torch.long, pin_memory=self.pin_memory)
+        features_np, mask_np, labels_np = features.numpy(), attention_mask.numpy(), labels.numpy()
+        for row, (feats, mask, labs) in enumerate(batch):
+            features_np[row, : lengths[row]] = feats
+            mask_np[row, : len(mask)] = mask
+            labels_np[row, : len(labs)] = labs
+        if self.return_lengths:
+            return features, attention_mask, labels, torch.tensor(lengths, dtype=torch.long)
+        return features, attention_mask, labels
+
+
+def feature_cache_key(model, samples, num_layers):
+    """Hash of the frozen weights (embeddings + first num_layers layers), num_layers and the encoded inputs."""
+    h = hashlib.sha256(f"{num_layers}".encode("utf-8"))
+    frozen = [model.bert.embeddings] + list(model.bert.encoder.layer[:num_layers])
+    for module in frozen:
+        for name, t in module.state_dict().items():
+            h.update(name.encode("utf-8"))
+            h.update(t.detach().cpu().contiguous().numpy().tobytes())
+    h.update(np.ascontiguousarray(samples.input_ids).tobytes())
+    h.update(np.ascontiguousarray(samples.offsets).tobytes())
+    return h.hexdigest()[:24]
+
+
+def cached_bert_features(model, dataset, num_layers, cache_dir=".ner_features", batch_size=16, device=None,
+                         precision="fp32"):
+    """
+    BertFeatureDataset with bert_features(..., num_layers) for every sample of `dataset` (a
+    BertBiLSTMCRFDataset). Computed once in eval mode, written as float16 to
+    cache_dir/<key>/features.npy and memory-mapped afterwards (bert-base: 1.5 KB per subword).
+    The key covers the frozen weights, so a different checkpoint or layer count recomputes.
+    """
+    device = torch.device(device or next(model.parameters()).device)
+    samples = dataset.samples
+    key = feature_cache_key(model, samples, num_layers)
+    target = os.path.join(cache_dir, key)
+    path = os.path.join(target, "features.npy")
+    if os.path.exists(path):
+        print(f"Using cached BERT features {target}")
+        return BertFeatureDataset(samples, np.load(path, mmap_mode="r"))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=cache_dir)
+    total = int(samples.offsets[-1])
+    features = np.lib.format.open_memmap(
+        os.path.join(tmp, "features.npy"), mode="w+", dtype=np.float16, shape=(total, model.bert.config.hidden_size)
+    )
+    was_training = model.training
+    model.eval()
+    start = time.perf_counter()
+    # Length-sorted batches keep padding (wasted BERT compute) low
+    sampler = LengthBucketBatchSampler(dataset.lengths(), batch_size=batch_size, shuffle=False)
+    loader = DataLoader(dataset, batch_sampler=sampler, collate_fn=BertBatchCollator(return_lengths=True))
+    with torch.inference_mode():
+        for indices, (input_ids, attention_mask, _, lengths) in zip(sampler.batches(), loader):
+            with autocast_context(device, precision):
+                hidden = model.bert_features(input_ids.to(device), attention_mask.to(device), num_layers)
+            hidden = hidden.to(torch.float16).cpu().numpy()
+            for row, i in enumerate(indices):
+                features[int(samples.offsets[i]) : int(samples.offsets[i + 1])] = hidden[row, : int(lengths[row])]
+    model.train(was_training)
+    features.flush()
+    del features
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another process finished the same cache first; use theirs
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"Cached BERT features for {len(samples)} samples ({total} subwords) in {time.perf_counter() - start:.0f} s")
+    return BertFeatureDataset(samples, np.load(path, mmap_mode="r"))
+
+
+def autocast_context(device, precision="fp32"):
+    """Autocast context for the given precision: "fp32" (no-op) or "bf16" (CPU or CUDA)."""
+    if precision == "fp32":
+        return contextlib.nullcontext()
+    if precision == "bf16":
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    raise ValueError(f"precision must be 'fp32' or 'bf16', got {precision!r}")
+
+
+def reset_peak_memory(device):
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+
+def peak_memory_mb(device):
+    """Peak allocated CUDA memory, or the process's peak RSS on CPU (Linux reports KB, macOS bytes)."""
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / 2**20
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if os.uname().sysname == "Darwin" else rss / 2**10
 
 
 def build_and_train_bert_bilstm_crf(
-    data,
+    data=None,
     bert_name="bert-base-uncased",
     max_length=512,
     batch_size=8,
     epochs=5,
     lr=2e-5,
     device=None,
+    use_fast_tokenizer=True,
+    window_stride=None,
+    bucket_by_length=False,
+    max_tokens_per_batch=None,
+    data_path=None,
+    cache_dir=None,
+    precision="fp32",
+    grad_accum_steps=1,
+    max_grad_norm=1.0,
+    frozen_layers=None,
+    feature_cache_dir=".ner_features",
 ):
     """
     Full pipeline: build splits from `data`, create BERT-BiLSTM-CRF, train, evaluate with seqeval.
+    window_stride: if set, documents longer than max_length are split into overlapping windows
+    (that many subwords of overlap) instead of being truncated.
+    bucket_by_length / max_tokens_per_batch: batch training samples of similar length with
+    LengthBucketBatchSampler (max_tokens_per_batch switches to a fixed token budget per batch).
+    data_path / cache_dir: read the corpus from a JSONL file instead of `data`; with cache_dir the
+    encoded splits are cached on disk (see load_cached_datasets).
+    precision: "fp32" or "bf16" (autocast for BERT/BiLSTM on CPU or CUDA; the CRF stays fp32).
+    grad_accum_steps: optimizer step every N batches (effective batch = batch_size * N).
+    max_grad_norm: gradient clipping norm (None disables). Each epoch logs tokens/sec and peak memory.
+    frozen_layers: freeze the BERT embeddings and the first N encoder layers (N >= 12 freezes all of
+    BERT). Their train-set outputs are computed once and cached as float16 under feature_cache_dir
+    (see cached_bert_features), so epochs only run the upper layers, BiLSTM, Linear and CRF.
     """
     if device is None:
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device = torch.device(device)
 
-    train_sents, train_labels, val_sents, val_labels, test_sents, test_labels = build_splits_from_data(
-        data, LABEL_MAPPING
-    )
-    print(f"Train: {len(train_sents)}, Val: {len(val_sents)}, Test: {len(test_sents)}")
-
-    tokenizer = BertTokenizer.from_pretrained(bert_name)
-    train_ds = BertBiLSTMCRFDataset(train_sents, train_labels, tokenizer, max_length)
-    val_ds = BertBiLSTMCRFDataset(val_sents, val_labels, tokenizer, max_length)
-    train_loader = DataLoader(
-        train_ds, batch_size=batch_size, shuffle=True, collate_fn=collate_bert_batch
-    )
-    val_loader = DataLoader(val_ds, batch_size=batch_size, collate_fn=collate_bert_batch)
+    tokenizer_cls = BertTokenizerFast if use_fast_tokenizer else BertTokenizer
+    tokenizer = tokenizer_cls.from_pretrained(bert_name)
+    if data_path is not None and cache_dir is not None:
+        train_ds, val_ds, _ = load_cached_datasets(
+            data_path, tokenizer, cache_dir, max_length, window_stride
+        )
+    else:
+        if data is None:
+            data = load_jsonl(data_path)
+        train_sents, train_labels, val_sents, val_labels, _, _ = build_splits_from_data(
+            data, LABEL_MAPPING
+        )
+        train_ds = BertBiLSTMCRFDataset(train_sents, train_labels, tokenizer, max_length, window_stride)
+        val_ds = BertBiLSTMCRFDataset(val_sents, val_labels, tokenizer, max_length, window_stride)
+    print(f"Train: {len(train_ds)}, Val: {len(val_ds)}")
+    collator = BertBatchCollator(pin_memory=device.type == "cuda", return_lengths=True)
+    if bucket_by_length or max_tokens_per_batch is not None:
+        train_sampler = LengthBucketBatchSampler(
+            train_ds.lengths(),
+            batch_size=None if max_tokens_per_batch is not None else batch_size,
+            max_tokens=max_tokens_per_batch,
+        )
+        train_loader = DataLoader(train_ds, batch_sampler=train_sampler, collate_fn=collator)
+        print(f"Length bucketing: padding ratio {train_sampler.padding_ratio():.1%}")
+    else:
+        train_loader = DataLoader(
+            train_ds, batch_size=batch_size, shuffle=True, collate_fn=collator
+        )
+    val_loader = DataLoader(val_ds, batch_size=batch_size, collate_fn=collator)
 
     model = BertBiLSTMCRF(bert_name=bert_name, num_labels=NUM_LABELS).to(device)
-    optimizer = torch.optim.AdamW(model.parameters(), lr=lr)
+    if frozen_layers is not None:
+        params = freeze_bert_layers(model, frozen_layers)
+        feature_ds = cached_bert_features(model, train_ds, frozen_layers, feature_cache_dir, batch_size, device, precision)
+        train_loader = DataLoader(
+            feature_ds,
+            batch_sampler=train_loader.batch_sampler,
+            collate_fn=FeatureBatchCollator(pin_memory=device.type == "cuda", return_lengths=True),
+        )
+        print(f"Frozen BERT layers: {min(frozen_layers, model.bert.config.num_hidden_layers)}, "
+              f"trainable parameters: {sum(p.numel() for p in params) / 1e6:.1f}M")
+    else:
+        params = list(model.parameters())
+    optimizer = torch.optim.AdamW(params, lr=lr)
 
     for epoch in range(epochs):
         model.train()
         total_loss = 0
-        for input_ids, attention_mask, labels in train_loader:
-            input_ids = input_ids.to(device)
-            attention_mask = attention_mask.to(device)
-            labels = labels.to(device)
-            optimizer.zero_grad()
-            loss = model(input_ids, attention_mask, labels)
-            loss.backward()
-            optimizer.step()
+        tokens = 0
+        reset_peak_memory(device)
+        start = time.perf_counter()
+        optimizer.zero_grad()
+        if isinstance(train_loader.batch_sampler, LengthBucketBatchSampler):
+            train_loader.batch_sampler.set_epoch(epoch)
+        step = 0
+        for step, (input_ids, attention_mask, labels, lengths) in enumerate(train_loader, 1):
+            input_ids = input_ids.to(device, non_blocking=True)
+            attention_mask = attention_mask.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True)
+            with autocast_context(device, precision):
+                if frozen_layers is not None:
+                    # input_ids holds the cached frozen-BERT features here
+                    loss = model.forward_from_features(input_ids, attention_mask, frozen_layers, labels, lengths)
+                else:
+                    loss = model(input_ids, attention_mask, labels, lengths=lengths)
+            (loss / grad_accum_steps).backward()
+            if step % grad_accum_steps == 0:
+                if max_grad_norm is not None:
+                    torch.nn.utils.clip_grad_norm_(params, max_grad_norm)
+                optimizer.step()
+                optimizer.zero_grad()
             total_loss += loss.item()
-        print(f"Epoch {epoch + 1}/{epochs} Loss: {total_loss / len(train_loader):.4f}")
+            tokens += int(lengths.sum())
+        if step % grad_accum_steps:
+            # Last, partial accumulation group: its losses were divided by grad_accum_steps, so rescale
+            # the gradients to the mean over the batches it actually has before clipping and stepping
+            scale = grad_accum_steps / (step % grad_accum_steps)
+            for p in params:
+                if p.grad is not None:
+                    p.grad.mul_(scale)
+            if max_grad_norm is not None:
+                torch.nn.utils.clip_grad_norm_(params, max_grad_norm)
+            optimizer.step()
+            optimizer.zero_grad()
+        elapsed = time.perf_counter() - start
+        print(
+            f"Epoch {epoch + 1}/{epochs} Loss: {total_loss / max(step, 1):.4f} "
+            f"[{precision}, accum {grad_accum_steps}] {tokens / elapsed:.0f} tokens/s, "
+            f"peak memory {peak_memory_mb(device):.0f} MB"
+        )
 
     # Evaluate with seqeval
     try:
@@ -289,35 +1982,7 @@ def build_and_train_bert_bilstm_crf(
         print("Install seqeval: pip install seqeval")
         return model
 
-    model.eval()
-    true_all, pred_all = [], []
-    with torch.no_grad():
-        for input_ids, attention_mask, labels in val_loader:
-            input_ids = input_ids.to(device)
-            attention_mask = attention_mask.to(device)
-            preds = model(input_ids, attention_mask)  # list of lists; each inner list = one per valid (masked) position
-            for b in range(input_ids.size(0)):
-                mask_b = attention_mask[b].cpu()
-                labs_b = labels[b].cpu()
-                pred_b = preds[b]
-                true_tok = []
-                pred_tok = []
-                pos_in_pred = 0
-                for i in range(mask_b.size(0)):
-                    if mask_b[i].item() == 0:
-                        break
-                    if pos_in_pred < len(pred_b):
-                        pred_label = ID2LABEL[pred_b[pos_in_pred]] if pred_b[pos_in_pred] < NUM_LABELS else "O"
-                    else:
-                        pred_label = "O"
-                    pos_in_pred += 1
-                    if labs_b[i].item() == -100:
-                        continue
-                    true_tok.append(ID2LABEL[labs_b[i].item()])
-                    pred_tok.append(pred_label)
-                if true_tok and pred_tok:
-                    true_all.append(true_tok)
-                    pred_all.append(pred_tok)
+    true_all, pred_all = evaluate_bert_bilstm_crf(model, val_loader, device)
     print(classification_report(true_all, pred_all))
     print("F1:", f1_score(true_all, pred_all))
     return model
@@ -325,17 +1990,10 @@ def build_and_train_bert_bilstm_crf(
 
 if __name__ == "__main__":
     # Example: load data from JSON then run (e.g. in Colab after loading data)
-    import json
-    import os
     default_path = "/content/drive/My Drive/DATASETS/entity_recognition_in_resumes.json"
     path = os.environ.get("RESUME_JSON", default_path)
     if os.path.exists(path):
-        data = []
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    data.append(json.loads(line))
+        data = load_jsonl(path)
         # Apply label_mapping to data annotations (same as notebook)
         for item in data:
             for ann in item.get("annotation", []):
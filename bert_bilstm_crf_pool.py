@@ -0,0 +1,171 @@
+"""
+Multi-process CPU inference pool for BERT-BiLSTM-CRF.
+
+The model is loaded once in the parent and N workers are forked from it. Weights are shared
+rather than copied: fork maps the parent's tensor storage copy-on-write and inference never writes
+to it (a bundle's weights are additionally file-backed mmap pages). Each worker gets
+cpu_count / N PyTorch intra-op threads, so workers do not oversubscribe cores, and while one
+worker tokenizes or runs the NAME/EMAIL rules the others keep the cores busy with forward passes.
+
+Documents are sorted by length, cut into chunks and handed out longest first from a shared queue:
+an idle worker always takes the next chunk, so a worker stuck on long resumes does not hold up the
+rest (dynamic self-scheduling; chunk order keeps padding low and the tail short).
+
+Usage:
+  with InferencePool("resume_ner.bundle", workers=8) as pool:
+      results = pool.map(texts)            # [(words, tags, entities)] in input order
+
+  python bert_bilstm_crf_pool.py --model resume_ner.bundle --data merged_resume_ner.json --workers 1 2 4 8
+
+Linux / macOS only (fork). Create the pool before running inference in the parent process.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import torch
+
+from bert_bilstm_crf_pipeline import load_bert_bilstm_crf, load_jsonl, parse_job_posters_batch, parse_resumes_batch
+
+PARSERS = {"resume": parse_resumes_batch, "job_poster": parse_job_posters_batch}
+
+# Per-worker state, set by _init_worker inside each worker (never in the parent)
+_worker = {}
+
+
+def available_cpus():
+    """CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _init_worker(threads, state):
+    # Fast tokenizers warn (and disable their thread pool) in forked children otherwise
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    torch.set_num_threads(threads)
+    # state comes through Pool initargs, which fork hands over without pickling (the model stays shared)
+    _worker.update(state)
+
+
+def _run_chunk(chunk):
+    indices, texts = chunk
+    s = _worker
+    with torch.inference_mode():
+        results = s["parse"](texts, s["tokenizer"], s["model"], "cpu", s["id2label"], s["max_len"], **s["kwargs"])
+    return indices, results, os.getpid()
+
+
+def private_memory_mb(pid):
+    """
+    Memory a process has written and owns alone (Private_Dirty from /proc/<pid>/smaps_rollup), in MB;
+    None where unavailable. Clean file-backed pages (a bundle's weights) are shared page cache.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+            kb = sum(int(line.split()[1]) for line in f if line.startswith("Private_Dirty:"))
+        return kb / 1024
+    except OSError:
+        return None
+
+
+class InferencePool:
+    """
+    Fork `workers` processes sharing one loaded model. map(texts) returns parse_*_batch results in
+    input order. threads_per_worker defaults to available CPUs // workers (at least 1); chunk_size
+    is the number of documents a worker takes at a time.
+    """
+
+    def __init__(self, model_path, workers=None, threads_per_worker=None, kind="resume", hybrid=True,
+                 max_len=512, chunk_size=8, **batch_kwargs):
+        if "fork" not in mp.get_all_start_methods():
+            raise RuntimeError("InferencePool needs the fork start method (Linux / macOS)")
+        cpus = available_cpus()
+        self.workers = workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        self.chunk_size = chunk_size
+        model, tokenizer, config = load_bert_bilstm_crf(model_path, "cpu")
+        for p in model.parameters():
+            p.requires_grad_(False)
+        state = dict(
+            model=model,
+            tokenizer=tokenizer,
+            id2label=config["id2label"],
+            parse=PARSERS[kind],
+            max_len=max_len,
+            kwargs=dict(batch_kwargs, hybrid=hybrid),
+        )
+        self._pool = mp.get_context("fork").Pool(
+            self.workers, initializer=_init_worker, initargs=(self.threads_per_worker, state)
+        )
+        self.worker_pids = set()
+
+    def map(self, texts):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        chunks = []
+        for start in range(0, len(order), self.chunk_size):
+            indices = order[start : start + self.chunk_size]
+            chunks.append((indices, [texts[i] for i in indices]))
+        results = [None] * len(texts)
+        for indices, chunk_results, pid in self._pool.imap_unordered(_run_chunk, chunks):
+            self.worker_pids.add(pid)
+            for i, result in zip(indices, chunk_results):
+                results[i] = result
+        return results
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark_pool(model_path, texts, worker_counts=(1, 2, 4), chunk_size=8, kind="resume"):
+    """
+    Documents/second of InferencePool.map for each worker count (one warm-up pass first), with the
+    private memory of each worker, which shows how much of the model is duplicated per process.
+    """
+    results = {}
+    for workers in worker_counts:
+        with InferencePool(model_path, workers=workers, kind=kind, chunk_size=chunk_size) as pool:
+            pool.map(texts[: workers * chunk_size])  # warm-up: one chunk per worker
+            t0 = time.perf_counter()
+            pool.map(texts)
+            elapsed = time.perf_counter() - t0
+            private = [private_memory_mb(pid) for pid in sorted(pool.worker_pids)]
+        private = [m for m in private if m is not None]
+        results[workers] = {
+            "docs_per_s": len(texts) / elapsed,
+            "threads_per_worker": pool.threads_per_worker,
+            "max_private_mb": max(private) if private else None,
+        }
+        base = results[worker_counts[0]]["docs_per_s"]
+        mem = f", worker private memory <= {max(private):.0f} MB" if private else ""
+        print(f"{workers:3d} workers x {pool.threads_per_worker} threads: {results[workers]['docs_per_s']:7.1f} docs/s "
+              f"({results[workers]['docs_per_s'] / base:.2f}x){mem}")
+    return results
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the multi-process inference pool")
+    p.add_argument("--model", required=True, help="Model directory or bundle")
+    p.add_argument("--data", required=True, help="JSONL with 'content' per line")
+    p.add_argument("--limit", type=int, default=400)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--chunk-size", type=int, default=8)
+    p.add_argument("--kind", choices=sorted(PARSERS), default="resume")
+    args = p.parse_args()
+    texts = [d["content"] for d in load_jsonl(args.data)[: args.limit]]
+    print(f"{len(texts)} documents, {available_cpus()} CPUs")
+    benchmark_pool(args.model, texts, args.workers, args.chunk_size, args.kind)
+
+
+if __name__ == "__main__":
+    main()
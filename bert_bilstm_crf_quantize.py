@@ -0,0 +1,172 @@
+"""
+Dynamic int8 quantization of a saved BERT-BiLSTM-CRF model for CPU inference, with an accuracy,
+latency and size report against the fp32 model.
+
+Quantizes every nn.Linear (BERT, hidden2tag) and the BiLSTM (see quantize_dynamic_int8) and writes
+the result as a separate model directory (same layout, ner_config.json gets
+"quantization": "dynamic_int8"), which load_bert_bilstm_crf, the server and parse_*_batch accept.
+
+Usage:
+  python bert_bilstm_crf_quantize.py --model-dir resume_ner --out resume_ner_int8 --split-dir splits/
+  python bert_bilstm_crf_quantize.py --model-dir resume_ner --out resume_ner_int8 --data merged_resume_ner.json
+
+--split-dir reads val.jsonl / test.jsonl written by write_split_files; --data rebuilds the val/test
+split with build_splits_from_data (same seed as training). The report is printed and saved as
+<out>/quantization_report.json.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import torch
+
+from bert_bilstm_crf_pipeline import (
+    build_splits_from_data,
+    load_bert_bilstm_crf,
+    load_jsonl,
+    predict_word_tags_batch,
+    quantize_dynamic_int8,
+    quantized_state_dict,
+    read_split_file,
+)
+
+STATE_FILE = "bert_bilstm_crf_state.pt"
+
+
+def save_quantized(qmodel, tokenizer, config, out_dir):
+    """Write the int8 model as a model directory: state dict (weights-only loadable), ner_config.json, tokenizer."""
+    os.makedirs(out_dir, exist_ok=True)
+    torch.save(quantized_state_dict(qmodel), os.path.join(out_dir, STATE_FILE))
+    saved = {k: v for k, v in config.items() if k != "id2label"}
+    saved["quantization"] = "dynamic_int8"
+    with open(os.path.join(out_dir, "ner_config.json"), "w", encoding="utf-8") as f:
+        json.dump(saved, f, indent=2)
+    tokenizer.save_pretrained(out_dir)
+
+
+def evaluate_word_tags(model, tokenizer, sentences, label_lists, id2label, max_len=512):
+    """
+    Word-level seqeval input for a split: tags each document with predict_word_tags_batch (the
+    inference path). Long documents are windowed, so every word gets a tag and is paired with
+    its gold label; a length mismatch is an error rather than a silent truncation.
+    """
+    texts = [" ".join(words) for words in sentences]
+    true_all, pred_all = [], []
+    for (words, tags), gold in zip(predict_word_tags_batch(texts, tokenizer, model, "cpu", id2label, max_len), label_lists):
+        assert len(tags) == len(gold), f"{len(tags)} predicted tags for {len(gold)} gold labels"
+        if tags:
+            true_all.append(list(gold))
+            pred_all.append(tags)
+    return true_all, pred_all
+
+
+def entity_scores(true_all, pred_all):
+    """seqeval per-entity precision / recall / F1 / support plus micro avg."""
+    from seqeval.metrics import classification_report
+
+    report = classification_report(true_all, pred_all, output_dict=True, zero_division=0)
+    return {
+        name: {k: float(v) for k, v in row.items()}
+        for name, row in report.items()
+        if name not in ("macro avg", "weighted avg")
+    }
+
+
+def measure_latency(model, tokenizer, lengths=(64, 128, 256, 512), repeats=10):
+    """Batch-1 CPU latency (ms) of a full forward + decode per subword length."""
+    g = torch.Generator().manual_seed(0)
+    results = {}
+    model.eval()
+    for length in lengths:
+        input_ids = torch.randint(1000, len(tokenizer), (1, length), generator=g)
+        input_ids[0, 0], input_ids[0, -1] = tokenizer.cls_token_id, tokenizer.sep_token_id
+        attention_mask = torch.ones_like(input_ids)
+        with torch.inference_mode():
+            model(input_ids, attention_mask)  # warm-up
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                model(input_ids, attention_mask)
+        results[length] = (time.perf_counter() - t0) * 1000 / repeats
+    return results
+
+
+def checkpoint_size_mb(path):
+    """Size of a model's weights: the bundle file itself, or STATE_FILE inside a model directory."""
+    return os.path.getsize(path if os.path.isfile(path) else os.path.join(path, STATE_FILE)) / 2**20
+
+
+def quantization_report(model, qmodel, tokenizer, splits, id2label, model_dir, out_dir, lengths, repeats, max_len=512):
+    """Per-split seqeval deltas, latency and checkpoint size of the int8 model against fp32."""
+    report = {"splits": {}, "latency_ms": {}, "size_mb": {}}
+    for name, (sentences, label_lists) in splits.items():
+        fp32 = entity_scores(*evaluate_word_tags(model, tokenizer, sentences, label_lists, id2label, max_len))
+        int8 = entity_scores(*evaluate_word_tags(qmodel, tokenizer, sentences, label_lists, id2label, max_len))
+        report["splits"][name] = {
+            entity: {
+                "f1_fp32": fp32[entity]["f1-score"],
+                "f1_int8": int8.get(entity, {}).get("f1-score", 0.0),
+                "f1_delta": int8.get(entity, {}).get("f1-score", 0.0) - fp32[entity]["f1-score"],
+                "support": int(fp32[entity]["support"]),
+            }
+            for entity in fp32
+        }
+    fp32_ms = measure_latency(model, tokenizer, lengths, repeats)
+    int8_ms = measure_latency(qmodel, tokenizer, lengths, repeats)
+    for length in lengths:
+        report["latency_ms"][length] = {"fp32": fp32_ms[length], "int8": int8_ms[length],
+                                        "speedup": fp32_ms[length] / int8_ms[length]}
+    report["size_mb"] = {
+        "fp32": checkpoint_size_mb(model_dir),
+        "int8": checkpoint_size_mb(out_dir),
+    }
+    return report
+
+
+def print_report(report):
+    for name, rows in report["splits"].items():
+        print(f"\n{name}: seqeval F1 (word level)")
+        print(f"  {'entity':<14}{'fp32':>8}{'int8':>8}{'delta':>9}{'support':>9}")
+        for entity, row in rows.items():
+            print(f"  {entity:<14}{row['f1_fp32']:>8.4f}{row['f1_int8']:>8.4f}{row['f1_delta']:>+9.4f}{row['support']:>9d}")
+    print("\nLatency, batch 1 (ms)")
+    for length, row in report["latency_ms"].items():
+        print(f"  len {length:>4}: fp32 {row['fp32']:8.1f}  int8 {row['int8']:8.1f}  ({row['speedup']:.2f}x)")
+    size = report["size_mb"]
+    print(f"\nCheckpoint size: fp32 {size['fp32']:.1f} MB, int8 {size['int8']:.1f} MB ({size['fp32'] / size['int8']:.2f}x smaller)")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Quantize a saved BERT-BiLSTM-CRF model to dynamic int8 and report accuracy/latency/size")
+    p.add_argument("--model-dir", required=True, help="fp32 model directory (bert_bilstm_crf_state.pt, ner_config.json, tokenizer) or bundle")
+    p.add_argument("--out", required=True, help="Output directory for the int8 model")
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--split-dir", help="Directory with val.jsonl / test.jsonl from write_split_files")
+    source.add_argument("--data", help="Raw JSONL; val/test rebuilt with build_splits_from_data")
+    p.add_argument("--seed", type=int, default=42, help="Split seed for --data (as in training)")
+    p.add_argument("--lengths", type=int, nargs="+", default=[64, 128, 256, 512])
+    p.add_argument("--repeats", type=int, default=10)
+    p.add_argument("--max-len", type=int, default=512)
+    args = p.parse_args()
+
+    model, tokenizer, config = load_bert_bilstm_crf(args.model_dir, "cpu")
+    qmodel = quantize_dynamic_int8(model)
+    save_quantized(qmodel, tokenizer, config, args.out)
+    print(f"Saved int8 model to {args.out}")
+
+    if args.split_dir:
+        splits = {name: read_split_file(os.path.join(args.split_dir, f"{name}.jsonl")) for name in ("val", "test")}
+    else:
+        _, _, val_s, val_l, test_s, test_l = build_splits_from_data(load_jsonl(args.data), seed=args.seed)
+        splits = {"val": (val_s, val_l), "test": (test_s, test_l)}
+    report = quantization_report(
+        model, qmodel, tokenizer, splits, config["id2label"], args.model_dir, args.out, args.lengths, args.repeats, args.max_len
+    )
+    print_report(report)
+    with open(os.path.join(args.out, "quantization_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Hot-swappable model versions for serving BERT-BiLSTM-CRF (one registry per document type).
+
+ModelRegistry.load(path) loads a saved model directory or bundle and warms it with a few dummy
+batches (first-call allocations and kernel selection happen before real traffic). activate(version)
+then switches traffic atomically: new calls wait while the switch is pending, calls already running
+on the old version finish on it, and only then does the active version (and the result cache
+fingerprint) change. Loading runs on the caller's thread, so the server does it on a loader thread
+while the old version keeps serving.
+
+Shadow mode: set_shadow(version, sample_rate) also runs the shadow version on a sample of batches.
+A sampled batch is parsed by the primary without the result cache, on the same input the model gets
+(normalized text when caching), so both latencies are uncached model time on identical input. The
+shadow then runs as a separate job on `executor` after the primary results are returned: pass the
+server's model worker so shadow batches queue behind real ones and only one batch runs at a time
+(requests never wait for a shadow result; while a shadow job is pending, new samples are dropped).
+For each sampled document it records entity-level disagreement: agreement = |A & B| / |A | B| over
+(type, value) pairs; differing documents are appended to shadow_log (JSONL) when set.
+promote_shadow() activates it.
+
+Usage:
+  registry = ModelRegistry("resume", cache=ResultCache())
+  registry.activate(registry.load("resume_ner"))
+  results = registry.predict(texts)
+  registry.set_shadow(registry.load("resume_ner_v2"), sample_rate=0.1)
+  registry.stats()["shadow"]                # latency + disagreement so far
+  registry.promote_shadow()
+
+  python bert_bilstm_crf_server.py --resume-model resume_ner --admin
+  curl -XPOST localhost:8000/models/load -d '{"type": "resume", "path": "resume_ner_v2", "shadow": true}'
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bert_bilstm_crf_cache import CachedParser, model_fingerprint, normalize_text
+from bert_bilstm_crf_pipeline import load_bert_bilstm_crf, parse_job_posters_batch, parse_resumes_batch
+
+PARSERS = {"resume": parse_resumes_batch, "job_poster": parse_job_posters_batch}
+
+# Short, medium and long documents so warm-up covers the shapes real batches take
+WARMUP_TEXTS = [
+    "John Smith\njohn.smith@example.com\nSoftware Engineer with Python and SQL experience.",
+    "Jane Doe\nData Analyst at Acme Corp\nSkills: Excel, Tableau, SQL, Python\n" * 8,
+    "Senior Java Developer. Spring Boot, Kubernetes, AWS. BSc Computer Science.\n" * 40,
+]
+
+
+class ModelVersion:
+    """One loaded model: its raw batch parse function plus identity (version, path, fingerprint)."""
+
+    def __init__(self, kind, path, version, device=None, max_len=512, max_batch_size=32, hybrid=True, window_stride=128):
+        self.kind = kind
+        self.path = path
+        self.version = version
+        self.fingerprint = model_fingerprint(path)
+        # Every option that changes the parse output, so cached results are only reused for the same ones
+        self.cache_namespace = f"{kind}:max_len={max_len}:hybrid={hybrid}:window_stride={window_stride}"
+        model, tokenizer, config = load_bert_bilstm_crf(path, device)
+        device = next(model.parameters()).device
+        parse = PARSERS[kind]
+
+        def parse_batch(texts):
+            return parse(texts, tokenizer, model, device, config["id2label"], max_len,
+                         hybrid=hybrid, max_batch_size=max_batch_size, window_stride=window_stride)
+
+        self.parse_batch = parse_batch
+        self.predict = parse_batch  # wrapped with the result cache when activated
+        self.loaded_at = time.time()
+        self.warmup_ms = None
+        self.calls = 0
+        self.in_flight = 0
+
+    def warm(self, rounds=2):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            self.parse_batch(WARMUP_TEXTS)
+        self.warmup_ms = (time.perf_counter() - start) * 1000
+        return self
+
+    def info(self):
+        return {"version": self.version, "path": self.path, "fingerprint": self.fingerprint[:12],
+                "loaded_at": self.loaded_at, "warmup_ms": self.warmup_ms, "calls": self.calls}
+
+
+def entity_pairs(entities):
+    return {(etype, value) for etype, values in entities.items() for value in values}
+
+
+def entity_agreement(primary, shadow):
+    """Jaccard overlap of the (type, value) pairs of two entity dicts; 1.0 when both are empty."""
+    a, b = entity_pairs(primary), entity_pairs(shadow)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+class ModelRegistry:
+    """
+    Active (and optional shadow) ModelVersion for one document type. Thread-safe. Shadow jobs run
+    on `executor` (the server's model worker), or on a private thread when it is None.
+    """
+
+    def __init__(self, kind, cache=None, device=None, max_len=512, max_batch_size=32, shadow_log=None, executor=None):
+        self.kind = kind
+        self.cache = cache
+        self.device = device
+        self.max_len = max_len
+        self.max_batch_size = max_batch_size
+        self.shadow_log = shadow_log
+        self.active = None
+        self.shadow = None
+        self.sample_rate = 0.0
+        self.swaps = 0
+        self._versions = 0
+        self._switching = False
+        self._cond = threading.Condition()
+        self._own_executor = executor is None
+        self._shadow_executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"ner-shadow-{kind}")
+        self._shadow_busy = threading.Semaphore(1)
+        self._stats_lock = threading.Lock()
+        self._reset_shadow_stats()
+
+    def _reset_shadow_stats(self):
+        with self._stats_lock:
+            self.shadow_stats = {"batches": 0, "texts": 0, "disagreeing_texts": 0, "agreement_sum": 0.0,
+                                 "primary_ms_sum": 0.0, "shadow_ms_sum": 0.0, "dropped": 0, "errors": 0}
+
+    def load(self, path, warm=True):
+        """Load and warm a new version (blocking; call from a background thread while serving)."""
+        with self._cond:
+            self._versions += 1
+            version = f"v{self._versions}"
+        print(f"[{self.kind}] loading {version} from {path}")
+        loaded = ModelVersion(self.kind, path, version, self.device, self.max_len, self.max_batch_size)
+        if warm:
+            loaded.warm()
+            print(f"[{self.kind}] {version} warmed up in {loaded.warmup_ms:.0f} ms")
+        return loaded
+
+    def activate(self, version):
+        """Switch traffic to `version` once calls running on the current version have finished."""
+        with self._cond:
+            self._switching = True
+            try:
+                old = self.active
+                while old is not None and old.in_flight:
+                    self._cond.wait()
+                if self.cache is not None:
+                    # Switches the cache's fingerprint, which drops the previous version's results
+                    version.predict = CachedParser(
+                        version.parse_batch, version.fingerprint, self.cache, namespace=version.cache_namespace
+                    )
+                if self.shadow is version:
+                    self.shadow = None
+                self.active = version
+                self.swaps += old is not None
+            finally:
+                self._switching = False
+                self._cond.notify_all()
+        print(f"[{self.kind}] serving {version.version} ({version.path})"
+              + (f", replaced {old.version}" if old is not None else ""))
+        return old
+
+    def set_shadow(self, version, sample_rate=0.1):
+        with self._cond:
+            self.shadow = version
+            self.sample_rate = sample_rate
+            self._reset_shadow_stats()
+        print(f"[{self.kind}] shadowing {version.version} on {sample_rate:.0%} of batches")
+
+    def stop_shadow(self):
+        with self._cond:
+            self.shadow = None
+
+    def promote_shadow(self):
+        shadow = self.shadow
+        if shadow is None:
+            raise ValueError(f"no shadow {self.kind} model to promote")
+        return self.activate(shadow)
+
+    def predict(self, texts):
+        """Parse a batch with the active version; sampled batches are also sent to the shadow version."""
+        with self._cond:
+            while self._switching:
+                self._cond.wait()
+            version = self.active
+            if version is None:
+                raise RuntimeError(f"no {self.kind} model is active")
+            version.in_flight += 1
+            version.calls += 1
+            shadow = self.shadow if self.shadow is not None and random.random() < self.sample_rate else None
+        if shadow is not None and not self._shadow_busy.acquire(blocking=False):
+            with self._stats_lock:
+                self.shadow_stats["dropped"] += 1
+            shadow = None
+        try:
+            if shadow is None:
+                return version.predict(texts)
+            # Uncached, on the input the model sees, so the shadow is compared like for like
+            inputs = [normalize_text(t) for t in texts] if self.cache is not None else list(texts)
+            start = time.perf_counter()
+            results = version.parse_batch(inputs)
+            primary_ms = (time.perf_counter() - start) * 1000
+        except BaseException:
+            if shadow is not None:
+                self._shadow_busy.release()
+            raise
+        finally:
+            with self._cond:
+                version.in_flight -= 1
+                self._cond.notify_all()
+        self._shadow_executor.submit(self._run_shadow, shadow, version, inputs, results, primary_ms)
+        return results
+
+    def _run_shadow(self, shadow, primary, texts, results, primary_ms):
+        try:
+            start = time.perf_counter()
+            shadow_results = shadow.parse_batch(texts)
+            shadow_ms = (time.perf_counter() - start) * 1000
+            records, agreements = [], []
+            for text, (_, _, ents), (_, _, shadow_ents) in zip(texts, results, shadow_results):
+                agreement = entity_agreement(ents, shadow_ents)
+                agreements.append(agreement)
+                if agreement < 1.0:
+                    a, b = entity_pairs(ents), entity_pairs(shadow_ents)
+                    records.append({
+                        "time": time.time(), "kind": self.kind, "primary": primary.version, "shadow": shadow.version,
+                        "text_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+                        "agreement": agreement, "primary_ms": primary_ms, "shadow_ms": shadow_ms,
+                        "only_primary": sorted(a - b), "only_shadow": sorted(b - a),
+                    })
+            with self._stats_lock:
+                stats = self.shadow_stats
+                stats["batches"] += 1
+                stats["primary_ms_sum"] += primary_ms
+                stats["shadow_ms_sum"] += shadow_ms
+                stats["texts"] += len(agreements)
+                stats["agreement_sum"] += sum(agreements)
+                stats["disagreeing_texts"] += len(records)
+            if records and self.shadow_log:
+                with open(self.shadow_log, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+        except Exception as err:  # a broken shadow model must not affect serving
+            with self._stats_lock:
+                self.shadow_stats["errors"] += 1
+            print(f"[{self.kind}] shadow {shadow.version} failed: {type(err).__name__}: {err}")
+        finally:
+            self._shadow_busy.release()
+
+    def stats(self):
+        out = {"active": self.active.info() if self.active else None, "swaps": self.swaps, "shadow": None}
+        if self.shadow is not None:
+            with self._stats_lock:
+                s = dict(self.shadow_stats)
+            batches, texts = s["batches"], s["texts"]
+            out["shadow"] = dict(
+                self.shadow.info(),
+                sample_rate=self.sample_rate,
+                batches=batches,
+                texts=texts,
+                dropped=s["dropped"],
+                errors=s["errors"],
+                disagreeing_texts=s["disagreeing_texts"],
+                mean_agreement=s["agreement_sum"] / texts if texts else None,
+                primary_ms_mean=s["primary_ms_sum"] / batches if batches else None,
+                shadow_ms_mean=s["shadow_ms_sum"] / batches if batches else None,
+            )
+        return out
+
+    def close(self):
+        if self._own_executor:
+            self._shadow_executor.shutdown(wait=True)
@@ -0,0 +1,435 @@
+"""
+Local HTTP inference server for saved BERT-BiLSTM-CRF models (resumes and job posters).
+
+Loads each model directory written by the notebooks' save cell (bert_bilstm_crf_state.pt,
+ner_config.json, tokenizer files). Concurrent requests are coalesced into micro-batches: a batch
+is dispatched when it holds max_batch_size texts or max_wait_ms after its first request, whichever
+comes first. Batches run one at a time on a single model worker thread, so the asyncio front end
+stays responsive while the model runs. When more than max_queue requests are waiting, new ones get
+503; a request not answered within its timeout gets 504, and one whose batch fails in the model gets
+500. Results are cached by normalized text and
+model fingerprint (bert_bilstm_crf_cache), so re-submitted documents skip the model.
+
+Each document type is served through a ModelRegistry (bert_bilstm_crf_registry): with --admin a new
+model directory can be loaded and warmed on a loader thread while the current one keeps serving,
+then switched to atomically (running batches finish on the old version), or run as a shadow on a
+sample of batches to compare latency and entities before promoting it.
+
+Usage:
+  python bert_bilstm_crf_server.py --resume-model resume_ner --job-poster-model job_poster_ner --port 8000
+
+Endpoints:
+  POST /extract   {"type": "resume" | "job_poster", "text": "..."}       -> {"entities": {...}}
+                  {"type": ..., "texts": ["...", ...], "return_tags": true} -> {"results": [...]}
+                  optional "timeout" (seconds) overrides --timeout
+  GET  /stats     micro-batch and result-cache counters per model
+  GET  /metrics   per-stage latency histograms in Prometheus text format (with --metrics)
+  GET  /healthz   liveness: 200 while the process serves requests
+  GET  /readyz    readiness: 200 once every model is loaded and its worker is running, else 503
+  GET  /models    active / shadow version, loading state and shadow comparison per type
+  POST /models/load         {"type": ..., "path": "...", "shadow": false, "sample_rate": 0.1}  (--admin)
+  POST /models/promote      {"type": ...}   shadow -> active                                    (--admin)
+  POST /models/stop-shadow  {"type": ...}                                                       (--admin)
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bert_bilstm_crf_cache import ResultCache
+from bert_bilstm_crf_metrics import enable_stage_metrics
+from bert_bilstm_crf_registry import ModelRegistry
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class QueueFullError(Exception):
+    """Raised by MicroBatcher.submit when max_queue requests are already waiting."""
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent requests for one model into micro-batches.
+    submit(texts) queues a request and returns its results; run() collects requests until the batch
+    holds max_batch_size texts or max_wait_ms have passed since its first request, then calls
+    `predict(texts)` on the worker executor. Requests that timed out while queued are dropped.
+    """
+
+    def __init__(self, predict, executor, max_batch_size=32, max_wait_ms=10, max_queue=256):
+        self.predict = predict
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.batches = 0
+        self.texts = 0
+
+    async def submit(self, texts, timeout=None):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((texts, future))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.queue.maxsize} requests already queued") from None
+        return await asyncio.wait_for(future, timeout)
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return [(texts, fut) for texts, fut in batch if not fut.done()]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            texts = [t for item_texts, _ in batch for t in item_texts]
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict, texts)
+            except Exception as err:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(err)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for item_texts, fut in batch:
+                if not fut.done():
+                    fut.set_result(results[start : start + len(item_texts)])
+                start += len(item_texts)
+
+
+class NERServer:
+    """Loads the models, owns one MicroBatcher per document type and serves HTTP/1.1 with keep-alive."""
+
+    def __init__(self, model_dirs, device=None, max_batch_size=32, max_wait_ms=10, max_queue=256,
+                 timeout=30.0, max_body_bytes=2 << 20, max_len=512, cache_bytes=64 << 20, cache_db=None,
+                 metrics=False, admin=False, shadow_log=None):
+        self.model_dirs = model_dirs
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.max_len = max_len
+        self.caches = {
+            kind: ResultCache(cache_bytes, cache_db, table=f"results_{kind}") for kind in model_dirs
+        } if cache_bytes else {}
+        # One worker thread: batches for all models (shadow batches included) share the device and run one at a time
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ner-worker")
+        self.registries = {
+            kind: ModelRegistry(kind, self.caches.get(kind), device, max_len, max_batch_size, shadow_log, self.executor)
+            for kind in model_dirs
+        }
+        self.admin = admin
+        # Model loading and warm-up run here, so serving continues during a swap
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ner-loader")
+        self.loading = {}  # kind -> path being loaded
+        self.last_load = {}  # kind -> outcome of the last /models/load
+        self.batchers = {}
+        self.tasks = []  # one MicroBatcher.run per loaded model; all must be running for /readyz
+        self.background = set()  # every task started by _spawn (batchers, model loading) until it finishes
+        self.load_error = None
+        self.metrics = enable_stage_metrics() if metrics else None
+
+    def _spawn(self, coro, what):
+        """Create a task that stays referenced until it finishes and whose failure is logged."""
+        task = asyncio.create_task(coro)
+        self.background.add(task)
+        task.add_done_callback(lambda t: self._task_done(t, what))
+        return task
+
+    def _task_done(self, task, what):
+        self.background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            err = task.exception()
+            print(f"{what} failed: {type(err).__name__}: {err}")
+
+    async def load_models(self):
+        loop = asyncio.get_running_loop()
+        try:
+            for kind, load_dir in self.model_dirs.items():
+                registry = self.registries[kind]
+                version = await loop.run_in_executor(self.loader, registry.load, load_dir)
+                await loop.run_in_executor(self.loader, registry.activate, version)
+                batcher = MicroBatcher(
+                    registry.predict, self.executor, self.max_batch_size, self.max_wait_ms, self.max_queue
+                )
+                self.batchers[kind] = batcher
+                self.tasks.append(self._spawn(batcher.run(), f"{kind} micro-batcher"))
+                print(f"Loaded {kind} model from {load_dir}")
+        except Exception as err:
+            self.load_error = f"{type(err).__name__}: {err}"
+            print(f"Model loading failed: {self.load_error}")
+
+    async def load_version(self, kind, path, shadow=False, sample_rate=0.1):
+        """Load and warm `path` on the loader thread, then activate it or run it as the shadow."""
+        loop = asyncio.get_running_loop()
+        registry = self.registries[kind]
+        try:
+            version = await loop.run_in_executor(self.loader, registry.load, path)
+            if shadow:
+                registry.set_shadow(version, sample_rate)
+            else:
+                await loop.run_in_executor(self.loader, registry.activate, version)
+            self.last_load[kind] = {"path": path, "version": version.version, "shadow": shadow, "ok": True}
+        except Exception as err:
+            self.last_load[kind] = {"path": path, "ok": False, "error": f"{type(err).__name__}: {err}"}
+            print(f"Loading {path} for {kind} failed: {self.last_load[kind]['error']}")
+        finally:
+            self.loading.pop(kind, None)
+
+    async def manage_models(self, action, payload):
+        if not self.admin:
+            return 403, {"error": "model management is off; start the server with --admin"}
+        kind = payload.get("type", "resume")
+        if kind not in self.registries:
+            return 400, {"error": f"unknown type {kind!r}; served: {sorted(self.registries)}"}
+        registry = self.registries[kind]
+        if action == "load":
+            path = payload.get("path")
+            if not isinstance(path, str) or not path:
+                return 400, {"error": 'expected "path": model directory or bundle'}
+            if kind in self.loading:
+                return 409, {"error": f"already loading {self.loading[kind]} for {kind}"}
+            try:
+                sample_rate = float(payload.get("sample_rate", 0.1))
+            except (TypeError, ValueError):
+                return 400, {"error": '"sample_rate" must be a number'}
+            self.loading[kind] = path
+            self._spawn(self.load_version(kind, path, bool(payload.get("shadow")), sample_rate), f"loading {path}")
+            return 202, {"status": "loading", "type": kind, "path": path}
+        if action == "promote":
+            if registry.shadow is None:
+                return 409, {"error": f"no shadow {kind} model to promote"}
+            await asyncio.get_running_loop().run_in_executor(self.loader, registry.promote_shadow)
+            return 200, registry.stats()
+        if action == "stop-shadow":
+            registry.stop_shadow()
+            return 200, registry.stats()
+        return 404, {"error": f"no route /models/{action}"}
+
+    def ready(self):
+        return (
+            self.load_error is None
+            and len(self.batchers) == len(self.model_dirs)
+            and all(not task.done() for task in self.tasks)
+        )
+
+    async def extract(self, payload):
+        kind = payload.get("type", "resume")
+        if kind not in self.model_dirs:
+            return 400, {"error": f"unknown type {kind!r}; served: {sorted(self.model_dirs)}"}
+        batcher = self.batchers.get(kind)
+        if batcher is None:
+            return 503, {"error": f"{kind} model is not loaded"}
+        single = "texts" not in payload
+        texts = [payload.get("text")] if single else payload["texts"]
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return 400, {"error": 'expected "text": str or "texts": [str, ...]'}
+        try:
+            timeout = float(payload.get("timeout", self.timeout))
+        except (TypeError, ValueError):
+            timeout = None
+        if timeout is None or not timeout > 0:
+            return 400, {"error": '"timeout" must be a positive number of seconds'}
+        start = time.perf_counter()
+        try:
+            parsed = await batcher.submit(texts, timeout)
+        except QueueFullError as err:
+            return 503, {"error": f"server busy: {err}"}
+        except asyncio.TimeoutError:
+            return 504, {"error": f"not answered within {timeout:g}s"}
+        except Exception as err:
+            print(f"[{kind}] batch failed: {type(err).__name__}: {err}")
+            return 500, {"error": f"model failed: {type(err).__name__}"}
+        if self.metrics is not None:
+            self.metrics.observe("request", time.perf_counter() - start)
+        return_tags = bool(payload.get("return_tags"))
+        results = []
+        for words, tags, entities in parsed:
+            item = {"entities": entities}
+            if return_tags:
+                item["words"], item["tags"] = words, tags
+            results.append(item)
+        return 200, results[0] if single else {"results": results}
+
+    async def route(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/healthz":
+            return 200, {"status": "ok"}
+        if path == "/readyz":
+            status = {
+                "ready": self.ready(),
+                "models": {kind: kind in self.batchers for kind in self.model_dirs},
+                "queued": {kind: b.queue.qsize() for kind, b in self.batchers.items()},
+            }
+            if self.load_error:
+                status["error"] = self.load_error
+            return (200 if status["ready"] else 503), status
+        if path == "/stats":
+            return 200, {
+                kind: {
+                    "batches": b.batches,
+                    "texts": b.texts,
+                    "queued": b.queue.qsize(),
+                    "cache": self.caches[kind].stats() if kind in self.caches else None,
+                    "model": self.registries[kind].stats(),
+                }
+                for kind, b in self.batchers.items()
+            }
+        if path == "/models":
+            return 200, {
+                kind: dict(registry.stats(), loading=self.loading.get(kind), last_load=self.last_load.get(kind))
+                for kind, registry in self.registries.items()
+            }
+        if path == "/metrics":
+            if self.metrics is None:
+                return 404, {"error": "stage metrics are off; start the server with --metrics"}
+            return 200, self.metrics.prometheus_text()
+        if path == "/extract" or path.startswith("/models/"):
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            try:
+                payload = json.loads(body or b"{}")
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                return 400, {"error": "body must be JSON"}
+            if not isinstance(payload, dict):
+                return 400, {"error": "body must be a JSON object"}
+            if path == "/extract":
+                return await self.extract(payload)
+            return await self.manage_models(path[len("/models/"):], payload)
+        return 404, {"error": f"no route {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > self.max_body_bytes:
+                    await self._respond(writer, 413, {"error": f"body over {self.max_body_bytes} bytes"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                try:
+                    status, payload = await self.route(method.upper(), path, body)
+                except Exception as err:
+                    print(f"{method} {path} failed: {type(err).__name__}: {err}")
+                    status, payload = 500, {"error": f"internal error: {type(err).__name__}"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        if isinstance(payload, str):  # /metrics
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port} (models: {', '.join(self.model_dirs)})")
+        # Load in the background so /healthz and /readyz answer while BERT loads
+        self._spawn(self.load_models(), "model loading")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Serve saved BERT-BiLSTM-CRF models over HTTP with micro-batching")
+    p.add_argument("--resume-model", help="Directory with the saved resume model (ner_config.json, ...)")
+    p.add_argument("--job-poster-model", help="Directory with the saved job poster model")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--device", default=None, help="cpu / cuda (default: cuda if available)")
+    p.add_argument("--max-batch-size", type=int, default=32, help="Max texts per micro-batch")
+    p.add_argument("--max-wait-ms", type=float, default=10, help="Max time a batch waits to fill after its first request")
+    p.add_argument("--max-queue", type=int, default=256, help="Max queued requests per model before 503")
+    p.add_argument("--timeout", type=float, default=30.0, help="Default per-request timeout in seconds")
+    p.add_argument("--max-len", type=int, default=512, help="Max subwords per model window (longer documents are windowed)")
+    p.add_argument("--cache-mb", type=float, default=64, help="In-memory result cache size per model (0 disables caching)")
+    p.add_argument("--cache-db", default=None, help="SQLite file for the on-disk result cache tier")
+    p.add_argument("--metrics", action="store_true", help="Time each extraction stage and serve GET /metrics")
+    p.add_argument("--admin", action="store_true", help="Enable POST /models/* (load, shadow, promote models)")
+    p.add_argument("--shadow-log", default=None, help="JSONL file for documents where the shadow model disagrees")
+    args = p.parse_args()
+
+    model_dirs = {}
+    if args.resume_model:
+        model_dirs["resume"] = args.resume_model
+    if args.job_poster_model:
+        model_dirs["job_poster"] = args.job_poster_model
+    if not model_dirs:
+        p.error("give --resume-model and/or --job-poster-model")
+    server = NERServer(
+        model_dirs,
+        device=args.device,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue,
+        timeout=args.timeout,
+        max_len=args.max_len,
+        cache_bytes=int(args.cache_mb * 2**20),
+        cache_db=args.cache_db,
+        metrics=args.metrics,
+        admin=args.admin,
+        shadow_log=args.shadow_log,
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,13 @@ Usage:
   # Optional: pause 2 seconds after each batch to reduce rate limits
   python generate_resumes_llm.py --target 1000 --output llm_generated_resumes.jsonl --batch-size 100 --delay-batch 2
 
+  # 8 calls in flight, kept under 500 requests/min and 200k tokens/min (429s wait for Retry-After)
+  python generate_resumes_llm.py --target 1000 --output llm_generated_resumes.jsonl --per-call 5 --concurrency 8 --rpm 500 --tpm 200000
+
+  # Try the concurrent engine offline against the mock server in tests/ (latency, random 429s)
+  python tests/mock_openai_server.py --port 8765 --rate-429 0.1
+  python generate_resumes_llm.py --base-url http://127.0.0.1:8765/v1 --api-key x --target 100 --output mock.jsonl --concurrency 8
+
   # Merge with existing merged dataset
   cat merged_1030_plus_all_llm.jsonl llm_sri_lanka_tech.jsonl > merged_1030_plus_all_llm_plus_sri_lanka_tech.jsonl
 
@@ -34,6 +41,7 @@ Usage:
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
 import random
@@ -400,16 +408,56 @@ def _item_needs_fix(item: dict) -> bool:
     return _item_fails_completeness(item) or _item_fails_occupation(item) or _item_education_spans_incomplete(item)
 
 
-def fix_item_entities(client, item: dict, model: str = "gpt-4o-mini", timeout: int = 45) -> dict | None:
-    """Second LLM call: given content + current annotation, return item with fixed annotation or None on failure."""
+def _keep_item(item: dict | None, strict_completeness: bool) -> bool:
+    """Completeness gate applied after the optional fix call (missing tags, EDUCATION spans, OCCUPATION)."""
     if not item:
-        return None
+        return False
+    if not strict_completeness:
+        return True
+    return not (_item_fails_completeness(item) or _item_education_spans_incomplete(item) or _item_fails_occupation(item))
+
+
+def _fix_user_prompt(item: dict) -> str | None:
+    """Prompt for the fix-entities call, or None when the item has no content."""
     content = (item.get("content") or "").strip()
     if not content:
         return None
     current = _annotation_to_entities_list(item.get("annotation") or [])
     current_entities_str = json.dumps(current, ensure_ascii=False, indent=0)
-    user_prompt = FIX_ENTITIES_USER_TEMPLATE.format(content=content, current_entities=current_entities_str)
+    return FIX_ENTITIES_USER_TEMPLATE.format(content=content, current_entities=current_entities_str)
+
+
+def _item_from_fix_response(item: dict, raw: str) -> dict | None:
+    """Item with the annotation returned by the fix call, or None if the response is unusable."""
+    if not raw:
+        return None
+    content = (item.get("content") or "").strip()
+    try:
+        data = _extract_json_from_response(raw)
+    except Exception as parse_err:
+        print(f"Fix-entities parse failed: {parse_err}", file=sys.stderr)
+        return None
+    if isinstance(data, list):
+        entities = data
+    elif isinstance(data, dict):
+        entities = data.get("entities")
+    else:
+        entities = None
+    if not isinstance(entities, list):
+        return None
+    annotations = _find_spans_in_order(content, entities)
+    if not annotations:
+        return None
+    return {"content": content, "annotation": annotations, "extras": None}
+
+
+def fix_item_entities(client, item: dict, model: str = "gpt-4o-mini", timeout: int = 45) -> dict | None:
+    """Second LLM call: given content + current annotation, return item with fixed annotation or None on failure."""
+    if not item:
+        return None
+    user_prompt = _fix_user_prompt(item)
+    if user_prompt is None:
+        return None
     try:
         response = client.chat.completions.create(
             model=model,
@@ -421,40 +469,54 @@ def fix_item_entities(client, item: dict, model: str = "gpt-4o-mini", timeout: i
             timeout=timeout,
         )
         raw = (response.choices[0].message.content or "").strip()
-        if not raw:
-            return None
-        try:
-            data = _extract_json_from_response(raw)
-        except Exception as parse_err:
-            print(f"Fix-entities parse failed: {parse_err}", file=sys.stderr)
-            return None
-        if isinstance(data, list):
-            entities = data
-        elif isinstance(data, dict):
-            entities = data.get("entities")
-        else:
-            entities = None
-        if not isinstance(entities, list):
-            return None
-        annotations = _find_spans_in_order(content, entities)
-        if not annotations:
-            return None
-        return {"content": content, "annotation": annotations, "extras": None}
+        return _item_from_fix_response(item, raw)
     except Exception as e:
         print(f"Fix-entities call failed: {e}", file=sys.stderr)
         return None
 
 
+def _batch_user_prompt(n: int, entity_rich: bool = False, sri_lanka_tech: bool = False) -> str:
+    if sri_lanka_tech:
+        return BATCH_USER_PROMPT_SRI_LANKA_TECH_TEMPLATE.format(n=n)
+    user_prompt = BATCH_USER_PROMPT_TEMPLATE.format(n=n)
+    if entity_rich:
+        user_prompt += "\n\n" + ENTITY_RICH_APPEND
+    return user_prompt
+
+
+def _items_from_batch_response(raw: str) -> list[dict]:
+    """Parse a batch response into items (before the completeness gate)."""
+    if not raw:
+        return []
+    try:
+        data = _extract_json_from_response(raw)
+    except Exception as parse_err:
+        print(f"LLM batch parse failed: {parse_err}", file=sys.stderr)
+        return []
+    if not isinstance(data, list):
+        return []
+    out = []
+    for obj in data:
+        try:
+            if not isinstance(obj, dict):
+                continue
+            content = (obj.get("content") or "").strip()
+            entities = obj.get("entities") or []
+            if not isinstance(entities, list):
+                entities = []
+            item = _item_from_content_entities(content, entities)
+            if item:
+                out.append(item)
+        except Exception as item_err:
+            print(f"LLM batch item skipped: {item_err}", file=sys.stderr)
+    return out
+
+
 def generate_batch(client, n: int, model: str = "gpt-4o-mini", timeout: int = 120, entity_rich: bool = False, sri_lanka_tech: bool = False, strict_completeness: bool = True, fix_missing: bool = False) -> list[dict]:
     """Call LLM once asking for n resumes; return list of valid items (may be fewer than n)."""
     if n <= 0:
         return []
-    if sri_lanka_tech:
-        user_prompt = BATCH_USER_PROMPT_SRI_LANKA_TECH_TEMPLATE.format(n=n)
-    else:
-        user_prompt = BATCH_USER_PROMPT_TEMPLATE.format(n=n)
-        if entity_rich:
-            user_prompt += "\n\n" + ENTITY_RICH_APPEND
+    user_prompt = _batch_user_prompt(n, entity_rich, sri_lanka_tech)
     try:
         response = client.chat.completions.create(
             model=model,
@@ -466,68 +528,65 @@ def generate_batch(client, n: int, model: str = "gpt-4o-mini", timeout: int = 12
             timeout=max(timeout, 60 + n * 15),
         )
         raw = (response.choices[0].message.content or "").strip()
-        if not raw:
-            return []
-        try:
-            data = _extract_json_from_response(raw)
-        except Exception as parse_err:
-            print(f"LLM batch parse failed: {parse_err}", file=sys.stderr)
-            return []
-        if not isinstance(data, list):
-            return []
         out = []
-        for obj in data:
+        for item in _items_from_batch_response(raw):
             try:
-                if not isinstance(obj, dict):
-                    continue
-                content = (obj.get("content") or "").strip()
-                entities = obj.get("entities") or []
-                if not isinstance(entities, list):
-                    entities = []
-                item = _item_from_content_entities(content, entities)
-                if not item:
-                    continue
-                if strict_completeness and _item_needs_fix(item):
-                    if fix_missing:
-                        try:
-                            fixed = fix_item_entities(client, item, model=model, timeout=min(timeout, 45))
-                            if fixed is not None:
-                                item = fixed
-                        except Exception as fix_err:
-                            print(f"Fix call failed (keeping original): {fix_err}", file=sys.stderr)
-                    if _item_fails_completeness(item):
-                        continue
-                    if _item_education_spans_incomplete(item):
-                        continue
-                    if _item_fails_occupation(item):
-                        continue
-                elif strict_completeness and _item_fails_completeness(item):
-                    continue
-                out.append(item)
+                if strict_completeness and fix_missing and _item_needs_fix(item):
+                    try:
+                        fixed = fix_item_entities(client, item, model=model, timeout=min(timeout, 45))
+                        if fixed is not None:
+                            item = fixed
+                    except Exception as fix_err:
+                        print(f"Fix call failed (keeping original): {fix_err}", file=sys.stderr)
+                if _keep_item(item, strict_completeness):
+                    out.append(item)
             except Exception as item_err:
                 print(f"LLM batch item skipped: {item_err}", file=sys.stderr)
-                continue
         return out
     except Exception as e:
         print(f"LLM batch call failed: {e}", file=sys.stderr)
         return []
 
 
-def generate_one(client, model: str = "gpt-4o-mini", timeout: int = 60, career_hint: str | None = None, region_hint: str | None = None, entity_rich: bool = False, sri_lanka_tech: bool = False, strict_completeness: bool = True, fix_missing: bool = False) -> dict | None:
-    """Call LLM once and return one item in merged_resume_ner format or None on failure."""
+def _one_user_prompt(career_hint: str | None = None, region_hint: str | None = None, entity_rich: bool = False, sri_lanka_tech: bool = False) -> str:
     if sri_lanka_tech:
         career = career_hint or random.choice(SRI_LANKA_TECH_CAREER_HINTS)
-        region_hint = "Sri Lanka"
-        user_prompt = USER_PROMPT_SRI_LANKA_TECH_TEMPLATE.format(career=career)
+        return USER_PROMPT_SRI_LANKA_TECH_TEMPLATE.format(career=career)
+    if career_hint is None:
+        career = random.choice(CAREER_HINTS_IT) if random.random() < IT_WEIGHT else random.choice(CAREER_HINTS_OTHER)
     else:
-        if career_hint is None:
-            career = random.choice(CAREER_HINTS_IT) if random.random() < IT_WEIGHT else random.choice(CAREER_HINTS_OTHER)
-        else:
-            career = career_hint
-        region = region_hint or random.choice(REGION_HINTS)
-        user_prompt = USER_PROMPT_TEMPLATE.format(career=career, region=region)
-        if entity_rich:
-            user_prompt += "\n\n" + ENTITY_RICH_APPEND
+        career = career_hint
+    region = region_hint or random.choice(REGION_HINTS)
+    user_prompt = USER_PROMPT_TEMPLATE.format(career=career, region=region)
+    if entity_rich:
+        user_prompt += "\n\n" + ENTITY_RICH_APPEND
+    return user_prompt
+
+
+def _item_from_one_response(raw: str) -> dict | None:
+    """Parse a single-resume response into an item (before the completeness gate)."""
+    if not raw:
+        return None
+    try:
+        data = _extract_json_from_response(raw)
+    except Exception as parse_err:
+        print(f"LLM parse failed: {parse_err}", file=sys.stderr)
+        return None
+    # Accept single object or single-element array
+    if isinstance(data, list) and len(data) >= 1:
+        data = data[0]
+    if not isinstance(data, dict):
+        return None
+    content = (data.get("content") or "").strip()
+    entities = data.get("entities") or []
+    if not isinstance(entities, list):
+        entities = []
+    return _item_from_content_entities(content, entities)
+
+
+def generate_one(client, model: str = "gpt-4o-mini", timeout: int = 60, career_hint: str | None = None, region_hint: str | None = None, entity_rich: bool = False, sri_lanka_tech: bool = False, strict_completeness: bool = True, fix_missing: bool = False) -> dict | None:
+    """Call LLM once and return one item in merged_resume_ner format or None on failure."""
+    user_prompt = _one_user_prompt(career_hint, region_hint, entity_rich, sri_lanka_tech)
     try:
         response = client.chat.completions.create(
             model=model,
@@ -539,47 +598,281 @@ def generate_one(client, model: str = "gpt-4o-mini", timeout: int = 60, career_h
             timeout=timeout,
         )
         raw = (response.choices[0].message.content or "").strip()
-        if not raw:
-            return None
-        try:
-            data = _extract_json_from_response(raw)
-        except Exception as parse_err:
-            print(f"LLM parse failed: {parse_err}", file=sys.stderr)
-            return None
-        # Accept single object or single-element array
-        if isinstance(data, list) and len(data) >= 1:
-            data = data[0]
-        if not isinstance(data, dict):
-            return None
-        content = (data.get("content") or "").strip()
-        entities = data.get("entities") or []
-        if not isinstance(entities, list):
-            entities = []
-        item = _item_from_content_entities(content, entities)
+        item = _item_from_one_response(raw)
         if not item:
             return None
-        if strict_completeness and _item_needs_fix(item):
-            if fix_missing:
-                try:
-                    fixed = fix_item_entities(client, item, model=model, timeout=min(timeout, 45))
-                    if fixed is not None:
-                        item = fixed
-                except Exception as fix_err:
-                    print(f"Fix call failed (keeping original): {fix_err}", file=sys.stderr)
-            if _item_fails_completeness(item):
-                return None
-            if _item_education_spans_incomplete(item):
-                return None
-            if _item_fails_occupation(item):
-                return None
-        elif strict_completeness and _item_fails_completeness(item):
-            return None
-        return item
+        if strict_completeness and fix_missing and _item_needs_fix(item):
+            try:
+                fixed = fix_item_entities(client, item, model=model, timeout=min(timeout, 45))
+                if fixed is not None:
+                    item = fixed
+            except Exception as fix_err:
+                print(f"Fix call failed (keeping original): {fix_err}", file=sys.stderr)
+        return item if _keep_item(item, strict_completeness) else None
     except Exception as e:
         print(f"LLM call failed: {e}", file=sys.stderr)
         return None
 
 
+# --- Concurrent mode (--concurrency > 1): asyncio + token-bucket rate limiting ---
+
+# Output tokens reserved per requested resume before the real usage is known (corrected afterwards)
+EST_OUTPUT_TOKENS_PER_RESUME = 1200
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding at most `per_minute` units (requests or tokens)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now); amounts above capacity wait for a full bucket."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Return (or, if negative, charge) units, e.g. estimated minus actual tokens."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min limits shared by all in-flight calls, plus a global pause set from
+    Retry-After on 429 responses. acquire() is first come, first served.
+    """
+
+    def __init__(self, rpm: float | None = None, tpm: float | None = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, est_tokens: int) -> None:
+        async with self._lock:
+            while True:
+                wait = max(0.0, self.paused_until - time.monotonic())
+                if self.requests:
+                    wait = max(wait, self.requests.wait_time(1))
+                if self.tokens:
+                    wait = max(wait, self.tokens.wait_time(est_tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(est_tokens)
+
+    def settle(self, est_tokens: int, actual_tokens: int | None) -> None:
+        """Correct the token bucket once the response reports its real usage."""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.give_back(est_tokens - actual_tokens)
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def _retry_after_seconds(err) -> float | None:
+    """Retry-After of an API error response (retry-after-ms, or retry-after in seconds or as an HTTP date)."""
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+async def _chat_async(client, limiter: RateLimiter, stats: dict, messages: list[dict], model: str, temperature: float, timeout: float, est_output_tokens: int, max_retries: int = 5) -> str:
+    """
+    One chat completion through the rate limiter. 429s wait for Retry-After (all calls pause, since
+    the limit is shared); timeouts, connection errors and 5xx back off exponentially with jitter.
+    Returns the message content; raises after max_retries retries or on other errors.
+    """
+    import openai
+
+    est_tokens = sum(len(m["content"]) for m in messages) // 4 + est_output_tokens
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(est_tokens)
+        stats["calls"] += 1
+        try:
+            response = await client.chat.completions.create(model=model, messages=messages, temperature=temperature, timeout=timeout)
+        except openai.RateLimitError as e:
+            limiter.settle(est_tokens, 0)
+            if attempt == max_retries:
+                raise
+            stats["rate_limited"] += 1
+            wait_s = _retry_after_seconds(e)
+            wait_s = wait_s if wait_s is not None else min(60.0, 2 ** attempt + random.random())
+            print(f"429 rate limited; pausing {wait_s:.1f}s", file=sys.stderr)
+            limiter.pause(wait_s)
+            continue
+        except (openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+            limiter.settle(est_tokens, 0)
+            if attempt == max_retries:
+                raise
+            stats["retries"] += 1
+            wait_s = _retry_after_seconds(e) or min(60.0, 2 ** attempt + random.random())
+            print(f"{type(e).__name__}; retrying in {wait_s:.1f}s", file=sys.stderr)
+            await asyncio.sleep(wait_s)
+            continue
+        usage = getattr(response, "usage", None)
+        limiter.settle(est_tokens, getattr(usage, "total_tokens", None))
+        return (response.choices[0].message.content or "").strip()
+    raise RuntimeError("unreachable")
+
+
+async def _finish_item_async(client, limiter: RateLimiter, stats: dict, item: dict, model: str, timeout: int, strict_completeness: bool, fix_missing: bool, max_retries: int) -> dict | None:
+    """Optional fix call (as fix_item_entities) followed by the completeness gate."""
+    if strict_completeness and fix_missing and _item_needs_fix(item):
+        user_prompt = _fix_user_prompt(item)
+        if user_prompt is not None:
+            try:
+                raw = await _chat_async(
+                    client, limiter, stats,
+                    [{"role": "system", "content": FIX_ENTITIES_SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}],
+                    model, 0.2, min(timeout, 45), EST_OUTPUT_TOKENS_PER_RESUME // 2, max_retries,
+                )
+                fixed = _item_from_fix_response(item, raw)
+                if fixed is not None:
+                    item = fixed
+            except Exception as fix_err:
+                print(f"Fix call failed (keeping original): {fix_err}", file=sys.stderr)
+    return item if _keep_item(item, strict_completeness) else None
+
+
+async def generate_call_async(client, limiter: RateLimiter, stats: dict, n: int, model: str = "gpt-4o-mini", timeout: int = 60, entity_rich: bool = False, sri_lanka_tech: bool = False, strict_completeness: bool = True, fix_missing: bool = False, max_retries: int = 5) -> list[dict]:
+    """Async generate_one (n == 1) / generate_batch (n > 1): same prompts, parsing and completeness gate."""
+    if n == 1:
+        user_prompt = _one_user_prompt(None, None, entity_rich, sri_lanka_tech)
+        call_timeout = timeout
+    else:
+        user_prompt = _batch_user_prompt(n, entity_rich, sri_lanka_tech)
+        call_timeout = max(timeout, 60 + n * 15)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}]
+    try:
+        raw = await _chat_async(client, limiter, stats, messages, model, 0.8, call_timeout, n * EST_OUTPUT_TOKENS_PER_RESUME, max_retries)
+    except Exception as e:
+        print(f"LLM call failed: {e}", file=sys.stderr)
+        return []
+    if n == 1:
+        item = _item_from_one_response(raw)
+        items = [item] if item else []
+    else:
+        items = _items_from_batch_response(raw)
+    finished = await asyncio.gather(*(
+        _finish_item_async(client, limiter, stats, item, model, timeout, strict_completeness, fix_missing, max_retries)
+        for item in items
+    ), return_exceptions=True)
+    for err in finished:
+        if isinstance(err, Exception):
+            print(f"LLM batch item skipped: {err}", file=sys.stderr)
+    return [item for item in finished if isinstance(item, dict)]
+
+
+async def generate_concurrent(f, to_generate: int, existing: int, args, strict_completeness: bool, per_call: int, batch_size: int, api_key: str) -> int:
+    """
+    Keep up to --concurrency API calls in flight (each asking for up to per_call resumes) until
+    to_generate items are written. Items are written and flushed in completion order. Returns the
+    number written.
+    """
+    import openai
+
+    # Retries are handled here (shared Retry-After pause), not by the SDK
+    client = openai.AsyncOpenAI(api_key=api_key, base_url=args.base_url, max_retries=0)
+    limiter = RateLimiter(args.rpm, args.tpm)
+    stats = {"calls": 0, "rate_limited": 0, "retries": 0}
+    written = 0
+    claimed = 0  # resumes requested by calls in flight
+    consecutive_empty = 0
+    max_consecutive_empty = 80
+    in_flight: dict[asyncio.Task, int] = {}
+    start = time.monotonic()
+
+    def launch() -> None:
+        nonlocal claimed
+        while len(in_flight) < args.concurrency and written + claimed < to_generate:
+            n = min(per_call, to_generate - written - claimed)
+            task = asyncio.create_task(generate_call_async(
+                client, limiter, stats, n, model=args.model, timeout=args.timeout, entity_rich=args.entity_rich,
+                sri_lanka_tech=args.sri_lanka_tech, strict_completeness=strict_completeness,
+                fix_missing=args.fix_missing, max_retries=args.max_retries,
+            ))
+            in_flight[task] = n
+            claimed += n
+
+    try:
+        launch()
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                claimed -= in_flight.pop(task)
+                items = task.result()[: to_generate - written]
+                if not items:
+                    consecutive_empty += 1
+                    if consecutive_empty >= max_consecutive_empty:
+                        print(
+                            f"Stopping: {max_consecutive_empty} consecutive failed calls (network/parse). "
+                            f"Resume later with the same --target and --output to continue.",
+                            file=sys.stderr,
+                        )
+                        for pending in in_flight:
+                            pending.cancel()
+                        return written
+                    continue
+                consecutive_empty = 0
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+                    written += 1
+                    if (existing + written) % batch_size == 0:
+                        print(f"Progress saved. Total in file: {existing + written}.", file=sys.stderr)
+                f.flush()
+                elapsed = time.monotonic() - start
+                print(
+                    f"  Generated {written}/{to_generate} ({written / elapsed * 60:.1f}/min, "
+                    f"{len(in_flight)} calls in flight)",
+                    file=sys.stderr,
+                )
+            launch()
+    finally:
+        await client.close()
+        elapsed = time.monotonic() - start
+        print(
+            f"{stats['calls']} API calls in {elapsed:.1f}s, {stats['rate_limited']} retried after 429, "
+            f"{stats['retries']} retried after timeouts / connection / server errors",
+            file=sys.stderr,
+        )
+    return written
+
+
 def main():
     parser = argparse.ArgumentParser(description="Generate resume JSONL via LLM (same format as merged_resume_ner.json)")
     parser.add_argument("--count", type=int, default=5, help="Number of resumes to generate this run")
@@ -600,6 +893,11 @@ def main():
         help="Second LLM pass when tags are missing OR when EDUCATION has institution+degree on one line but only one EDUCATION span (adds API cost; recommended for clean data)",
     )
     parser.add_argument("--sri-lanka-tech", action="store_true", help="Generate structured Sri Lankan tech resumes: SUMMARY, EDUCATION, EXPERIENCE, PROJECTS (with Tech Stack), CERTIFICATIONS, SKILLS subsections, REFERENCES")
+    parser.add_argument("--concurrency", type=int, default=1, help="API calls in flight at once (asyncio; 1 = sequential). Items are written in completion order")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests per minute limit for --concurrency > 1 (token bucket; default: no limit)")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens per minute limit for --concurrency > 1 (estimated before each call, corrected from the reported usage)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries per call after 429 (waits for Retry-After), timeouts and 5xx, for --concurrency > 1")
+    parser.add_argument("--base-url", type=str, default=None, help="OpenAI-compatible API base URL (e.g. a local server; default: OpenAI)")
     args = parser.parse_args()
     strict_completeness = not args.no_strict_completeness
 
@@ -646,7 +944,16 @@ def main():
         target_total = args.target
     print(f"Batches of {batch_size} (progress saved after each batch). Target total: {target_total}. Resumes per API call: {per_call}", file=sys.stderr)
 
-    client = openai.OpenAI(api_key=api_key)
+    if args.concurrency > 1:
+        print(f"Concurrency: {args.concurrency} calls in flight, rpm {args.rpm or 'unlimited'}, tpm {args.tpm or 'unlimited'}", file=sys.stderr)
+        with open(args.output, mode, encoding="utf-8") as f:
+            written = asyncio.run(generate_concurrent(f, to_generate, existing, args, strict_completeness, per_call, batch_size, api_key))
+        print(f"Done. Wrote {written} resumes to {args.output} (total in file: {existing + written})", file=sys.stderr)
+        if written < to_generate:
+            sys.exit(1)
+        return
+
+    client = openai.OpenAI(api_key=api_key, base_url=args.base_url)
     written = 0
     remaining = to_generate
     consecutive_empty = 0
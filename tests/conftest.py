@@ -0,0 +1,67 @@
+import os
+import random
+import string
+import sys
+
+import pytest
+import torch
+
+# The pipeline modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bert_bilstm_crf_pipeline import BertBiLSTMCRF  # noqa: E402
+
+WORDS = [
+    "john", "smith", "software", "engineer", "python", "java", "sql", "developer", "data", "scientist",
+    "university", "colombo", "bsc", "computer", "science", "acme", "corp", "experience", "skills",
+    "education", "work", "senior", "team", "lead", "project", "cloud", "aws", "docker", "kubernetes",
+]
+PIECES = ["##ing", "##ed", "##s", "##er"] + [f"##{c}" for c in string.ascii_lowercase + string.digits]
+
+
+@pytest.fixture(scope="session")
+def vocab_file(tmp_path_factory):
+    """Small WordPiece vocabulary: whole words plus single characters, so any ASCII text tokenizes."""
+    tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS + list(string.ascii_lowercase + string.digits)
+    tokens += list(".,@-:()/") + PIECES
+    path = tmp_path_factory.mktemp("vocab") / "vocab.txt"
+    path.write_text("\n".join(tokens) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def fast_tokenizer(vocab_file):
+    from transformers import BertTokenizerFast
+
+    return BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True)
+
+
+@pytest.fixture(scope="session")
+def slow_tokenizer(vocab_file):
+    from transformers import BertTokenizer
+
+    return BertTokenizer(vocab_file=vocab_file, do_lower_case=True)
+
+
+@pytest.fixture(scope="session")
+def tiny_model(fast_tokenizer):
+    """Randomly initialised two-layer BertBiLSTMCRF (no pretrained weights needed)."""
+    torch.manual_seed(0)
+    bert_config = dict(
+        vocab_size=len(fast_tokenizer), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=512,
+    )
+    model = BertBiLSTMCRF(hidden_dim=16, bert_config=bert_config)
+    return model.eval()
+
+
+@pytest.fixture(scope="session")
+def sample_texts():
+    """Resume-like documents from a few words up to several hundred (mixed case, punctuation)."""
+    rng = random.Random(0)
+    vocab = WORDS + ["Engineering", "Developers", "2019-2021", "john.smith@example.com", "C++", "Node.js", "xyzzy"]
+    texts = []
+    for n in [3, 12, 40, 90, 200, 350]:
+        lines = [" ".join(rng.choice(vocab) for _ in range(rng.randint(1, 9))) for _ in range(max(1, n // 5))]
+        texts.append("\n".join(lines))
+    return texts
@@ -0,0 +1,156 @@
+"""
+Minimal OpenAI-compatible chat completions server for exercising generate_resumes_llm without an
+API key: POST /v1/chat/completions answers with valid resume JSON (one object, or an array of
+"exactly N" for batch prompts) and a usage block; GET /stats returns what it has seen.
+
+Responses can be scripted: `script` is a list of (status, headers) for the first requests (e.g.
+(429, {"retry-after": "1"}) or (500, {"retry-after-ms": "10"})); after it, requests get `default`,
+except that a 200 becomes a 429 with probability rate_429. Latency is drawn from `latency` (s).
+
+Usage:
+  python tests/mock_openai_server.py --port 8765 --rate-429 0.1 --latency 0.2 0.6
+  python resume_ner_pipeline/generate_resumes_llm.py --base-url http://127.0.0.1:8765/v1 --api-key x \\
+      --target 100 --concurrency 8 --per-call 2
+
+  with MockOpenAIServer(script=[(429, {"retry-after": "1"})]) as server:
+      ...  # server.base_url, server.requests, server.max_in_flight
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def fake_resume(i):
+    """Resume content plus entities that pass generate_resumes_llm's completeness checks."""
+    name, email = f"Person {i}", f"person{i}@example.com"
+    content = (
+        f"{name}\n{email}\nEXPERIENCE\nSoftware Engineer – Acme Corp\nSKILLS\nPython, SQL\n"
+        "EDUCATION\nBSc Computer Science, University of Colombo"
+    )
+    entities = [
+        {"type": "NAME", "text": name}, {"type": "EMAIL", "text": email},
+        {"type": "OCCUPATION", "text": "Software Engineer"}, {"type": "EXPERIENCE", "text": "Acme Corp"},
+        {"type": "SKILL", "text": "Python"}, {"type": "SKILL", "text": "SQL"},
+        {"type": "EDUCATION", "text": "BSc Computer Science"}, {"type": "EDUCATION", "text": "University of Colombo"},
+    ]
+    return {"content": content, "entities": entities}
+
+
+class MockOpenAIServer:
+    """Threaded mock server; start() / stop() or use as a context manager. Records every request."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=(0.0, 0.0), rate_429=0.0, script=(), default=(200, {}), seed=0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.script = list(script)
+        self.default = default
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = []  # (arrival time.monotonic(), status)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.served = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}/v1"
+        self._thread = None
+
+    def _next_response(self):
+        with self.lock:
+            status, headers = self.script.pop(0) if self.script else self.default
+            if status == 200 and self.rng.random() < self.rate_429:
+                status, headers = 429, {"retry-after": "1"}
+            self.requests.append((time.monotonic(), status))
+            delay = self.rng.uniform(*self.latency)
+            if status == 200:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return status, headers, delay
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with server.lock:
+                    stats = {"requests": len(server.requests), "served": server.served,
+                             "max_in_flight": server.max_in_flight,
+                             "statuses": [status for _, status in server.requests]}
+                self._send(200, stats)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                status, headers, delay = server._next_response()
+                if status != 200:
+                    self._send(status, {"error": {"message": f"mock {status}", "type": "mock_error"}}, headers)
+                    return
+                time.sleep(delay)
+                match = re.search(r"Generate exactly (\d+)", request["messages"][-1]["content"])
+                n = int(match.group(1)) if match else 1
+                with server.lock:
+                    first = server.served
+                    server.served += 1
+                items = [fake_resume(first * 100 + k) for k in range(n)]
+                content = json.dumps(items if match else items[0])
+                self._send(200, {
+                    "id": f"mock-{first}", "object": "chat.completion", "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 400, "completion_tokens": 300 * n, "total_tokens": 400 + 300 * n},
+                })
+                with server.lock:
+                    server.in_flight -= 1
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, nargs=2, default=[0.2, 0.6], help="Min / max seconds per completion")
+    p.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered 429 (retry-after: 1)")
+    args = p.parse_args()
+    server = MockOpenAIServer(args.host, args.port, tuple(args.latency), args.rate_429)
+    print(f"Mock OpenAI API on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
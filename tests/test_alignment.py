@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from bert_bilstm_crf_pipeline import TAGS, align_labels_batch, align_labels_to_bert_tokenizer
+
+SENTENCES = [
+    ["John", "Smith", "Software", "Engineer"],
+    ["john.smith@example.com", "|", "+94-77-123-4567"],
+    ["Skills:", "Python,", "SQL,", "Node.js,", "C++", "(Docker/Kubernetes)"],
+    ["Café", "Résumé", "naïve", "Zürich", "北京"],
+    ["Working", "engineers", "developed", "xyzzyplugh", "2019-2021"],
+    ["ctrl", "​", "\x00", "word"],  # words with no pieces fall back to [UNK]
+    [],
+]
+
+
+def labelled(sentences, seed=0):
+    rng = random.Random(seed)
+    return [[rng.choice(TAGS) for _ in words] for words in sentences]
+
+
+@pytest.mark.parametrize("max_length", [512, 8])
+def test_fast_alignment_matches_slow(slow_tokenizer, fast_tokenizer, sample_texts, max_length):
+    sentences = SENTENCES + [text.split() for text in sample_texts]
+    labels = labelled(sentences)
+    fast = align_labels_batch(sentences, labels, fast_tokenizer, max_length, batch_size=3)
+    assert len(fast) == len(sentences)
+    for words, labs, triple in zip(sentences, labels, fast):
+        assert triple == align_labels_to_bert_tokenizer(words, labs, slow_tokenizer, max_length)
+
+
+def test_slow_tokenizer_takes_the_per_word_path(slow_tokenizer):
+    labels = labelled(SENTENCES)
+    assert align_labels_batch(SENTENCES, labels, slow_tokenizer) == [
+        align_labels_to_bert_tokenizer(words, labs, slow_tokenizer) for words, labs in zip(SENTENCES, labels)
+    ]
+
+
+def test_custom_label_map(slow_tokenizer, fast_tokenizer):
+    tags = ["O", "B-JOB_TITLE", "I-JOB_TITLE", "B-SALARY", "I-SALARY"]
+    label2id = {t: i for i, t in enumerate(tags)}
+    words = ["Senior", "Data", "Scientist", "$120k-150k", "Remote"]
+    labs = ["B-JOB_TITLE", "I-JOB_TITLE", "I-JOB_TITLE", "B-SALARY", "B-SKILL"]  # unknown tag -> "O"
+    fast = align_labels_batch([words], [labs], fast_tokenizer, label2id=label2id)[0]
+    assert fast == align_labels_to_bert_tokenizer(words, labs, slow_tokenizer, label2id=label2id)
+    assert [t for t in fast[2] if t != -100] == [1, 2, 2, 3, 0]
@@ -0,0 +1,70 @@
+import random
+
+from bert_bilstm_crf_pipeline import create_bio_tags_fixed, tokenize_with_positions
+
+LABELS = ["Name", "Skills", "Companies worked at", "O"]
+
+
+def linear_scan_bio_tags(tokens, annotations):
+    """create_bio_tags_fixed before the bisect rewrite (one token scan per span)."""
+    bio_labels = ["O"] * len(tokens)
+    for ann in annotations:
+        if not ann.get("label"):
+            continue
+        entity_label = ann["label"][0]
+        if entity_label == "O":
+            continue
+        for point in ann.get("points", []):
+            s, e = point["start"], point["end"]
+            first = True
+            for i, (_, ts, te) in enumerate(tokens):
+                if te <= s:
+                    continue
+                if ts >= e:
+                    break
+                bio_labels[i] = f"B-{entity_label}" if first else f"I-{entity_label}"
+                first = False
+    return bio_labels
+
+
+def random_document(rng):
+    words = ["john", "smith", "python", "sql", "acme", "corp", "senior", "engineer", "e-mail:", "x"]
+    seps = [" ", "  ", "\n", " \n\n ", "\t"]
+    parts = []
+    for _ in range(rng.randint(0, 60)):
+        parts.append(rng.choice(words))
+        parts.append(rng.choice(seps))
+    text = rng.choice(["", " ", "\n"]) + "".join(parts)
+    annotations = []
+    for _ in range(rng.randint(0, 8)):
+        points = []
+        for _ in range(rng.randint(0, 3)):
+            s = rng.randint(0, len(text) + 3)
+            points.append({"start": s, "end": s + rng.randint(0, 40)})  # mid-token, whitespace, past the end
+        label = rng.choice([[], [rng.choice(LABELS)], [rng.choice(LABELS), rng.choice(LABELS)]])
+        annotations.append({"label": label, "points": points})
+    return text, annotations
+
+
+def test_matches_linear_scan_on_random_overlapping_spans():
+    rng = random.Random(0)
+    for _ in range(3000):
+        text, annotations = random_document(rng)
+        tokens = tokenize_with_positions(text)
+        assert create_bio_tags_fixed(tokens, annotations) == linear_scan_bio_tags(tokens, annotations)
+
+
+def test_spans_inside_tokens_and_overlaps():
+    text = "John Smith  Senior Python Engineer"
+    tokens = tokenize_with_positions(text)
+    annotations = [
+        {"label": ["Name"], "points": [{"start": 2, "end": 7}]},  # starts inside "John", ends inside "Smith"
+        {"label": ["Skills"], "points": [{"start": 19, "end": 21}]},  # strictly inside "Python"
+        {"label": ["Designation"], "points": [{"start": 12, "end": 34}]},  # overlaps the skill; later wins
+        {"label": ["O"], "points": [{"start": 0, "end": 34}]},  # O spans are skipped
+        {"label": ["Name"], "points": [{"start": 10, "end": 12}]},  # whitespace only: no token
+        {"label": ["Name"], "points": [{"start": 4, "end": 4}]},  # empty span
+    ]
+    expected = ["B-Name", "I-Name", "B-Designation", "I-Designation", "I-Designation"]
+    assert create_bio_tags_fixed(tokens, annotations) == expected
+    assert linear_scan_bio_tags(tokens, annotations) == expected
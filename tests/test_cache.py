@@ -0,0 +1,60 @@
+import pytest
+
+from bert_bilstm_crf_cache import CachedParser, ResultCache
+from bert_bilstm_crf_pipeline import NUM_LABELS, TAGS, save_model_bundle
+from bert_bilstm_crf_registry import ModelRegistry, ModelVersion
+
+
+@pytest.fixture
+def bundle_path(tmp_path, tiny_model, fast_tokenizer):
+    path = str(tmp_path / "tiny.bundle")
+    save_model_bundle(tiny_model, fast_tokenizer, {"bert_name": "tiny", "num_labels": NUM_LABELS, "tags": TAGS}, path)
+    return path
+
+
+def test_namespace_separates_results_for_the_same_model(tmp_path):
+    cache = ResultCache(sqlite_path=str(tmp_path / "cache.sqlite"))
+    long_parse = CachedParser(lambda texts: [(["long"], ["O"], {})] * len(texts), "fp", cache, namespace="a:max_len=512")
+    short_parse = CachedParser(lambda texts: [(["short"], ["O"], {})] * len(texts), "fp", cache, namespace="a:max_len=16")
+    assert long_parse(["same text"])[0][0] == ["long"]
+    assert short_parse(["same text"])[0][0] == ["short"]
+    assert long_parse(["same text"])[0][0] == ["long"]
+    cache.close()
+
+
+def test_model_version_namespace_names_the_parse_options(bundle_path):
+    base = ModelVersion("resume", bundle_path, "v1", "cpu")
+    assert base.cache_namespace == "resume:max_len=512:hybrid=True:window_stride=128"
+    others = [
+        ModelVersion("resume", bundle_path, "v2", "cpu", max_len=64),
+        ModelVersion("resume", bundle_path, "v3", "cpu", hybrid=False),
+        ModelVersion("resume", bundle_path, "v4", "cpu", window_stride=32),
+        ModelVersion("job_poster", bundle_path, "v5", "cpu"),
+    ]
+    assert len({base.cache_namespace} | {v.cache_namespace for v in others}) == 5
+    # Options that only change batching do not split the cache
+    assert ModelVersion("resume", bundle_path, "v6", "cpu", max_batch_size=4).cache_namespace == base.cache_namespace
+
+
+def test_persistent_cache_is_not_reused_across_max_len(tmp_path, bundle_path, sample_texts):
+    sqlite_path = str(tmp_path / "cache.sqlite")
+    texts = sample_texts[-2:]
+
+    cache = ResultCache(sqlite_path=sqlite_path)
+    registry = ModelRegistry("resume", cache=cache, device="cpu", max_len=512)
+    registry.activate(registry.load(bundle_path, warm=False))
+    registry.predict(texts)
+    registry.close()
+    cache.close()
+
+    # Restart with the same checkpoint and store but a shorter max_len
+    cache = ResultCache(sqlite_path=sqlite_path)
+    registry = ModelRegistry("resume", cache=cache, device="cpu", max_len=32)
+    registry.activate(registry.load(bundle_path, warm=False))
+    results = registry.predict(texts)
+    assert cache.stats()["disk_hits"] == 0
+    assert results == [tuple(r) for r in registry.active.parse_batch(texts)]
+    assert registry.predict(texts) == results
+    assert cache.stats()["memory_hits"] == len(texts)
+    registry.close()
+    cache.close()
@@ -0,0 +1,81 @@
+import pytest
+import torch
+
+from bert_bilstm_crf_pipeline import TAGS, LinearChainCRF, bio_transition_constraints
+
+NUM_TAGS = len(TAGS)
+
+
+def random_batch(seed, batch=5, seq_len=9):
+    """Emissions, tags and a prefix mask with mixed lengths (first position always on, as torchcrf requires)."""
+    g = torch.Generator().manual_seed(seed)
+    emissions = torch.randn(batch, seq_len, NUM_TAGS, generator=g)
+    tags = torch.randint(NUM_TAGS, (batch, seq_len), generator=g)
+    lengths = torch.tensor([seq_len, 1, 4, seq_len - 1, 6][:batch])
+    mask = torch.arange(seq_len).unsqueeze(0) < lengths.unsqueeze(1)
+    return emissions, tags, mask
+
+
+@pytest.fixture
+def crf_pair():
+    torchcrf = pytest.importorskip("torchcrf")
+    torch.manual_seed(0)
+    reference = torchcrf.CRF(NUM_TAGS, batch_first=True)
+    crf = LinearChainCRF(NUM_TAGS)
+    crf.load_state_dict(reference.state_dict())
+    return crf, reference
+
+
+@pytest.mark.parametrize("reduction", ["none", "sum", "mean", "token_mean"])
+def test_loss_matches_torchcrf(crf_pair, reduction):
+    crf, reference = crf_pair
+    for seed in range(3):
+        emissions, tags, mask = random_batch(seed)
+        expected = reference(emissions, tags, mask=mask.to(torch.uint8), reduction=reduction)
+        assert torch.allclose(crf(emissions, tags, mask=mask, reduction=reduction), expected, atol=1e-5)
+
+
+def test_decode_matches_torchcrf(crf_pair):
+    crf, reference = crf_pair
+    for seed in range(3):
+        emissions, _, mask = random_batch(seed)
+        paths = crf.decode(emissions, mask=mask)
+        assert paths.shape == mask.shape
+        assert [p[p != -1].tolist() for p in paths] == reference.decode(emissions, mask=mask.to(torch.uint8))
+        assert (paths[~mask] == -1).all()
+
+
+@pytest.mark.parametrize("constrained", [False, True])
+def test_marginals_are_the_gradient_of_log_partition(constrained):
+    torch.manual_seed(0)
+    crf = LinearChainCRF(NUM_TAGS, constraints=bio_transition_constraints(TAGS) if constrained else None)
+    emissions, _, mask = random_batch(1)
+    emissions.requires_grad_(True)
+    start, transitions = crf._constrained()
+    em, m, _ = crf._time_major(emissions, mask)
+    log_z = crf._log_partition(em, m, start, transitions)
+    (grad,) = torch.autograd.grad(log_z.sum(), emissions)
+    marginals = crf.marginals(emissions.detach(), mask)
+    assert torch.allclose(marginals, grad, atol=1e-5)
+    assert torch.allclose(marginals.sum(2)[mask], torch.ones(int(mask.sum())), atol=1e-5)
+    assert (marginals[~mask] == 0).all()
+
+
+def test_constraints_stay_out_of_the_state_dict():
+    constrained = LinearChainCRF(NUM_TAGS, constraints=bio_transition_constraints(TAGS))
+    assert set(constrained.state_dict()) == {"start_transitions", "end_transitions", "transitions"}
+    plain = LinearChainCRF(NUM_TAGS)
+    plain.load_state_dict(constrained.state_dict())
+    constrained.load_state_dict(plain.state_dict())
+    assert (constrained.transition_penalty != 0).any()
+
+
+def test_constrained_decode_never_starts_or_continues_an_unopened_entity():
+    crf = LinearChainCRF(NUM_TAGS, constraints=bio_transition_constraints(TAGS))
+    allowed, allowed_start = bio_transition_constraints(TAGS)
+    emissions, _, mask = random_batch(2, batch=5, seq_len=30)
+    emissions[..., [i for i, t in enumerate(TAGS) if t.startswith("I-")]] += 3.0  # push towards I- tags
+    for path in crf.decode(emissions, mask=mask):
+        path = path[path != -1].tolist()
+        assert allowed_start[path[0]]
+        assert all(allowed[a, b] for a, b in zip(path, path[1:]))
@@ -0,0 +1,67 @@
+import random
+
+import torch
+
+from bert_bilstm_crf_pipeline import ID2LABEL, NUM_LABELS, align_eval_predictions
+
+
+def per_position_loop(preds, attention_mask, labels):
+    """The evaluation loop align_eval_predictions replaced (one .item() per position)."""
+    true_all, pred_all = [], []
+    for b in range(attention_mask.size(0)):
+        mask_b, labs_b, pred_b = attention_mask[b], labels[b], preds[b]
+        true_tok, pred_tok = [], []
+        pos_in_pred = 0
+        for i in range(mask_b.size(0)):
+            if mask_b[i].item() == 0:
+                break
+            if pos_in_pred < len(pred_b):
+                pred_label = ID2LABEL[pred_b[pos_in_pred]] if pred_b[pos_in_pred] < NUM_LABELS else "O"
+            else:
+                pred_label = "O"
+            pos_in_pred += 1
+            if labs_b[i].item() == -100:
+                continue
+            true_tok.append(ID2LABEL[labs_b[i].item()])
+            pred_tok.append(pred_label)
+        if true_tok and pred_tok:
+            true_all.append(true_tok)
+            pred_all.append(pred_tok)
+    return true_all, pred_all
+
+
+def random_batch(rng):
+    """Prefix masks with padding, -100 on special / continuation subwords, ragged (sometimes truncated) predictions."""
+    batch, seq_len = rng.randint(1, 6), rng.randint(1, 40)
+    lengths = [rng.choice([0, 1, rng.randint(1, seq_len), seq_len]) for _ in range(batch)]
+    attention_mask = torch.zeros(batch, seq_len, dtype=torch.long)
+    labels = torch.full((batch, seq_len), -100, dtype=torch.long)
+    preds = []
+    for b, n in enumerate(lengths):
+        attention_mask[b, :n] = 1
+        for i in range(1, n - 1):  # [CLS] and [SEP] stay -100
+            if rng.random() < 0.7:
+                labels[b, i] = rng.randrange(NUM_LABELS)
+        if rng.random() < 0.1:
+            labels[b, n:] = rng.randrange(NUM_LABELS)  # labels under padding must be ignored
+        n_pred = rng.choice([n, n, max(0, n - rng.randint(1, 5)), n + 2])  # exact, truncated, too long
+        preds.append([rng.randrange(NUM_LABELS + 2) for _ in range(n_pred)])  # some ids out of range
+    return preds, attention_mask, labels
+
+
+def test_matches_per_position_loop():
+    rng = random.Random(0)
+    for _ in range(500):
+        preds, attention_mask, labels = random_batch(rng)
+        assert align_eval_predictions(preds, attention_mask, labels) == per_position_loop(preds, attention_mask, labels)
+
+
+def test_padded_tensor_predictions_match_ragged_lists():
+    rng = random.Random(1)
+    for _ in range(200):
+        preds, attention_mask, labels = random_batch(rng)
+        width = max([len(p) for p in preds] + [1])
+        padded = torch.full((len(preds), width), -1, dtype=torch.long)  # LinearChainCRF.decode layout
+        for b, p in enumerate(preds):
+            padded[b, : len(p)] = torch.tensor(p, dtype=torch.long)
+        assert align_eval_predictions(padded, attention_mask, labels) == per_position_loop(preds, attention_mask, labels)
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from bert_bilstm_crf_extract import completed_files, extract_directory
+from bert_bilstm_crf_pipeline import NUM_LABELS, TAGS, save_model_bundle
+
+
+@pytest.fixture
+def bundle_path(tmp_path, tiny_model, fast_tokenizer):
+    path = str(tmp_path / "tiny.bundle")
+    save_model_bundle(tiny_model, fast_tokenizer, {"bert_name": "tiny", "num_labels": NUM_LABELS, "tags": TAGS}, path)
+    return path
+
+
+@pytest.fixture
+def docs(tmp_path, sample_texts):
+    folder = tmp_path / "docs"
+    folder.mkdir()
+    for i, text in enumerate(sample_texts[:3]):
+        (folder / f"doc{i}.txt").write_text(text, encoding="utf-8")
+    return folder
+
+
+def read_files(out_path):
+    with open(out_path, encoding="utf-8") as f:
+        return [json.loads(line)["file"] for line in f]
+
+
+def test_restart_matches_files_however_the_input_is_spelled(tmp_path, monkeypatch, bundle_path, docs):
+    monkeypatch.chdir(tmp_path)
+    out = str(tmp_path / "out.jsonl")
+    first = extract_directory(bundle_path, ["docs"], out, device="cpu")
+    assert first["documents"] == 3 and first["skipped"] == 0
+    assert read_files(out) == [str(docs.resolve() / f"doc{i}.txt") for i in range(3)]
+
+    os.symlink(docs, tmp_path / "linked")
+    monkeypatch.chdir(docs)
+    for spelling in [[str(docs)], ["."], [str(tmp_path / "linked")], ["./doc0.txt", "../docs/doc1.txt"]]:
+        again = extract_directory(bundle_path, spelling, out, device="cpu")
+        assert again["documents"] == 0, spelling
+    assert len(read_files(out)) == 3
+
+
+def test_completed_files_normalises_old_relative_paths_and_drops_a_partial_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    out = tmp_path / "out.jsonl"
+    out.write_text(
+        json.dumps({"file": "docs/a.txt", "entities": {}}) + "\n"
+        + json.dumps({"file": str(tmp_path / "docs" / ".." / "docs" / "b.txt"), "error": "unreadable"}) + "\n"
+        + '{"file": "docs/c.t',
+        encoding="utf-8",
+    )
+    assert completed_files(str(out)) == {os.path.realpath("docs/a.txt"), os.path.realpath("docs/b.txt")}
+    assert out.read_text(encoding="utf-8").endswith("}\n")
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import sys
+import time
+
+import pytest
+
+from mock_openai_server import MockOpenAIServer
+from resume_ner_pipeline import generate_resumes_llm as gen
+
+openai = pytest.importorskip("openai")
+
+
+def run_cli(monkeypatch, server, out_path, *args):
+    """generate_resumes_llm.main() against the mock server; returns the exit code."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(sys, "argv", ["generate_resumes_llm.py", "--base-url", server.base_url, "--output", str(out_path), *args])
+    try:
+        gen.main()
+    except SystemExit as exc:
+        return exc.code
+    return 0
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_concurrent_run_reaches_target_through_429_and_5xx(monkeypatch, tmp_path):
+    script = [(429, {"retry-after": "1"}), (500, {"retry-after-ms": "50"}), (503, {})]
+    out = tmp_path / "out.jsonl"
+    with MockOpenAIServer(latency=(0.05, 0.15), script=script) as server:
+        code = run_cli(monkeypatch, server, out, "--target", "15", "--concurrency", "4", "--per-call", "2")
+    assert code == 0
+    items = read_lines(out)
+    assert len(items) == 15
+    assert all(item["annotation"] for item in items)
+    assert 1 < server.max_in_flight <= 4
+    statuses = [status for _, status in server.requests]
+    assert statuses[:3] == [429, 500, 503]
+    assert statuses.count(200) == 8  # 15 resumes at 2 per call, none lost to the errors
+
+
+def test_retry_after_pauses_every_call(monkeypatch, tmp_path):
+    out = tmp_path / "out.jsonl"
+    with MockOpenAIServer(latency=(0.05, 0.05), script=[(429, {"retry-after": "1"})]) as server:
+        code = run_cli(monkeypatch, server, out, "--count", "6", "--concurrency", "3")
+    assert code == 0 and len(read_lines(out)) == 6
+    limited_at = next(t for t, status in server.requests if status == 429)
+    # Requests already sent when the 429 arrived may land just after it; nothing else until Retry-After
+    during_pause = [t for t, _ in server.requests if limited_at + 0.2 < t < limited_at + 0.9]
+    assert during_pause == []
+
+
+def test_cli_stops_after_consecutive_failures(monkeypatch, tmp_path):
+    out = tmp_path / "out.jsonl"
+    with MockOpenAIServer(default=(500, {"retry-after-ms": "1"})) as server:
+        code = run_cli(monkeypatch, server, out, "--count", "5", "--concurrency", "4", "--max-retries", "1")
+    assert code == 1
+    assert read_lines(out) == []
+    # 80 failed calls, each tried twice; up to 3 calls still in flight are cancelled after their requests
+    assert 80 * 2 <= len(server.requests) <= (80 + 3) * 2
+
+
+@pytest.mark.parametrize("status, error", [(429, "RateLimitError"), (500, "InternalServerError")])
+def test_chat_raises_after_max_retries(status, error):
+    async def call(server):
+        client = openai.AsyncOpenAI(api_key="x", base_url=server.base_url, max_retries=0)
+        stats = {"calls": 0, "rate_limited": 0, "retries": 0}
+        try:
+            with pytest.raises(getattr(openai, error)):
+                await gen._chat_async(client, gen.RateLimiter(), stats, [{"role": "user", "content": "hi"}],
+                                      "mock", 0.8, 10, 100, max_retries=2)
+        finally:
+            await client.close()
+        return stats
+
+    header = {"retry-after": "0.01"} if status == 429 else {"retry-after-ms": "10"}
+    with MockOpenAIServer(default=(status, header)) as server:
+        stats = asyncio.run(call(server))
+    assert len(server.requests) == 3
+    assert stats["calls"] == 3
+    assert stats["rate_limited" if status == 429 else "retries"] == 2
+
+
+def test_request_bucket_spaces_calls_after_the_burst():
+    async def acquire_all():
+        limiter = gen.RateLimiter(rpm=120)  # 2 requests/s once the 120-request burst is spent
+        times = []
+        start = time.monotonic()
+        for _ in range(122):
+            await limiter.acquire(0)
+            times.append(time.monotonic() - start)
+        return times
+
+    times = asyncio.run(acquire_all())
+    assert times[119] < 0.1
+    assert 0.4 < times[120] < 0.7
+    assert 0.9 < times[121] < 1.2
+
+
+def test_token_bucket_is_corrected_from_reported_usage():
+    async def run():
+        limiter = gen.RateLimiter(tpm=600)  # 10 tokens/s
+        await limiter.acquire(600)
+        limiter.settle(600, 100)  # the call used 100 of the 600 reserved
+        start = time.monotonic()
+        await limiter.acquire(450)
+        fast = time.monotonic() - start
+        start = time.monotonic()
+        await limiter.acquire(60)
+        return fast, time.monotonic() - start
+
+    fast, slow = asyncio.run(run())
+    assert fast < 0.1
+    assert 0.8 < slow < 1.3  # 50 left, 10 more tokens at 10/s
+
+
+def test_pause_blocks_acquire():
+    async def run():
+        limiter = gen.RateLimiter(rpm=1000)
+        limiter.pause(0.3)
+        start = time.monotonic()
+        await limiter.acquire(1)
+        return time.monotonic() - start
+
+    assert 0.25 < asyncio.run(run()) < 0.5
+
+
+def test_retry_after_header_forms():
+    class Err:
+        def __init__(self, headers):
+            self.response = type("Response", (), {"headers": headers})()
+
+    assert gen._retry_after_seconds(Err({"retry-after-ms": "250"})) == 0.25
+    assert gen._retry_after_seconds(Err({"retry-after": "3"})) == 3.0
+    http_date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 5))
+    assert 3 < gen._retry_after_seconds(Err({"retry-after": http_date})) <= 5
+    assert gen._retry_after_seconds(Err({})) is None
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import torch
+
+from bert_bilstm_crf_pipeline import TAGS, LinearChainCRF, bio_transition_constraints, parse_resumes_batch
+
+
+def test_numpy_viterbi_matches_crf_decode():
+    from bert_bilstm_crf_onnx import viterbi_decode_numpy
+
+    torch.manual_seed(0)
+    allowed, allowed_start = bio_transition_constraints(TAGS)
+    crf = LinearChainCRF(len(TAGS), batch_first=True, constraints=(allowed, allowed_start))
+    with torch.no_grad():
+        for p in crf.parameters():
+            p.normal_()
+    emissions = torch.randn(5, 23, len(TAGS))
+    mask = torch.zeros(5, 23, dtype=torch.bool)
+    for b, length in enumerate([23, 1, 7, 16, 2]):
+        mask[b, :length] = True
+    start, transitions = crf._constrained()
+    paths = viterbi_decode_numpy(
+        emissions.numpy(), mask.numpy(), start.detach().numpy(), transitions.detach().numpy(),
+        crf.end_transitions.detach().numpy(),
+    )
+    np.testing.assert_array_equal(paths, crf.decode(emissions, mask).numpy())
+
+
+def test_onnx_engine_matches_pytorch_tags(tmp_path, fast_tokenizer, tiny_model, sample_texts):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnxscript")
+    from bert_bilstm_crf_onnx import OnnxBertBiLSTMCRF, export_onnx
+
+    config = {"tags": TAGS, "num_labels": len(TAGS), "id2label": dict(enumerate(TAGS))}
+    export_onnx(tiny_model, fast_tokenizer, config, str(tmp_path), max_length=64)
+    engine = OnnxBertBiLSTMCRF(str(tmp_path))
+    onnx_results = parse_resumes_batch(sample_texts, engine.tokenizer, engine, "cpu", engine.id2label, max_len=64)
+    torch_results = parse_resumes_batch(sample_texts, fast_tokenizer, tiny_model, "cpu", engine.id2label, max_len=64)
+    assert onnx_results == torch_results
@@ -0,0 +1,38 @@
+import os
+
+import torch
+
+from bert_bilstm_crf_pipeline import NUM_LABELS, TAGS, BertBiLSTMCRF, load_model_bundle, parse_resumes_batch, save_model_bundle
+from bert_bilstm_crf_pool import InferencePool
+
+
+def save_tiny_bundle(path, tokenizer, seed):
+    torch.manual_seed(seed)
+    bert_config = dict(
+        vocab_size=len(tokenizer), hidden_size=32, num_hidden_layers=1, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=512,
+    )
+    model = BertBiLSTMCRF(hidden_dim=16, bert_config=bert_config).eval()
+    save_model_bundle(model, tokenizer, {"bert_name": "tiny", "num_labels": NUM_LABELS, "tags": TAGS}, path)
+    return path
+
+
+def expected(path, texts, max_len):
+    model, tokenizer, config = load_model_bundle(path, "cpu")
+    with torch.inference_mode():
+        return parse_resumes_batch(texts, tokenizer, model, "cpu", config["id2label"], max_len, hybrid=True)
+
+
+def test_two_pools_keep_their_own_model(tmp_path, fast_tokenizer, sample_texts, monkeypatch):
+    monkeypatch.delenv("TOKENIZERS_PARALLELISM", raising=False)
+    first = save_tiny_bundle(str(tmp_path / "a.bundle"), fast_tokenizer, seed=1)
+    second = save_tiny_bundle(str(tmp_path / "b.bundle"), fast_tokenizer, seed=2)
+    with InferencePool(first, workers=2, max_len=64, chunk_size=2) as pool_a:
+        with InferencePool(second, workers=2, max_len=128, chunk_size=2) as pool_b:
+            results_b = pool_b.map(sample_texts)
+            results_a = pool_a.map(sample_texts)
+    assert results_a == expected(first, sample_texts, 64)
+    assert results_b == expected(second, sample_texts, 128)
+    assert results_a != results_b
+    # Only the workers change the environment
+    assert "TOKENIZERS_PARALLELISM" not in os.environ
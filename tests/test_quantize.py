@@ -0,0 +1,48 @@
+import os
+
+import pytest
+import torch
+
+from bert_bilstm_crf_pipeline import ID2LABEL, NUM_LABELS, TAGS, load_bert_bilstm_crf, predict_word_tags_batch, quantize_dynamic_int8
+from bert_bilstm_crf_quantize import STATE_FILE, evaluate_word_tags, save_quantized
+
+
+@pytest.fixture
+def int8_dir(tmp_path, tiny_model, fast_tokenizer):
+    """tiny_model quantized and saved by the quantize tool; its BERT config is saved as bert_name."""
+    bert_dir = str(tmp_path / "bert")
+    tiny_model.bert.save_pretrained(bert_dir)
+    out = str(tmp_path / "int8")
+    qmodel = quantize_dynamic_int8(tiny_model)
+    save_quantized(qmodel, fast_tokenizer, {"bert_name": bert_dir, "num_labels": NUM_LABELS, "tags": TAGS}, out)
+    return out, qmodel
+
+
+def test_quantized_checkpoint_loads_weights_only(int8_dir, sample_texts):
+    out, qmodel = int8_dir
+    state = torch.load(os.path.join(out, STATE_FILE), weights_only=True)
+    assert not any("_all_weight_values" in k for k in state)
+    model, tokenizer, _ = load_bert_bilstm_crf(out, "cpu", hidden_dim=16)
+    cpu = torch.device("cpu")
+    expected = predict_word_tags_batch(sample_texts, tokenizer, qmodel, cpu, ID2LABEL, max_len=64)
+    assert predict_word_tags_batch(sample_texts, tokenizer, model, cpu, ID2LABEL, max_len=64) == expected
+
+
+def test_packed_lstm_checkpoint_is_rejected(int8_dir):
+    out, qmodel = int8_dir
+    torch.save(qmodel.state_dict(), os.path.join(out, STATE_FILE))  # TorchScript cell params
+    with pytest.raises(ValueError, match="re-run"):
+        load_bert_bilstm_crf(out, "cpu", hidden_dim=16)
+
+
+def test_evaluate_word_tags_pairs_every_word_of_long_documents(tiny_model, fast_tokenizer, sample_texts):
+    sentences = [text.split() for text in sample_texts]
+    label_lists = [[TAGS[i % NUM_LABELS] for i in range(len(words))] for words in sentences]
+    true_all, pred_all = evaluate_word_tags(tiny_model, fast_tokenizer, sentences, label_lists, ID2LABEL, max_len=32)
+    nonempty = [labels for labels in label_lists if labels]
+    assert true_all == nonempty
+    assert [len(tags) for tags in pred_all] == [len(labels) for labels in nonempty]
+    assert max(len(labels) for labels in nonempty) > 32  # some documents needed windows
+
+    with pytest.raises(AssertionError, match="gold labels"):
+        evaluate_word_tags(tiny_model, fast_tokenizer, sentences[:1], [label_lists[0][:-1]], ID2LABEL, max_len=32)
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bert_bilstm_crf_registry import ModelRegistry
+
+
+class StubVersion:
+    """ModelVersion stand-in: parse_batch tags every text with `entities`, optionally after `gate` opens."""
+
+    def __init__(self, version, entities=None, gate=None, fail=False):
+        self.version = version
+        self.path = f"/models/{version}"
+        self.fingerprint = version * 8
+        self.cache_namespace = f"resume:{version}"
+        self.entities = entities if entities is not None else {"SKILL": ["python"]}
+        self.gate = gate
+        self.fail = fail
+        self.seen = []
+        self.calls = 0
+        self.in_flight = 0
+
+        def parse_batch(texts):
+            self.seen.append(list(texts))
+            if self.gate is not None:
+                assert self.gate.wait(5)
+            if self.fail:
+                raise RuntimeError(f"{version} is broken")
+            return [(t.split(), ["O"] * len(t.split()), dict(self.entities)) for t in texts]
+
+        self.parse_batch = parse_batch
+        self.predict = parse_batch
+
+    def info(self):
+        return {"version": self.version, "path": self.path}
+
+
+def in_thread(fn, *args):
+    out = {}
+    thread = threading.Thread(target=lambda: out.setdefault("result", fn(*args)), daemon=True)
+    thread.start()
+    return thread, out
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_activate_waits_for_running_calls_and_holds_new_ones():
+    gate = threading.Event()
+    old, new = StubVersion("v1", gate=gate), StubVersion("v2", entities={"SKILL": ["sql"]})
+    registry = ModelRegistry("resume")
+    registry.activate(old)
+
+    running, running_out = in_thread(registry.predict, ["running call"])
+    wait_until(lambda: old.in_flight == 1)
+    swap, _ = in_thread(registry.activate, new)
+    wait_until(lambda: registry._switching)
+    waiting, waiting_out = in_thread(registry.predict, ["arrives during the swap"])
+
+    time.sleep(0.1)
+    assert swap.is_alive() and waiting.is_alive()  # both blocked by the call still running on v1
+    assert registry.active is old and old.calls == 1 and new.calls == 0
+
+    gate.set()
+    for thread in (running, swap, waiting):
+        thread.join(5)
+    assert registry.active is new and registry.swaps == 1
+    assert running_out["result"][0][2] == {"SKILL": ["python"]}
+    assert waiting_out["result"][0][2] == {"SKILL": ["sql"]}  # served by the new version only
+    assert old.seen == [["running call"]] and new.seen == [["arrives during the swap"]]
+    registry.close()
+
+
+def test_promote_shadow_activates_and_clears_it():
+    registry = ModelRegistry("resume")
+    primary, shadow = StubVersion("v1"), StubVersion("v2")
+    registry.activate(primary)
+    registry.set_shadow(shadow, sample_rate=0.5)
+    assert registry.stats()["shadow"]["version"] == "v2"
+    assert registry.promote_shadow() is primary
+    assert registry.active is shadow and registry.shadow is None
+    assert registry.stats()["shadow"] is None
+    registry.close()
+
+
+def test_shadow_agreement_is_recorded(tmp_path):
+    log = tmp_path / "shadow.jsonl"
+    executor = ThreadPoolExecutor(max_workers=1)
+    registry = ModelRegistry("resume", shadow_log=str(log), executor=executor)
+    registry.activate(StubVersion("v1", entities={"SKILL": ["python"]}))
+    registry.set_shadow(StubVersion("v2", entities={"SKILL": ["python", "sql"]}), sample_rate=1.0)
+
+    results = registry.predict(["first  doc", "second doc"])
+    executor.shutdown(wait=True)
+
+    assert [r[2] for r in results] == [{"SKILL": ["python"]}] * 2
+    shadow = registry.stats()["shadow"]
+    assert (shadow["batches"], shadow["texts"], shadow["disagreeing_texts"]) == (1, 2, 2)
+    assert shadow["mean_agreement"] == 0.5
+    assert shadow["dropped"] == 0 and shadow["errors"] == 0
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(records) == 2
+    assert records[0]["only_shadow"] == [["SKILL", "sql"]] and records[0]["only_primary"] == []
+
+
+def test_busy_shadow_drops_samples():
+    gate = threading.Event()
+    registry = ModelRegistry("resume")
+    registry.activate(StubVersion("v1"))
+    shadow = StubVersion("v2", gate=gate)
+    registry.set_shadow(shadow, sample_rate=1.0)
+
+    registry.predict(["sampled"])
+    wait_until(lambda: shadow.seen)
+    registry.predict(["arrives while the shadow runs"])
+    registry.predict(["and another"])
+    gate.set()
+    registry.close()
+
+    stats = registry.stats()["shadow"]
+    assert stats["dropped"] == 2
+    assert stats["batches"] == 1 and stats["texts"] == 1
+    assert shadow.seen == [["sampled"]]
+
+
+def test_failing_shadow_does_not_affect_the_primary():
+    registry = ModelRegistry("resume")
+    primary = StubVersion("v1")
+    registry.activate(primary)
+    registry.set_shadow(StubVersion("v2", fail=True), sample_rate=1.0)
+
+    results = [registry.predict([f"doc {i}"]) for i in range(3)]
+    registry.close()
+
+    assert [r[0][2] for r in results] == [{"SKILL": ["python"]}] * 3
+    stats = registry.stats()["shadow"]
+    assert stats["errors"] >= 1
+    assert stats["errors"] + stats["dropped"] == 3
+    assert stats["batches"] == 0
+    assert primary.in_flight == 0
@@ -0,0 +1,26 @@
+import random
+
+from bert_bilstm_crf_pipeline import LengthBucketBatchSampler
+
+
+def test_len_matches_batches_while_iterating():
+    rng = random.Random(0)
+    lengths = [rng.randint(5, 512) for _ in range(500)]
+    sampler = LengthBucketBatchSampler(lengths, batch_size=None, max_tokens=2048)
+    for epoch in range(4):
+        sampler.set_epoch(epoch)
+        n = len(sampler)
+        seen = 0
+        for batch in sampler:
+            seen += 1
+            assert len(sampler) == n
+        assert seen == n
+
+
+def test_epoch_only_changes_through_set_epoch():
+    sampler = LengthBucketBatchSampler(list(range(1, 200)), batch_size=8)
+    first, again = list(sampler), list(sampler)
+    assert first == again
+    sampler.set_epoch(1)
+    assert list(sampler) != first
+    assert sorted(i for b in sampler for i in b) == list(range(199))
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import time
+
+from bert_bilstm_crf_server import MicroBatcher, NERServer
+
+
+class StubModel:
+    """parse_batch stand-in: one entity per text, records batch sizes; texts containing 'boom' fail."""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, texts):
+        self.batches.append(len(texts))
+        time.sleep(self.delay)
+        if any("boom" in t for t in texts):
+            raise RuntimeError("model exploded")
+        return [(t.split(), ["O"] * len(t.split()), {"TEXT": [t]}) for t in texts]
+
+
+def start_batcher(server, predict, **kwargs):
+    """Serve `predict` as the resume model without loading a checkpoint."""
+    batcher = MicroBatcher(predict, server.executor, **kwargs)
+    server.batchers["resume"] = batcher
+    server.tasks.append(server._spawn(batcher.run(), "resume micro-batcher"))
+    return batcher
+
+
+async def shutdown(server):
+    for task in list(server.background):
+        task.cancel()
+    await asyncio.gather(*server.background, return_exceptions=True)
+    server.executor.shutdown()
+    server.loader.shutdown()
+
+
+async def http(port, raw):
+    """Send one raw request (Connection: close) and return (status, JSON body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def post(path, body, headers=""):
+    data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    length = headers if "Content-Length" in headers else f"Content-Length: {len(data)}\r\n{headers}"
+    return f"POST {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n{length}\r\n".encode("latin-1") + data
+
+
+def test_concurrent_requests_share_a_batch():
+    model = StubModel()
+
+    async def run():
+        server = NERServer({"resume": "unused"}, cache_bytes=0)
+        batcher = start_batcher(server, model, max_batch_size=32, max_wait_ms=100)
+        results = await asyncio.gather(*(batcher.submit([f"text {i}", f"more {i}"]) for i in range(5)))
+        await shutdown(server)
+        return results, batcher
+
+    results, batcher = asyncio.run(run())
+    assert model.batches == [10]
+    assert (batcher.batches, batcher.texts) == (1, 10)
+    assert [r[0][2]["TEXT"] for r in results] == [[f"text {i}"] for i in range(5)]
+
+
+def test_batches_are_cut_at_max_batch_size():
+    model = StubModel()
+
+    async def run():
+        server = NERServer({"resume": "unused"}, cache_bytes=0)
+        batcher = start_batcher(server, model, max_batch_size=2, max_wait_ms=100)
+        await asyncio.gather(*(batcher.submit([f"text {i}"]) for i in range(5)))
+        await shutdown(server)
+
+    asyncio.run(run())
+    assert model.batches == [2, 2, 1]
+
+
+def test_http_status_paths():
+    async def run():
+        server = NERServer({"resume": "unused"}, cache_bytes=0)
+        start_batcher(server, StubModel(), max_wait_ms=1)
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        statuses = {}
+        try:
+            statuses["ok"] = await http(port, post("/extract", {"text": "Jane Doe"}))
+            statuses["model failure"] = await http(port, post("/extract", {"texts": ["fine", "boom"]}))
+            statuses["negative timeout"] = await http(port, post("/extract", {"text": "a", "timeout": -1}))
+            statuses["text timeout"] = await http(port, post("/extract", {"text": "a", "timeout": "soon"}))
+            statuses["bad content-length"] = await http(port, post("/extract", b"{}", "Content-Length: abc\r\n"))
+            statuses["negative content-length"] = await http(port, post("/extract", b"{}", "Content-Length: -3\r\n"))
+            statuses["not json"] = await http(port, post("/extract", b"{not json"))
+            statuses["no texts"] = await http(port, post("/extract", {"texts": []}))
+            statuses["after failure"] = await http(port, post("/extract", {"text": "still serving"}))
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            await shutdown(server)
+        return statuses
+
+    statuses = asyncio.run(run())
+    assert statuses["ok"] == (200, {"entities": {"TEXT": ["Jane Doe"]}})
+    assert statuses["model failure"] == (500, {"error": "model failed: RuntimeError"})
+    for case in ["negative timeout", "text timeout", "bad content-length", "negative content-length", "not json", "no texts"]:
+        assert statuses[case][0] == 400, case
+    assert statuses["after failure"][0] == 200
+
+
+def test_timeout_and_full_queue():
+    async def run():
+        server = NERServer({"resume": "unused"}, cache_bytes=0, max_queue=1)
+        start_batcher(server, StubModel(delay=0.3), max_wait_ms=1, max_queue=1)
+        slow = await server.extract({"text": "first", "timeout": 0.05})
+        # The batcher is busy with "first": one request fills the queue, the next is turned away
+        queued = asyncio.create_task(server.extract({"text": "second"}))
+        await asyncio.sleep(0)
+        busy = await server.extract({"text": "third"})
+        await queued
+        await shutdown(server)
+        return slow, busy, queued.result()
+
+    slow, busy, queued = asyncio.run(run())
+    assert slow[0] == 504
+    assert busy[0] == 503
+    assert queued[0] == 200
+
+
+def test_background_load_is_kept_and_failures_are_logged(capsys):
+    async def run():
+        server = NERServer({"resume": "unused"}, cache_bytes=0, admin=True)
+        status, _ = await server.manage_models("load", {"type": "resume", "path": "/nonexistent/model"})
+        pending = set(server.background)
+        await asyncio.gather(*pending)
+
+        async def crash():
+            raise ValueError("unexpected")
+
+        await asyncio.gather(server._spawn(crash(), "crashing task"), return_exceptions=True)
+        await asyncio.sleep(0)
+        leftover = set(server.background)
+        await shutdown(server)
+        return status, pending, leftover, server.last_load["resume"]
+
+    status, pending, leftover, last_load = asyncio.run(run())
+    assert status == 202
+    assert len(pending) == 1
+    assert leftover == set()
+    assert last_load["ok"] is False
+    assert "crashing task failed: ValueError: unexpected" in capsys.readouterr().out
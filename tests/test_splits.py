@@ -0,0 +1,71 @@
+import json
+import random
+from collections import Counter
+
+import pytest
+
+from bert_bilstm_crf_pipeline import hash_split, iter_tagged_examples, read_split_file, write_split_files
+
+
+def synthetic_corpus(n, seed=0):
+    rng = random.Random(seed)
+    words = ["john", "smith", "python", "sql", "acme", "engineer", "colombo", "bsc"]
+    docs = []
+    for i in range(n):
+        content = f"Person {i}\n" + " ".join(rng.choice(words) for _ in range(rng.randint(3, 20)))
+        annotations = [{"label": ["Name"], "points": [{"start": 0, "end": len(f"Person {i}")}]}]
+        docs.append({"content": content, "annotation": annotations})
+    # Skipped: no annotations / no content
+    docs.append({"content": "no annotation here", "annotation": []})
+    docs.append({"content": "", "annotation": annotations})
+    return docs
+
+
+def splits_by_document(examples):
+    return {tuple(words): (split, tuple(labels)) for split, words, labels in examples}
+
+
+def test_assignment_does_not_depend_on_order_or_corpus_size():
+    docs = synthetic_corpus(300)
+    base = splits_by_document(iter_tagged_examples(docs))
+    assert len(base) == 300
+
+    shuffled = docs[:]
+    random.Random(1).shuffle(shuffled)
+    assert splits_by_document(iter_tagged_examples(shuffled)) == base
+
+    # Appending documents never moves the old ones
+    grown = splits_by_document(iter_tagged_examples(docs + synthetic_corpus(100, seed=5)[:100]))
+    assert all(grown[key] == value for key, value in base.items())
+
+    salted = splits_by_document(iter_tagged_examples(docs, salt="fold-2"))
+    assert any(salted[key][0] != value[0] for key, value in base.items())
+
+
+@pytest.mark.parametrize("train_ratio, val_ratio", [(0.8, 0.1), (0.7, 0.2), (0.5, 0.0)])
+def test_split_ratios(train_ratio, val_ratio):
+    n = 5000
+    counts = Counter(hash_split(f"document-{i}", train_ratio, val_ratio) for i in range(n))
+    expected = {"train": train_ratio, "val": val_ratio, "test": 1 - train_ratio - val_ratio}
+    for split, ratio in expected.items():
+        assert abs(counts[split] / n - ratio) < 0.02, (split, counts)
+
+
+@pytest.mark.parametrize("from_path", [False, True])
+def test_written_split_files_read_back_as_the_in_memory_split(tmp_path, from_path):
+    docs = synthetic_corpus(200)
+    source = docs
+    if from_path:
+        source = tmp_path / "corpus.jsonl"
+        source.write_text("\n".join(json.dumps(d) for d in docs) + "\n\n", encoding="utf-8")
+    counts = write_split_files(source, tmp_path / "splits")
+
+    expected = {"train": ([], []), "val": ([], []), "test": ([], [])}
+    for split, words, labels in iter_tagged_examples(docs):
+        expected[split][0].append(words)
+        expected[split][1].append(labels)
+    for split, (sents, labels) in expected.items():
+        assert read_split_file(tmp_path / "splits" / f"{split}.jsonl") == (sents, labels)
+        assert counts[split] == len(sents)
+    assert sum(counts.values()) == 200
+    assert expected["train"][1][0][:2] == ["B-NAME", "I-NAME"]
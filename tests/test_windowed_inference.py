@@ -0,0 +1,70 @@
+import re
+
+import torch
+
+from bert_bilstm_crf_pipeline import (
+    ID2LABEL,
+    align_labels_windowed,
+    collate_bert_batch,
+    encode_word_windows,
+    merge_window_tags,
+    parse_resumes_batch,
+    predict_word_tags_batch,
+)
+
+MAX_LEN = 32
+STRIDE = 8
+
+
+def reference_tags(words, tokenizer, model):
+    """One window per forward pass, merged as documented: the per-document windowed path."""
+    window_tags = []
+    with torch.inference_mode():
+        for input_ids, first_idx, span in encode_word_windows(words, tokenizer, MAX_LEN, STRIDE):
+            ids, mask, _ = collate_bert_batch([(input_ids, [1] * len(input_ids), [-100] * len(input_ids))])
+            pred = model(ids, mask)[0].tolist()
+            window_tags.append((span, [ID2LABEL[pred[i]] for i in first_idx]))
+    return merge_window_tags(len(words), window_tags)
+
+
+def test_batched_windows_match_per_document_windows(sample_texts, fast_tokenizer, tiny_model):
+    results = predict_word_tags_batch(
+        sample_texts, fast_tokenizer, tiny_model, "cpu", max_len=MAX_LEN, window_stride=STRIDE, max_batch_size=3
+    )
+    for text, (words, tags) in zip(sample_texts, results):
+        assert words == re.findall(r"\S+", text)
+        assert tags == reference_tags(words, fast_tokenizer, tiny_model)
+
+
+def test_every_word_is_tagged_and_short_documents_are_unchanged(sample_texts, fast_tokenizer, tiny_model):
+    windowed = parse_resumes_batch(sample_texts, fast_tokenizer, tiny_model, "cpu", max_len=MAX_LEN, window_stride=STRIDE)
+    truncated = parse_resumes_batch(sample_texts, fast_tokenizer, tiny_model, "cpu", max_len=MAX_LEN, window_stride=None)
+    for text, (words, tags, _), (cut_words, cut_tags, _) in zip(sample_texts, windowed, truncated):
+        assert len(words) == len(tags) == len(text.split())
+        if len(cut_words) == len(words):
+            assert (words, tags) == (cut_words, cut_tags)
+        else:
+            assert len(cut_words) < len(words)
+    assert any(len(cut) < len(text.split()) for text, (cut, _, _) in zip(sample_texts, truncated))
+
+
+def test_empty_documents(fast_tokenizer, tiny_model):
+    assert predict_word_tags_batch(["", "  \n "], fast_tokenizer, tiny_model, "cpu") == [([], []), ([], [])]
+
+
+def test_windowed_training_samples_cover_every_word(sample_texts, fast_tokenizer):
+    tags = ["O", "B-JOB_TITLE", "I-JOB_TITLE"]
+    label2id = {t: i for i, t in enumerate(tags)}
+    for text in sample_texts:
+        words = text.split()
+        labels = [tags[i % 3] for i in range(len(words))]
+        windows = encode_word_windows(words, fast_tokenizer, MAX_LEN, STRIDE)
+        samples = align_labels_windowed(words, labels, fast_tokenizer, MAX_LEN, STRIDE, label2id=label2id)
+        assert len(samples) == len(windows)
+        covered = set()
+        for (input_ids, mask, aligned), (window_ids, first_idx, (ws, we)) in zip(samples, windows):
+            assert input_ids == window_ids and len(input_ids) <= MAX_LEN and mask == [1] * len(input_ids)
+            assert [aligned[pos] for pos in first_idx] == [label2id[t] for t in labels[ws:we]]
+            assert sum(a != -100 for a in aligned) == we - ws
+            covered.update(range(ws, we))
+        assert covered == set(range(len(words)))